@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de memoria de los DataFrames del dashboard: object/float64 vs compacto.
+
+Genera filas sintéticas de retail_sales en CSV, el mismo formato que
+entrega COPY ... TO STDOUT, y mide los bytes por fila (memory_usage con
+deep=True) de dos representaciones:
+
+- antes: textos como object, medidas en float64 y date como texto, como
+  quedaban con pd.read_sql_query y sin conversiones.
+- después: frames.read_csv + frames.downcast_measures (category, float32,
+  enteros reducidos y date como datetime64), el camino del dashboard.
+
+Las filas se procesan en bloques de --chunk-rows para no tener la versión
+"antes" entera en memoria; la versión compacta sí se arma completa con
+frames.concat. También reporta lo que cuesta filtrar con df.copy() frente a
+una máscara booleana, que ocupa un byte por fila. No requiere PostgreSQL.
+
+Uso:
+    python benchmarks/bench_dashboard_memory.py --rows 1000000 10000000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "common"))
+sys.path.insert(0, os.path.join(ROOT, "streamlit"))
+
+import numpy as np
+import pandas as pd
+
+import frames
+import retail_schema
+
+CATEGORIES = ['Groceries', 'Toys', 'Electronics', 'Furniture', 'Clothing']
+REGIONS = ['North', 'South', 'East', 'West']
+WEATHERS = ['Sunny', 'Cloudy', 'Rainy', 'Snowy']
+SEASONS = ['Spring', 'Summer', 'Autumn', 'Winter']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--chunk-rows", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def synthetic_csv(rows, offset, rng):
+    """CSV con encabezado y las columnas normalizadas de retail_sales"""
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+    data = pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d"),
+        "store_id": np.char.add("S", np.char.zfill(rng.integers(1, 6, rows).astype(str), 3)),
+        "product_id": np.char.add("P", np.char.zfill(rng.integers(1, 21, rows).astype(str), 4)),
+        "category": np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), rows)],
+        "region": np.array(REGIONS)[rng.integers(0, len(REGIONS), rows)],
+        "inventory_level": rng.integers(0, 500, rows).astype(float),
+        "units_sold": rng.integers(0, 200, rows).astype(float),
+        "units_ordered": rng.integers(0, 200, rows).astype(float),
+        "demand_forecast": rng.uniform(0, 200, rows).round(2),
+        "price": rng.uniform(5, 100, rows).round(2),
+        "discount": rng.choice([0, 5, 10, 15, 20], rows).astype(float),
+        "weather_condition": np.array(WEATHERS)[rng.integers(0, len(WEATHERS), rows)],
+        "holiday_promotion": rng.integers(0, 2, rows),
+        "competitor_pricing": rng.uniform(5, 100, rows).round(2),
+        "seasonality": np.array(SEASONS)[rng.integers(0, len(SEASONS), rows)],
+        "batch_id": np.char.add("batch_", ((offset + np.arange(rows)) // 10000).astype(str)),
+        "row_seq": (offset + np.arange(rows)) % 10000,
+    })
+    return data[retail_schema.clean_column_names()].to_csv(index=False).encode()
+
+
+def object_frame(data):
+    """Representación previa: object para textos y fechas, float64/int64 para números"""
+    dtypes = dict((name, "object" if logical in ("string", "date") else retail_schema.PANDAS_TYPES[logical])
+                  for name, logical in retail_schema.column_types().items())
+    return pd.read_csv(io.BytesIO(data), dtype=dtypes)
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def measure(rows, chunk_rows, seed):
+    rng = np.random.default_rng(seed)
+    before_bytes, parse_seconds, parts = 0, 0.0, []
+    for offset in range(0, rows, chunk_rows):
+        data = synthetic_csv(min(chunk_rows, rows - offset), offset, rng)
+        before_bytes += frame_bytes(object_frame(data))
+        started = time.perf_counter()
+        parts.append(frames.downcast_measures(frames.read_csv(data)))
+        parse_seconds += time.perf_counter() - started
+    compact = frames.concat(parts)
+    return before_bytes, frame_bytes(compact), parse_seconds, compact
+
+
+def main():
+    args = parse_args()
+    print("{:>11} {:>12} {:>12} {:>8} {:>12} {:>12} {:>14}".format(
+        "filas", "antes B/fila", "desp. B/fila", "ratio", "antes MB", "desp. MB", "parseo filas/s"))
+    for rows in args.rows:
+        before, after, parse_seconds, compact = measure(rows, args.chunk_rows, args.seed)
+        print("{:>11,} {:>12.1f} {:>12.1f} {:>7.1f}x {:>12,.0f} {:>12,.0f} {:>14,.0f}".format(
+            rows, before / float(rows), after / float(rows), before / float(after),
+            before / 1e6, after / 1e6, rows / parse_seconds))
+
+        # Filtro por rerun: copia completa vs máscara sobre el mismo DataFrame
+        started = time.perf_counter()
+        mask = (compact['category'] == CATEGORIES[0]) & (compact['region'] == REGIONS[0])
+        units = compact.loc[mask, 'units_sold'].sum()
+        mask_seconds = time.perf_counter() - started
+        print("{:>11} filtro: df.copy() {:,.0f} MB por rerun, máscara {:,.0f} MB ({:.0f} ms, {:,.0f} unidades)".format(
+            "", after / 1e6, mask.memory_usage(index=False) / 1e6, mask_seconds * 1000, units))
+        del compact, mask
+
+
+if __name__ == "__main__":
+    main()
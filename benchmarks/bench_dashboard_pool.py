@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de concurrencia del dashboard: una conexión por consulta vs pool compartido.
+
+Simula N espectadores simultáneos, cada uno en su hilo como las sesiones de
+Streamlit. Cada espectador hace --reruns reruns con filtros al azar y en
+cada uno ejecuta las consultas de una página del dashboard (streamlit/
+queries.py, sin la cache de resultados). Mide la latencia por rerun
+(p50/p95), los reruns por segundo y, con el pool, la espera por conexión y
+su uso. Requiere psycopg2 y un PostgreSQL con retail_sales y su rollup.
+
+Uso:
+    python benchmarks/bench_dashboard_pool.py --host localhost --viewers 1 10 50 --pool-sizes 5 10
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "streamlit"))
+
+import psycopg2
+
+import db_pool
+import queries
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--viewers", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--reruns", type=int, default=10, help="reruns por espectador")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=5432)
+    parser.add_argument("--dbname", default="hive")
+    parser.add_argument("--user", default="hive")
+    parser.add_argument("--password", default="hive")
+    parser.add_argument("--statement-timeout-ms", type=int, default=30000)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def page_queries(filters, page):
+    """Consultas de un rerun del dashboard"""
+    return [
+        queries.data_version(),
+        queries.filter_options(),
+        queries.rollup_summary(filters),
+        queries.rollup_summary(filters, "region"),
+        queries.rollup_summary(filters, "category"),
+        queries.rollup_summary(filters, "date"),
+        queries.stock_alert_counts(filters, 10),
+        queries.stock_alert_items(filters, 10),
+        queries.stockout_risk_items(filters, 10),
+        queries.detail_page(filters, page, 100),
+        queries.describe(filters),
+    ]
+
+
+def random_filters(rng, options):
+    categories, regions, min_date, max_date = options
+    filters = {}
+    if rng.random() < 0.5:
+        filters["category"] = rng.choice(categories)
+    if rng.random() < 0.5:
+        filters["region"] = rng.choice(regions)
+    if rng.random() < 0.5 and min_date != max_date:
+        days = (max_date - min_date).days
+        start = rng.randint(0, days)
+        filters["start_date"] = min_date + datetime.timedelta(days=start)
+        filters["end_date"] = min_date + datetime.timedelta(days=rng.randint(start, days))
+    return filters
+
+
+def run_query(connection, query):
+    with connection.cursor() as cursor:
+        cursor.execute(*query)
+        cursor.fetchall()
+
+
+def load_options(params):
+    connection = psycopg2.connect(**params)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(*queries.filter_options())
+            rows = cursor.fetchall()
+    finally:
+        connection.close()
+    if not rows:
+        raise SystemExit("No hay datos en {}: ejecuta el consumer primero".format(queries.ROLLUP_TABLE))
+    return (sorted(set(row[0] for row in rows)), sorted(set(row[1] for row in rows)),
+            min(row[2] for row in rows), max(row[3] for row in rows))
+
+
+def simulate(viewers, reruns, options, seed, execute_page):
+    """Lanza los espectadores; retorna (latencias por rerun, segundos totales, errores)"""
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def viewer(index):
+        rng = random.Random(seed + index)
+        for _ in range(reruns):
+            started = time.perf_counter()
+            try:
+                execute_page(page_queries(random_filters(rng, options), rng.randint(0, 4)))
+            except Exception as error:
+                with lock:
+                    errors.append(error)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=viewer, args=(index,)) for index in range(viewers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started, errors
+
+
+def main():
+    args = parse_args()
+    params = {"host": args.host, "port": args.port, "dbname": args.dbname,
+              "user": args.user, "password": args.password}
+    options = load_options(params)
+    connect_params = dict(params, options="-c statement_timeout={}".format(args.statement_timeout_ms))
+
+    def per_query_connections(page):
+        # Como el dashboard original: psycopg2.connect y close por consulta
+        for query in page:
+            connection = psycopg2.connect(**connect_params)
+            try:
+                run_query(connection, query)
+            finally:
+                connection.close()
+
+    print("{:>9} {:<10} {:>10} {:>10} {:>10} {:>12} {:>12} {:>6} {:>8}".format(
+        "viewers", "modo", "reruns/s", "p50 (ms)", "p95 (ms)", "espera p95", "uso pico", "conex", "errores"))
+    for viewers in args.viewers:
+        modes = [("connect", None)] + [("pool-{}".format(size), size) for size in args.pool_sizes]
+        for name, pool_size in modes:
+            pool = None
+            if pool_size is None:
+                execute_page = per_query_connections
+            else:
+                pool = db_pool.ConnectionPool(params, min_size=pool_size, max_size=pool_size,
+                                              acquire_timeout=60,
+                                              statement_timeout_ms=args.statement_timeout_ms)
+
+                def execute_page(page, pool=pool):
+                    # Una conexión por consulta, como execute_query en app.py
+                    for query in page:
+                        with pool.connection() as connection:
+                            run_query(connection, query)
+
+            latencies, elapsed, errors = simulate(viewers, args.reruns, options, args.seed, execute_page)
+            p50 = db_pool.percentile(latencies, 0.5) * 1000
+            p95 = db_pool.percentile(latencies, 0.95) * 1000
+            if pool is not None:
+                stats = pool.summary()
+                wait = "{:.1f} ms".format(stats["p95_wait_seconds"] * 1000)
+                peak = "{}/{}".format(stats["peak_in_use"], stats["max_size"])
+                connections = stats["created"]
+                pool.close()
+            else:
+                wait, peak, connections = "-", "-", viewers * args.reruns * len(page_queries({}, 0))
+            print("{:>9} {:<10} {:>10.1f} {:>10.1f} {:>10.1f} {:>12} {:>12} {:>6} {:>8}".format(
+                viewers, name, len(latencies) / elapsed, p50, p95, wait, peak, connections, len(errors)))
+
+
+if __name__ == "__main__":
+    main()
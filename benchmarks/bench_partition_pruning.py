@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de poda de particiones: tabla ORC plana vs particionada por fecha.
+
+Genera datos sintéticos con las columnas limpias de retail_sales_raw para un
+número creciente de días, los escribe como ORC plano y particionado por
+`date` (la misma disposición que la tabla Hive) y mide una consulta
+COUNT(*) sobre un rango de fechas con Spark en modo local.
+
+Uso:
+    spark-submit benchmarks/bench_partition_pruning.py --days 30 90 365 --range-days 7
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+import retail_schema
+
+from pyspark.sql import SparkSession
+from pyspark.sql.functions import col, concat, date_add, date_format, lit, rand, when
+
+START_DATE = datetime.date(2024, 1, 1)
+
+
+def synthetic_df(spark, days, rows_per_day, files_per_day):
+    """Filas con el esquema limpio, repartidas uniformemente entre `days` fechas"""
+    ids = spark.range(days * rows_per_day, numPartitions=files_per_day)
+    values = {
+        "date": date_format(date_add(lit(START_DATE.isoformat()).cast("date"),
+                                     (col("id") % days).cast("int")), retail_schema.DATE_FORMAT),
+        "store_id": concat(lit("S"), (col("id") % 5).cast("string")),
+        "product_id": concat(lit("P"), (col("id") % 20).cast("string")),
+        "category": when(col("id") % 2 == 0, "Groceries").otherwise("Toys"),
+        "region": when(col("id") % 4 < 2, "North").otherwise("South"),
+        "weather_condition": lit("Sunny"),
+        "seasonality": lit("Winter"),
+        "holiday_promotion": (col("id") % 2).cast("int"),
+    }
+    columns = []
+    for name in retail_schema.clean_column_names():
+        expression = values.get(name, (rand(seed=len(columns)) * 100).cast("double"))
+        columns.append(expression.alias(name))
+    return ids.select(columns)
+
+
+def count_files(path):
+    return sum(1 for _, _, files in os.walk(path)
+               for name in files if name.endswith(".orc"))
+
+
+def time_query(spark, path, first_day, last_day, repeats):
+    """Mejor tiempo (s) de contar las filas de un rango de fechas"""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        spark.read.orc(path) \
+            .filter(col("date").between(first_day, last_day)) \
+            .groupBy().count().collect()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 90, 365])
+    parser.add_argument("--rows-per-day", type=int, default=20000)
+    parser.add_argument("--files-per-day", type=int, default=4)
+    parser.add_argument("--range-days", type=int, default=7)
+    parser.add_argument("--master", default="local[*]")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    spark = SparkSession.builder.master(args.master).appName("BenchPartitionPruning").getOrCreate()
+    spark.sparkContext.setLogLevel("WARN")
+
+    first_day = START_DATE.isoformat()
+    last_day = (START_DATE + datetime.timedelta(days=args.range_days - 1)).isoformat()
+
+    workdir = tempfile.mkdtemp(prefix="bench_partition_")
+    try:
+        print("Consulta: COUNT(*) WHERE date BETWEEN '{}' AND '{}'".format(first_day, last_day))
+        print("{:>6} {:>12} {:>12} {:>12} {:>12} {:>12} {:>8}".format(
+            "días", "filas", "plana (s)", "arch. plana", "partic. (s)", "arch. part.", "mejora"))
+        for days in args.days:
+            flat_path = os.path.join(workdir, "flat_{}".format(days))
+            partitioned_path = os.path.join(workdir, "partitioned_{}".format(days))
+            df = synthetic_df(spark, days, args.rows_per_day, args.files_per_day)
+            df.write.mode("overwrite").orc(flat_path)
+            df.repartition(args.files_per_day * days, "date", "store_id") \
+                .write.mode("overwrite").partitionBy("date").orc(partitioned_path)
+
+            flat = time_query(spark, flat_path, first_day, last_day, args.repeats)
+            partitioned = time_query(spark, partitioned_path, first_day, last_day, args.repeats)
+
+            # La tabla plana se lee entera; la particionada solo los
+            # directorios date=... del rango
+            pruned_files = sum(
+                count_files(os.path.join(partitioned_path, "date={}".format(
+                    (START_DATE + datetime.timedelta(days=offset)).isoformat())))
+                for offset in range(min(args.range_days, days)))
+            print("{:>6} {:>12,} {:>12.3f} {:>12} {:>12.3f} {:>12} {:>7.2f}x".format(
+                days, days * args.rows_per_day, flat, count_files(flat_path),
+                partitioned, pruned_files, flat / partitioned))
+    finally:
+        spark.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del merge idempotente en PostgreSQL frente a la inserción directa.
+
+Para cada tamaño de lote escribe filas sintéticas con identidad (batch_id,
+row_seq) en una tabla de prueba con tres estrategias y mide tiempo, filas
+insertadas y tamaño de la tabla:
+
+    append        inserción directa (un reintento duplica las filas)
+    merge         staging + INSERT ... ON CONFLICT DO NOTHING y rollup, lote nuevo
+    merge-retry   el mismo lote otra vez (no debe agregar filas ni espacio)
+
+Uso:
+    spark-submit --jars postgresql-42.5.0.jar --driver-class-path postgresql-42.5.0.jar \\
+        benchmarks/bench_postgres_merge.py --jdbc-url jdbc:postgresql://localhost:5432/hive
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--existing-rows", type=int, default=1000000,
+                        help="filas previas en la tabla (el coste del índice crece con ella)")
+    parser.add_argument("--sink", choices=["jdbc", "copy"], default="jdbc")
+    parser.add_argument("--jdbc-url", default="jdbc:postgresql://localhost:5432/hive")
+    parser.add_argument("--user", default="hive")
+    parser.add_argument("--password", default="hive")
+    parser.add_argument("--table", default="bench_retail_sales_merge")
+    parser.add_argument("--master", default="local[*]")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # spark_common lee la conexión y el escritor del entorno al importarse
+    os.environ["POSTGRES_JDBC_URL"] = args.jdbc_url
+    os.environ["POSTGRES_USER"] = args.user
+    os.environ["POSTGRES_PASSWORD"] = args.password
+    os.environ["POSTGRES_SINK_MODE"] = args.sink
+    sys.path.insert(0, os.path.join(ROOT, "consumer"))
+
+    import spark_common
+    from pyspark.sql import SparkSession
+    from pyspark.sql.functions import col, concat, lit, rand
+
+    spark_common.POSTGRES_TABLE = args.table
+    spark_common.POSTGRES_ROLLUP_TABLE = args.table + "_rollup"
+    spark_common.POSTGRES_STATE_TABLE = args.table + "_state"
+    spark = SparkSession.builder.master(args.master).appName("BenchPostgresMerge").getOrCreate()
+    spark.sparkContext.setLogLevel("WARN")
+
+    def synthetic_df(rows, batch_id):
+        columns = []
+        for name, logical in spark_common.retail_schema.column_types().items():
+            if name == "batch_id":
+                expression = lit(batch_id)
+            elif name == "row_seq":
+                expression = col("id")
+            elif name == "date":
+                expression = lit("2024-01-01").cast("date")
+            elif logical == "double":
+                expression = (rand(seed=len(columns)) * 100).cast("double")
+            elif logical == "int":
+                expression = (col("id") % 2).cast("int")
+            else:
+                expression = concat(lit(name[:1].upper()), (col("id") % 50).cast("string"))
+            columns.append(expression.alias(name))
+        return spark.range(rows, numPartitions=4).select(columns).cache()
+
+    def query_value(sql):
+        connection = spark_common.jdbc_connection(spark)
+        try:
+            result = connection.createStatement().executeQuery(sql)
+            result.next()
+            return result.getLong(1)
+        finally:
+            connection.close()
+
+    def table_stats():
+        return (query_value("SELECT COUNT(*) FROM " + args.table),
+                query_value("SELECT pg_total_relation_size('{}')".format(args.table)))
+
+    spark_common.run_postgres_statements(spark, ["DROP TABLE IF EXISTS " + args.table,
+                                                 "DROP TABLE IF EXISTS " + spark_common.POSTGRES_ROLLUP_TABLE,
+                                                 "DROP TABLE IF EXISTS " + spark_common.POSTGRES_STATE_TABLE])
+    spark_common.ensure_postgres_table(spark)
+    spark_common.ensure_postgres_partitions(spark, synthetic_df(1, "partitions"))
+    try:
+        if args.existing_rows:
+            spark_common.write_postgres_rows(synthetic_df(args.existing_rows, "existing"), args.table)
+
+        print("{:>10} {:>12} {:>10} {:>12} {:>12} {:>14}".format(
+            "filas", "estrategia", "tiempo (s)", "filas/s", "insertadas", "crecimiento MB"))
+        for rows in args.rows:
+            df = synthetic_df(rows, "bench_{}".format(rows))
+            # append usa otro batch_id para no chocar con las filas del merge
+            df_append = synthetic_df(rows, "append_{}".format(rows))
+            df.count()
+            df_append.count()
+            strategies = [
+                ("append", lambda: spark_common.write_postgres_rows(df_append, args.table)),
+                ("merge", lambda: spark_common.merge_into_postgres(df)),
+                ("merge-retry", lambda: spark_common.merge_into_postgres(df)),
+            ]
+            for name, run in strategies:
+                rows_before, bytes_before = table_stats()
+                start = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - start
+                rows_after, bytes_after = table_stats()
+                print("{:>10} {:>12} {:>10.3f} {:>12,.0f} {:>12} {:>14.2f}".format(
+                    rows, name, elapsed, rows / elapsed, rows_after - rows_before,
+                    (bytes_after - bytes_before) / 1e6))
+            df.unpersist()
+            df_append.unpersist()
+    finally:
+        spark_common.run_postgres_statements(spark, ["DROP TABLE IF EXISTS " + args.table,
+                                                 "DROP TABLE IF EXISTS " + spark_common.POSTGRES_ROLLUP_TABLE,
+                                                 "DROP TABLE IF EXISTS " + spark_common.POSTGRES_STATE_TABLE])
+        spark.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de planes de consulta: retail_sales plana vs particionada con índices.
+
+Crea dos tablas de prueba con las mismas filas sintéticas (generadas en
+PostgreSQL con generate_series): la disposición anterior (fecha VARCHAR, sin
+índices) y la de postgres_schema (DATE, particiones mensuales, BRIN y
+B-tree). Ejecuta EXPLAIN ANALYZE de las consultas con los filtros del
+dashboard y muestra el tiempo, el nodo raíz del plan y las particiones leídas.
+
+Uso:
+    spark-submit --jars postgresql-42.5.0.jar --driver-class-path postgresql-42.5.0.jar \\
+        benchmarks/bench_postgres_plans.py --rows 1000000 --days 365
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CATEGORIES = ['Groceries', 'Toys', 'Electronics', 'Furniture', 'Clothing']
+REGIONS = ['North', 'South', 'East', 'West']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--range-days", type=int, default=7)
+    parser.add_argument("--jdbc-url", default="jdbc:postgresql://localhost:5432/hive")
+    parser.add_argument("--user", default="hive")
+    parser.add_argument("--password", default="hive")
+    parser.add_argument("--master", default="local[1]")
+    return parser.parse_args()
+
+
+def synthetic_select(rows, days, date_type):
+    """SELECT que genera filas con el esquema limpio, repartidas en `days` días"""
+    return """
+        SELECT CAST(DATE '2024-01-01' + (i % {days}) AS {date_type}) AS date,
+               'S' || (i % 5), 'P' || (i % 20),
+               (ARRAY{categories})[1 + i % {n_categories}],
+               (ARRAY{regions})[1 + (i / 7) % {n_regions}],
+               random() * 500, random() * 200, random() * 200, random() * 200,
+               5 + random() * 95, 0, 'Sunny', i % 2, 5 + random() * 95, 'Winter',
+               'bench', i
+        FROM generate_series(1, {rows}) AS i
+    """.format(days=days, date_type=date_type, rows=rows,
+               categories=CATEGORIES, n_categories=len(CATEGORIES),
+               regions=REGIONS, n_regions=len(REGIONS))
+
+
+def plan_summary(plan):
+    """(nodo raíz, relaciones leídas) de un plan JSON de EXPLAIN"""
+    relations = set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if "Relation Name" in node:
+            relations.add(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return plan["Node Type"], len(relations)
+
+
+def main():
+    args = parse_args()
+    os.environ["POSTGRES_JDBC_URL"] = args.jdbc_url
+    os.environ["POSTGRES_USER"] = args.user
+    os.environ["POSTGRES_PASSWORD"] = args.password
+    sys.path.insert(0, os.path.join(ROOT, "consumer"))
+
+    import postgres_schema
+    import spark_common
+    from pyspark.sql import SparkSession
+
+    spark = SparkSession.builder.master(args.master).appName("BenchPostgresPlans").getOrCreate()
+    spark.sparkContext.setLogLevel("WARN")
+    connection = spark_common.jdbc_connection(spark)
+
+    flat_table = "bench_sales_flat"
+    partitioned_table = "bench_sales_partitioned"
+    columns = ", ".join(spark_common.retail_schema.clean_column_names())
+    first_day = "2024-01-01"
+    last_day = "2024-01-{:02d}".format(min(args.range_days, 28))
+
+    queries = [
+        ("carga completa ORDER BY date DESC",
+         "SELECT * FROM {t} ORDER BY date DESC LIMIT 1000"),
+        ("rango de fechas + GROUP BY date",
+         "SELECT date, SUM(units_sold * price) FROM {t} "
+         "WHERE date BETWEEN '{a}' AND '{b}' GROUP BY date"),
+        ("categoría + rango de fechas",
+         "SELECT COUNT(*), SUM(units_sold) FROM {t} "
+         "WHERE category = 'Toys' AND date BETWEEN '{a}' AND '{b}'"),
+        ("región + rango de fechas",
+         "SELECT COUNT(*), SUM(units_sold) FROM {t} "
+         "WHERE region = 'West' AND date BETWEEN '{a}' AND '{b}'"),
+    ]
+
+    try:
+        statement = connection.createStatement()
+        for table in (flat_table, partitioned_table):
+            statement.executeUpdate("DROP TABLE IF EXISTS {} CASCADE".format(table))
+
+        print("Generando {:,} filas en {} días...".format(args.rows, args.days))
+        statement.executeUpdate("CREATE TABLE {} ({})".format(flat_table, ", ".join(
+            "{} {}".format(name, "VARCHAR(10)" if name == "date" else
+                           spark_common.retail_schema.POSTGRES_TYPES[logical])
+            for _, name, logical in spark_common.retail_schema.get_columns())))
+        statement.executeUpdate("INSERT INTO {} ({}) {}".format(
+            flat_table, columns, synthetic_select(args.rows, args.days, "VARCHAR(10)")))
+
+        postgres_schema.migrate(connection, partitioned_table, premake_months=0)
+        postgres_schema.ensure_partitions(connection, partitioned_table, postgres_schema.query_column(
+            connection, "SELECT DISTINCT DATE '2024-01-01' + d FROM generate_series(0, {}) AS d".format(
+                args.days - 1)))
+        statement.executeUpdate("INSERT INTO {} ({}) {}".format(
+            partitioned_table, columns, synthetic_select(args.rows, args.days, "DATE")))
+        for table in (flat_table, partitioned_table):
+            statement.execute("ANALYZE " + table)
+
+        print("{:<36} {:<12} {:>10} {:<28} {:>12}".format(
+            "consulta", "tabla", "tiempo ms", "nodo raíz", "relaciones"))
+        for label, template in queries:
+            for name, table in (("plana", flat_table), ("particionada", partitioned_table)):
+                sql = template.format(t=table, a=first_day, b=last_day)
+                result = statement.executeQuery("EXPLAIN (ANALYZE, FORMAT JSON) " + sql)
+                result.next()
+                explain = json.loads(result.getString(1))[0]
+                node, relations = plan_summary(explain["Plan"])
+                print("{:<36} {:<12} {:>10.2f} {:<28} {:>12}".format(
+                    label, name, explain["Execution Time"], node, relations))
+    finally:
+        statement = connection.createStatement()
+        for table in (flat_table, partitioned_table):
+            statement.executeUpdate("DROP TABLE IF EXISTS {} CASCADE".format(table))
+        connection.close()
+        spark.stop()
+
+
+if __name__ == "__main__":
+    main()
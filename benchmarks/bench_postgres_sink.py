@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de escritura en PostgreSQL: JDBC por defecto vs JDBC ajustado vs COPY.
+
+Escribe filas sintéticas con el esquema limpio en una tabla de una instancia
+PostgreSQL local (o la indicada con --jdbc-url) usando los escritores de
+spark_common y mide filas por segundo. La tabla se vacía antes de cada
+escritura. Requiere el driver JDBC y psycopg2:
+
+Uso:
+    spark-submit --jars postgresql-42.5.0.jar --driver-class-path postgresql-42.5.0.jar \\
+        benchmarks/bench_postgres_sink.py --jdbc-url jdbc:postgresql://localhost:5432/hive
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--modes", nargs="+", default=["jdbc-default", "jdbc", "copy"])
+    parser.add_argument("--jdbc-url", default="jdbc:postgresql://localhost:5432/hive")
+    parser.add_argument("--user", default="hive")
+    parser.add_argument("--password", default="hive")
+    parser.add_argument("--table", default="bench_retail_sales")
+    parser.add_argument("--partitions", type=int, default=8, help="particiones del DataFrame de entrada")
+    parser.add_argument("--write-partitions", type=int, default=4, help="conexiones simultáneas")
+    parser.add_argument("--master", default="local[*]")
+    parser.add_argument("--repeats", type=int, default=2)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # spark_common lee la conexión del entorno al importarse
+    os.environ["POSTGRES_JDBC_URL"] = args.jdbc_url
+    os.environ["POSTGRES_USER"] = args.user
+    os.environ["POSTGRES_PASSWORD"] = args.password
+    os.environ["POSTGRES_WRITE_PARTITIONS"] = str(args.write_partitions)
+    sys.path.insert(0, os.path.join(ROOT, "consumer"))
+
+    import spark_common
+    from pyspark.sql import SparkSession
+    from pyspark.sql.functions import col, concat, lit, rand
+
+    spark_common.POSTGRES_TABLE = args.table
+    spark_common.POSTGRES_ROLLUP_TABLE = args.table + "_rollup"
+    spark_common.POSTGRES_STATE_TABLE = args.table + "_state"
+    spark = SparkSession.builder.master(args.master).appName("BenchPostgresSink").getOrCreate()
+    spark.sparkContext.setLogLevel("WARN")
+
+    def synthetic_df(rows):
+        ids = spark.range(rows, numPartitions=args.partitions)
+        columns = []
+        for name, logical in spark_common.retail_schema.column_types().items():
+            if logical == "double":
+                expression = (rand(seed=len(columns)) * 100).cast("double")
+            elif logical == "int":
+                expression = (col("id") % 2).cast("int")
+            elif logical == "long":
+                expression = col("id")
+            elif name == "date":
+                expression = lit("2024-01-01").cast("date")
+            else:
+                expression = concat(lit(name[:1].upper()), (col("id") % 50).cast("string"))
+            columns.append(expression.alias(name))
+        return ids.select(columns).cache()
+
+    def write_default_jdbc(df):
+        """Escritor JDBC tal como lo usaba el consumer, sin ajustes"""
+        df.write.mode("append") \
+            .option("createTableColumnTypes", spark_common.POSTGRES_COLUMN_TYPES) \
+            .jdbc(url=args.jdbc_url, table=args.table,
+                  properties={"user": args.user, "password": args.password,
+                              "driver": "org.postgresql.Driver"})
+
+    writers = {
+        "jdbc-default": write_default_jdbc,
+        "jdbc": spark_common.write_to_postgres_jdbc,
+        "copy": spark_common.write_to_postgres_copy,
+    }
+
+    def truncate():
+        spark_common.ensure_postgres_table(spark)
+        connection = spark_common.jdbc_connection(spark)
+        try:
+            connection.createStatement().execute("TRUNCATE TABLE " + args.table)
+        finally:
+            connection.close()
+
+    try:
+        print("{:>10} {:>14} {:>10} {:>14}".format("filas", "modo", "mejor (s)", "filas/s"))
+        for rows in args.rows:
+            df = synthetic_df(rows)
+            df.count()
+            spark_common.ensure_postgres_table(spark)
+            spark_common.ensure_postgres_partitions(spark, df)
+            for mode in args.modes:
+                best = None
+                for _ in range(args.repeats):
+                    truncate()
+                    start = time.perf_counter()
+                    writers[mode](df)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                print("{:>10} {:>14} {:>10.3f} {:>14,.0f}".format(rows, mode, best, rows / best))
+            df.unpersist()
+    finally:
+        truncate()
+        spark_common.run_postgres_statements(spark, ["DROP TABLE IF EXISTS " + spark_common.POSTGRES_ROLLUP_TABLE,
+                                                     "DROP TABLE IF EXISTS " + spark_common.POSTGRES_STATE_TABLE])
+        spark.stop()
+
+
+if __name__ == "__main__":
+    main()
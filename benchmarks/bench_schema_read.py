@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de lectura: inferSchema vs esquema declarado (retail_schema).
+
+Genera lotes CSV sintéticos con las columnas del esquema registrado y mide el
+tiempo de leer y materializar todas las columnas con Spark en modo local.
+
+Uso:
+    spark-submit benchmarks/bench_schema_read.py --rows 10000 100000 1000000
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+import retail_schema
+
+from pyspark.sql import SparkSession
+
+CATEGORIES = ['Groceries', 'Toys', 'Electronics', 'Furniture', 'Clothing']
+REGIONS = ['North', 'South', 'East', 'West']
+WEATHERS = ['Sunny', 'Cloudy', 'Rainy', 'Snowy']
+SEASONS = ['Spring', 'Summer', 'Autumn', 'Winter']
+# Los lotes sintéticos no llevan identidad de fila: columnas de la v1
+BATCH_SCHEMA_VERSION = 1
+
+
+def write_synthetic_csv(path, rows, seed=42):
+    """Escribir un CSV con el formato que produce el producer"""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(retail_schema.raw_column_names(BATCH_SCHEMA_VERSION))
+        for _ in range(rows):
+            writer.writerow([
+                "2024-0{}-{:02d}".format(rng.randint(1, 9), rng.randint(1, 28)),
+                "S{:03d}".format(rng.randint(1, 5)),
+                "P{:04d}".format(rng.randint(1, 20)),
+                rng.choice(CATEGORIES),
+                rng.choice(REGIONS),
+                float(rng.randint(0, 500)),
+                float(rng.randint(0, 200)),
+                float(rng.randint(0, 200)),
+                round(rng.uniform(0, 200), 2),
+                round(rng.uniform(5, 100), 2),
+                rng.choice([0, 5, 10, 15, 20]),
+                rng.choice(WEATHERS),
+                rng.randint(0, 1),
+                round(rng.uniform(5, 100), 2),
+                rng.choice(SEASONS),
+            ])
+
+
+def time_read(spark, path, declared, repeats):
+    """Mejor tiempo (s) de leer y materializar todas las columnas"""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        reader = spark.read
+        if declared:
+            reader = reader.schema(retail_schema.spark_read_schema(BATCH_SCHEMA_VERSION)) \
+                           .options(**retail_schema.spark_read_options("drop"))
+        else:
+            reader = reader.option("header", "true").option("inferSchema", "true")
+        # El formato noop fuerza el parseo completo sin coste de escritura
+        reader.csv(path).write.format("noop").mode("overwrite").save()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--master", default="local[*]")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    spark = SparkSession.builder.master(args.master).appName("BenchSchemaRead").getOrCreate()
+    spark.sparkContext.setLogLevel("WARN")
+
+    workdir = tempfile.mkdtemp(prefix="bench_schema_")
+    try:
+        print("{:>10} {:>14} {:>14} {:>14} {:>14} {:>8}".format(
+            "filas", "infer (s)", "declarado (s)", "infer fil/s", "decl. fil/s", "mejora"))
+        for rows in args.rows:
+            path = os.path.join(workdir, "retail_batch_{}.csv".format(rows))
+            write_synthetic_csv(path, rows)
+            inferred = time_read(spark, path, declared=False, repeats=args.repeats)
+            declared = time_read(spark, path, declared=True, repeats=args.repeats)
+            print("{:>10} {:>14.3f} {:>14.3f} {:>14,.0f} {:>14,.0f} {:>7.2f}x".format(
+                rows, inferred, declared, rows / inferred, rows / declared, inferred / declared))
+    finally:
+        spark.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark del camino de ejecución del lote: antes vs después del ajuste.
+
+Genera --files lotes CSV sintéticos (muchos archivos chicos, como los deja el
+producer) y los procesa en modo local con los mismos pasos del job batch,
+midiendo el tiempo de cada etapa:
+
+    plan       construir el DataFrame limpio y su plan optimizado
+    cache      ajustar particiones y materializar el lote persistido (solo después)
+    show       printSchema + show(2)
+    hive       escritura particionada por fecha (Parquet en un directorio
+               temporal, en lugar de insertInto)
+    postgres   meses del lote + métricas derivadas (formato noop, en lugar
+               del staging JDBC)
+
+antes:   limpieza con withColumn encadenados, sin persist, una partición
+         por archivo, shuffle de 200 particiones y sin AQE (por defecto)
+después: spark_common.clean_retail_df (una proyección), size_partitions,
+         persist_batch materializado una vez y los ajustes de shuffle/AQE
+
+No requiere Hive ni PostgreSQL.
+
+Uso:
+    spark-submit benchmarks/bench_spark_tuning.py --files 50 --rows-per-file 20000
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "consumer"))
+
+import spark_common
+from spark_common import retail_schema
+
+from pyspark.sql import SparkSession
+from pyspark.sql.functions import (coalesce, col, current_date, date_format, lit, regexp_extract,
+                                   substring, trim, when, xxhash64)
+
+CATEGORIES = ['Groceries', 'Toys', 'Electronics', 'Furniture', 'Clothing']
+REGIONS = ['North', 'South', 'East', 'West']
+WEATHERS = ['Sunny', 'Cloudy', 'Rainy', 'Snowy']
+SEASONS = ['Spring', 'Summer', 'Autumn', 'Winter']
+STAGES = ["plan", "cache", "show", "hive", "postgres"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--rows-per-file", type=int, default=20000)
+    parser.add_argument("--target-partition-rows", type=int, default=spark_common.TARGET_PARTITION_ROWS)
+    parser.add_argument("--shuffle-partitions", type=int, default=8)
+    parser.add_argument("--master", default="local[*]")
+    parser.add_argument("--repeats", type=int, default=3)
+    return parser.parse_args()
+
+
+def write_synthetic_csv(path, rows, batch, seed):
+    """Un lote CSV con el formato que produce el producer"""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(retail_schema.raw_column_names())
+        for row_seq in range(rows):
+            writer.writerow([
+                "2024-0{}-{:02d}".format(rng.randint(1, 9), rng.randint(1, 28)),
+                "S{:03d}".format(rng.randint(1, 5)),
+                "P{:04d}".format(rng.randint(1, 20)),
+                rng.choice(CATEGORIES),
+                rng.choice(REGIONS),
+                float(rng.randint(0, 500)),
+                float(rng.randint(0, 200)),
+                float(rng.randint(0, 200)),
+                round(rng.uniform(0, 200), 2),
+                round(rng.uniform(5, 100), 2),
+                rng.choice([0, 5, 10, 15, 20]),
+                rng.choice(WEATHERS),
+                rng.randint(0, 1),
+                round(rng.uniform(5, 100), 2),
+                rng.choice(SEASONS),
+                batch,
+                row_seq,
+            ])
+
+
+def clean_chained(df):
+    """La limpieza anterior: un withColumn/withColumnRenamed por columna"""
+    clean_df = df
+    for column in clean_df.columns:
+        new_column = retail_schema.normalize_column_name(column)
+        if new_column != column:
+            clean_df = clean_df.withColumnRenamed(column, new_column)
+    source_batch = regexp_extract(col(spark_common.SOURCE_FILE_COLUMN), r"retail_batch_([^/]+)\.\w+$", 1)
+    content_hash = xxhash64(*[col(name) for name in retail_schema.data_column_names()])
+    clean_df = clean_df \
+        .withColumn("batch_id", coalesce(col("batch_id").cast("string"), source_batch)) \
+        .withColumn("row_seq", coalesce(col("row_seq").cast("long"), content_hash))
+    for col_name in retail_schema.columns_of_type("double"):
+        clean_df = clean_df.withColumn(col_name, coalesce(col(col_name), lit(0.0)))
+    for col_name in retail_schema.columns_of_type("string"):
+        if col_name not in retail_schema.IDENTITY_COLUMNS:
+            clean_df = clean_df.withColumn(col_name,
+                when(col(col_name).isNull(), "Unknown").otherwise(trim(col(col_name))))
+    clean_df = clean_df.withColumn('holiday_promotion', when(col('holiday_promotion') == 1, 1).otherwise(0))
+    clean_df = clean_df.withColumn('date',
+        date_format(coalesce(col('date'), current_date()), retail_schema.DATE_FORMAT))
+    return clean_df.select(retail_schema.clean_column_names())
+
+
+def run_pipeline(spark, input_dir, output_dir, tuned, shuffle_partitions):
+    """Tiempos (s) por etapa y particiones del lote limpio"""
+    spark.conf.set("spark.sql.shuffle.partitions", str(shuffle_partitions if tuned else 200))
+    spark.conf.set("spark.sql.adaptive.enabled", "true" if tuned else "false")
+    times = {}
+
+    df = spark_common.read_retail_batches(spark, input_dir + "/retail_batch_*.csv").cache()
+    record_count, malformed_count = spark_common.count_batch_rows(df)
+    valid_df, _ = spark_common.split_malformed(df)
+
+    started = time.perf_counter()
+    if tuned:
+        clean_df = spark_common.clean_retail_df(valid_df)
+    else:
+        clean_df = clean_chained(valid_df)
+    clean_df._jdf.queryExecution().optimizedPlan()
+    times["plan"] = time.perf_counter() - started
+    started = time.perf_counter()
+    if tuned:
+        clean_df = spark_common.persist_batch(
+            spark_common.size_partitions(clean_df, record_count - malformed_count,
+                                         spark_common.TARGET_PARTITION_ROWS))
+        clean_df.count()
+        df.unpersist()
+    times["cache"] = time.perf_counter() - started
+    partitions = clean_df.rdd.getNumPartitions()
+
+    started = time.perf_counter()
+    clean_df.printSchema()
+    clean_df.show(2)
+    times["show"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    clean_df.write.mode("overwrite").partitionBy(*spark_common.HIVE_PARTITION_COLUMNS) \
+        .parquet(output_dir)
+    times["hive"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    clean_df.select(substring(col("date"), 1, 7)).distinct().collect()
+    spark_common.postgres_frame(clean_df).write.format("noop").mode("overwrite").save()
+    times["postgres"] = time.perf_counter() - started
+
+    clean_df.unpersist()
+    df.unpersist()
+    written_files = sum(len([name for name in names if name.endswith(".parquet")])
+                        for _, _, names in os.walk(output_dir))
+    return times, partitions, written_files
+
+
+def main():
+    args = parse_args()
+    spark_common.TARGET_PARTITION_ROWS = args.target_partition_rows
+    spark = SparkSession.builder.master(args.master).appName("BenchSparkTuning").getOrCreate()
+    spark.sparkContext.setLogLevel("WARN")
+
+    workdir = tempfile.mkdtemp(prefix="bench_tuning_")
+    try:
+        input_dir = os.path.join(workdir, "input")
+        os.makedirs(input_dir)
+        for index in range(args.files):
+            write_synthetic_csv(os.path.join(input_dir, "retail_batch_{:04d}.csv".format(index)),
+                                args.rows_per_file, "bench_{:04d}".format(index), seed=index)
+        rows = args.files * args.rows_per_file
+        print("{} archivos, {:,} filas, master {}".format(args.files, rows, args.master))
+
+        print("{:>8} {:>11} {:>8} {} {:>10} {:>10}".format(
+            "camino", "particiones", "archivos", " ".join("{:>10}".format(s + " (s)") for s in STAGES),
+            "total (s)", "filas/s"))
+        results = {}
+        for tuned in (False, True):
+            best = None
+            for repeat in range(args.repeats):
+                times, partitions, files = run_pipeline(
+                    spark, input_dir, os.path.join(workdir, "output"), tuned, args.shuffle_partitions)
+                if best is None or sum(times.values()) < sum(best[0].values()):
+                    best = (times, partitions, files)
+            times, partitions, files = best
+            total = sum(times.values())
+            results[tuned] = total
+            print("{:>8} {:>11} {:>8} {} {:>10.3f} {:>10,.0f}".format(
+                "después" if tuned else "antes", partitions, files,
+                " ".join("{:>10.3f}".format(times[s]) for s in STAGES), total, rows / total))
+        print("mejora: {:.2f}x".format(results[False] / results[True]))
+    finally:
+        spark.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
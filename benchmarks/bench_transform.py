@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de throughput del job batch en una sola máquina.
+
+Genera lotes CSV sintéticos en un directorio local y los procesa con
+spark_processing.run (lectura, limpieza, persist y destinos) en modo local,
+sin Hive ni PostgreSQL. Por defecto usa el destino noop, que materializa el
+lote sin escribirlo, así que el tiempo es el de la transformación; con
+--sinks parquet también cuenta la escritura. Reporta los tiempos de lectura
+y de cada destino que deja la entrada del ledger, y las filas por segundo.
+
+Uso:
+    spark-submit benchmarks/bench_transform.py --rows 100000 1000000 --files 20
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "consumer"))
+
+import spark_processing
+from bench_spark_tuning import write_synthetic_csv
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--sinks", default="noop")
+    parser.add_argument("--master", default="local[*]")
+    parser.add_argument("--repeats", type=int, default=3)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="bench_transform_")
+    spark = None
+    try:
+        input_dir = os.path.join(workdir, "input")
+        runner_args = spark_processing.parse_args([
+            "--master", args.master, "--input", "file://" + input_dir, "--keep-files",
+            "--sinks", args.sinks, "--parquet-dir", "file://" + os.path.join(workdir, "parquet"),
+            "--quarantine-dir", "file://" + os.path.join(workdir, "quarantine")])
+        spark = spark_processing.build_spark_session("BenchTransform", master=args.master, hive=False)
+
+        print("{:>10} {:>12} {} {:>10} {:>12}".format(
+            "filas", "lectura (s)", " ".join("{:>12}".format(name + " (s)") for name in runner_args.sinks),
+            "total (s)", "filas/s"))
+        for rows in args.rows:
+            shutil.rmtree(input_dir, ignore_errors=True)
+            os.makedirs(input_dir)
+            rows_per_file = -(-rows // args.files)
+            for index in range(args.files):
+                write_synthetic_csv(os.path.join(input_dir, "retail_batch_{:04d}.csv".format(index)),
+                                    rows_per_file, "bench_{:04d}".format(index), seed=index)
+
+            best = None
+            for _ in range(args.repeats):
+                entry = spark_processing.run(spark, runner_args)
+                if best is None or entry["total_seconds"] < best["total_seconds"]:
+                    best = entry
+            print("{:>10,} {:>12.3f} {} {:>10.3f} {:>12,.0f}".format(
+                best["rows_read"], best["read_seconds"],
+                " ".join("{:>12.3f}".format(best[name + "_seconds"]) for name in runner_args.sinks),
+                best["total_seconds"], best["rows_read"] / best["total_seconds"]))
+    finally:
+        if spark is not None:
+            spark.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
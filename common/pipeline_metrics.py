@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas de tiempo por etapa del pipeline, en JSON lines.
+
+Cada servicio agrega un evento por etapa y lote al archivo de
+PIPELINE_METRICS_FILE (vacío desactiva el registro):
+
+    {"ts": 1718000000.123, "service": "consumer", "stage": "postgres_write",
+     "batch_id": "batch_20240610_101500_1a2b3c4d", "seconds": 1.84, "rows": 1200, "ok": true}
+
+Etapas y lote al que se refieren:
+
+    producer   generate, hdfs_write               shard (Batch_ID de las filas)
+    consumer   detect, end_to_end                 shard (uno por archivo)
+               read, transform, hive_write,       lote Spark (batch_key del ledger)
+               postgres_write, file_move
+    dashboard  dashboard_query                    versión de datos consultada
+
+detect es el tiempo desde que el archivo quedó en /data/input hasta que el
+consumer lo lista, y end_to_end desde que el producer generó el shard hasta
+que sus filas son visibles en PostgreSQL (el shard lleva la hora en el nombre).
+
+Un proceso de un solo hilo o varios procesos pueden escribir el mismo
+archivo: cada evento es una sola escritura en modo append. Al superar
+PIPELINE_METRICS_MAX_BYTES el archivo se renombra a <archivo>.1.
+
+Uso del reporte (p50/p95/p99 y filas/s por etapa) y del endpoint Prometheus:
+
+    python common/pipeline_metrics.py report metrics/*.jsonl --since 60
+    python common/pipeline_metrics.py serve metrics/*.jsonl --port 9108
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+METRICS_FILE = os.environ.get("PIPELINE_METRICS_FILE", "")
+MAX_BYTES = int(os.environ.get("PIPELINE_METRICS_MAX_BYTES", str(64 * 1024 * 1024)))
+
+STAGES = ["generate", "hdfs_write", "detect", "read", "transform", "hive_write",
+          "postgres_write", "file_move", "end_to_end", "dashboard_query"]
+QUANTILES = [0.5, 0.95, 0.99]
+
+# retail_batch_w00_12_20240610_101500_123456_1a2b3c4d.csv -> Batch_ID y hora de generación
+SHARD_PATTERN = re.compile(r"retail_batch_(.+?)\.\w+$")
+SHARD_TIME_PATTERN = re.compile(r"_(\d{8}_\d{6}_\d{6})_[0-9a-f]+$")
+
+
+def shard_batch_id(path):
+    """Batch_ID de un shard del producer a partir de su nombre o ruta (None si no lo es)"""
+    match = SHARD_PATTERN.search(path.rsplit("/", 1)[-1])
+    return match.group(1) if match else None
+
+
+def shard_generated_at(batch_id):
+    """Hora de generación (epoch) que el producer puso en el Batch_ID, o None"""
+    match = SHARD_TIME_PATTERN.search(batch_id or "")
+    if not match:
+        return None
+    # El producer usa la hora local (datetime.now())
+    generated = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S_%f")
+    return time.mktime(generated.timetuple()) + generated.microsecond / 1e6
+
+
+def json_value(value):
+    """Escalares de numpy (p. ej. tamaños de lote) como tipos de Python"""
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def record(service, stage, batch_id, seconds, rows=None, **fields):
+    """Agrega un evento al archivo de métricas; no falla si no se puede escribir"""
+    if not METRICS_FILE:
+        return
+    event = {"ts": round(time.time(), 3), "service": service, "stage": stage,
+             "batch_id": batch_id, "seconds": round(seconds, 6), "rows": rows}
+    event.update(fields)
+    event.setdefault("ok", True)
+    try:
+        if MAX_BYTES > 0 and os.path.exists(METRICS_FILE) and os.path.getsize(METRICS_FILE) > MAX_BYTES:
+            os.replace(METRICS_FILE, METRICS_FILE + ".1")
+        with open(METRICS_FILE, "a") as f:
+            f.write(json.dumps(event, sort_keys=True, default=json_value) + "\n")
+    except (OSError, ValueError) as e:
+        print("⚠️  No se pudo registrar la métrica {}: {}".format(stage, e))
+
+
+@contextlib.contextmanager
+def timed(service, stage, batch_id, **fields):
+    """
+    Mide el bloque y registra un evento al salir. El bloque recibe el dict de
+    campos para completar rows u otros; si lanza una excepción, se registra
+    con ok=False y se propaga.
+    """
+    fields = dict(fields)
+    started = time.time()
+    try:
+        yield fields
+    except BaseException:
+        fields["ok"] = False
+        raise
+    finally:
+        rows = fields.pop("rows", None)
+        record(service, stage, batch_id, time.time() - started, rows, **fields)
+
+
+def record_end_to_end(service, paths, visible_at=None):
+    """Un evento end_to_end por shard de `paths`: de su generación a `visible_at` (ahora)"""
+    visible_at = visible_at or time.time()
+    for path in paths:
+        batch_id = shard_batch_id(path)
+        generated_at = shard_generated_at(batch_id)
+        if generated_at is not None:
+            record(service, "end_to_end", batch_id, visible_at - generated_at)
+
+
+def read_events(paths, since=None):
+    """Eventos de los archivos dados (se admiten comodines), opcionalmente desde un epoch"""
+    events = []
+    for pattern in paths:
+        for path in sorted(glob.glob(pattern)) or [pattern]:
+            if not os.path.exists(path):
+                continue
+            with open(path) as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue  # línea cortada por una escritura en curso
+                    if since is None or event.get("ts", 0) >= since:
+                        events.append(event)
+    return events
+
+
+def quantile(values, q):
+    """Cuantil q de una lista ordenada, con interpolación lineal"""
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(events):
+    """
+    Resumen por (servicio, etapa): eventos, errores, cuantiles de segundos,
+    filas y filas/s (filas totales sobre segundos totales de la etapa)
+    """
+    groups = {}
+    for event in events:
+        groups.setdefault((event.get("service"), event.get("stage")), []).append(event)
+
+    order = dict((stage, index) for index, stage in enumerate(STAGES))
+    summary = []
+    for (service, stage), group in sorted(groups.items(), key=lambda item: (
+            order.get(item[0][1], len(STAGES)), item[0][0] or "", item[0][1] or "")):
+        seconds = sorted(event["seconds"] for event in group if event.get("seconds") is not None)
+        rows = sum(event.get("rows") or 0 for event in group)
+        total_seconds = sum(seconds)
+        summary.append({
+            "service": service,
+            "stage": stage,
+            "count": len(group),
+            "errors": sum(1 for event in group if not event.get("ok", True)),
+            "quantiles": dict((q, quantile(seconds, q)) for q in QUANTILES),
+            "max": seconds[-1] if seconds else None,
+            "seconds_sum": total_seconds,
+            "rows": rows,
+            "rows_per_second": rows / total_seconds if rows and total_seconds > 0 else None,
+        })
+    return summary
+
+
+def format_table(summary):
+    lines = ["{:<10} {:<16} {:>7} {:>6} {:>10} {:>10} {:>10} {:>10} {:>12} {:>12}".format(
+        "servicio", "etapa", "eventos", "error", "p50 (s)", "p95 (s)", "p99 (s)", "max (s)",
+        "filas", "filas/s")]
+    for item in summary:
+        lines.append("{:<10} {:<16} {:>7} {:>6} {} {:>10.3f} {:>12,} {:>12}".format(
+            item["service"], item["stage"], item["count"], item["errors"],
+            " ".join("{:>10.3f}".format(item["quantiles"][q]) for q in QUANTILES),
+            item["max"], item["rows"],
+            "{:,.0f}".format(item["rows_per_second"]) if item["rows_per_second"] else "-"))
+    return "\n".join(lines)
+
+
+def format_prometheus(summary):
+    """Texto de exposición de Prometheus: un summary de segundos y un contador de filas por etapa"""
+    lines = [
+        "# HELP pipeline_stage_seconds Duración de cada etapa del pipeline por lote.",
+        "# TYPE pipeline_stage_seconds summary",
+    ]
+    for item in summary:
+        labels = 'service="{}",stage="{}"'.format(item["service"], item["stage"])
+        for q in QUANTILES:
+            lines.append('pipeline_stage_seconds{{{},quantile="{}"}} {}'.format(
+                labels, q, item["quantiles"][q]))
+        lines.append("pipeline_stage_seconds_sum{{{}}} {}".format(labels, item["seconds_sum"]))
+        lines.append("pipeline_stage_seconds_count{{{}}} {}".format(labels, item["count"]))
+    lines += [
+        "# HELP pipeline_stage_rows_total Filas procesadas por cada etapa.",
+        "# TYPE pipeline_stage_rows_total counter",
+    ]
+    for item in summary:
+        lines.append('pipeline_stage_rows_total{{service="{}",stage="{}"}} {}'.format(
+            item["service"], item["stage"], item["rows"]))
+    lines += [
+        "# HELP pipeline_stage_errors_total Lotes cuya etapa terminó con error.",
+        "# TYPE pipeline_stage_errors_total counter",
+    ]
+    for item in summary:
+        lines.append('pipeline_stage_errors_total{{service="{}",stage="{}"}} {}'.format(
+            item["service"], item["stage"], item["errors"]))
+    return "\n".join(lines) + "\n"
+
+
+def serve(paths, port, window_seconds):
+    """Endpoint /metrics en formato Prometheus, recalculado desde los archivos en cada consulta"""
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            since = time.time() - window_seconds if window_seconds else None
+            body = format_prometheus(summarize(read_events(paths, since))).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    print("Métricas del pipeline en http://0.0.0.0:{}/metrics ({})".format(port, ", ".join(paths)))
+    HTTPServer(("", port), MetricsHandler).serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reporte de métricas de tiempo del pipeline")
+    commands = parser.add_subparsers(dest="command")
+    report = commands.add_parser("report", help="p50/p95/p99 y filas/s por etapa")
+    report.add_argument("paths", nargs="+")
+    report.add_argument("--since", type=float, default=None, help="solo los últimos N minutos")
+    report.add_argument("--format", choices=["table", "prometheus", "json"], default="table")
+    server = commands.add_parser("serve", help="endpoint HTTP /metrics para Prometheus")
+    server.add_argument("paths", nargs="+")
+    server.add_argument("--port", type=int, default=9108)
+    # Con ventana, los contadores dejan de ser monótonos: solo para mirar a mano
+    server.add_argument("--window", type=float, default=0,
+                        help="minutos de eventos que resume cada consulta (0: todos)")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        since = time.time() - args.since * 60 if args.since else None
+        summary = summarize(read_events(args.paths, since))
+        if args.format == "prometheus":
+            sys.stdout.write(format_prometheus(summary))
+        elif args.format == "json":
+            print(json.dumps(summary, indent=2, sort_keys=True))
+        else:
+            print(format_table(summary))
+    elif args.command == "serve":
+        serve(args.paths, args.port, args.window * 60)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas derivadas de las ventas retail, compartidas por el consumer y el dashboard.
+
+Los costos logísticos son simulados: un factor por región por un factor por
+categoría por el nivel de inventario. Los factores se leen de un archivo
+JSON (logistics_costs.json junto a este módulo, o el de LOGISTICS_COSTS_FILE)
+para poder ajustarlos sin tocar el código.
+
+Las métricas por fila (DERIVED_COLUMNS) son expresiones SQL válidas en Spark
+y en PostgreSQL: el consumer las calcula una vez al ingerir cada lote y las
+guarda como columnas de retail_sales, y los rollups suman esas columnas. El
+dashboard solo las lee.
+"""
+import json
+import os
+
+LOGISTICS_COSTS_FILE = os.environ.get(
+    "LOGISTICS_COSTS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logistics_costs.json"))
+
+
+def load_logistics_costs(path=LOGISTICS_COSTS_FILE):
+    """Tabla de costos: {"regions": {...}, "categories": {...}, "default_cost": x, "inventory_unit_cost": y}"""
+    with open(path) as f:
+        return json.load(f)
+
+
+_costs = load_logistics_costs()
+# Costos base por región
+REGION_LOGISTICS_COSTS = _costs["regions"]
+# Costos por categoría
+CATEGORY_LOGISTICS_COSTS = _costs["categories"]
+# Factor para regiones o categorías sin costo definido
+DEFAULT_LOGISTICS_COST = _costs["default_cost"]
+# Costo por unidad de inventario
+INVENTORY_UNIT_COST = _costs["inventory_unit_cost"]
+
+
+def cost_case_sql(column, costs):
+    """CASE que traduce `column` a su factor de costo"""
+    branches = " ".join("WHEN '{}' THEN {}".format(key.replace("'", "''"), value)
+                        for key, value in sorted(costs.items()))
+    return "(CASE {} {} ELSE {} END)".format(column, branches, DEFAULT_LOGISTICS_COST)
+
+
+def logistics_cost_sql():
+    return "{} * {} * inventory_level * {}".format(
+        cost_case_sql("region", REGION_LOGISTICS_COSTS),
+        cost_case_sql("category", CATEGORY_LOGISTICS_COSTS),
+        INVENTORY_UNIT_COST)
+
+
+# Expresiones SQL por fila sobre las columnas del lote
+REVENUE_SQL = "units_sold * price"
+FORECAST_ACCURACY_SQL = (
+    "CASE WHEN demand_forecast > 0 "
+    "THEN (1 - ABS(units_sold - demand_forecast) / demand_forecast) * 100 ELSE 0 END")
+INVENTORY_TURNOVER_SQL = (
+    "units_sold / CASE WHEN inventory_level = 0 THEN 1 ELSE inventory_level END")
+PRICING_EFFICIENCY_SQL = (
+    "(price - competitor_pricing) / "
+    "CASE WHEN competitor_pricing = 0 THEN 1 ELSE competitor_pricing END * 100")
+
+# Columnas derivadas que el consumer calcula al ingerir y guarda en retail_sales
+DERIVED_COLUMNS = [
+    ("revenue", REVENUE_SQL),
+    ("discount_amount", "({}) * discount".format(REVENUE_SQL)),
+    ("forecast_accuracy", FORECAST_ACCURACY_SQL),
+    ("inventory_turnover", INVENTORY_TURNOVER_SQL),
+    ("pricing_efficiency", PRICING_EFFICIENCY_SQL),
+    ("promotion_efficiency", "units_sold * holiday_promotion"),
+    ("logistics_cost", logistics_cost_sql()),
+]
+
+# Dimensiones y medidas del rollup diario. Cada medida es la suma de una
+# expresión por fila de retail_sales (incluidas las columnas derivadas); los
+# promedios se obtienen dividiendo por row_count (o por promo_rows en las
+# medidas de promoción).
+ROLLUP_DIMENSIONS = ["date", "region", "category"]
+ROLLUP_MEASURES = [
+    ("row_count", "1"),
+    ("units_sold", "units_sold"),
+    ("units_ordered", "units_ordered"),
+    ("revenue", "revenue"),
+    ("discount_amount", "discount_amount"),
+    ("inventory_level", "inventory_level"),
+    ("demand_forecast", "demand_forecast"),
+    ("forecast_error", "ABS(units_sold - demand_forecast)"),
+    ("forecast_accuracy", "forecast_accuracy"),
+    ("inventory_turnover", "inventory_turnover"),
+    ("pricing_efficiency", "pricing_efficiency"),
+    ("logistics_cost", "logistics_cost"),
+    ("promo_rows", "holiday_promotion"),
+    ("promo_units_sold", "promotion_efficiency"),
+    ("promo_revenue", "revenue * holiday_promotion"),
+    ("promo_inventory_turnover", "inventory_turnover * holiday_promotion"),
+    ("price", "price"),
+    ("discount", "discount"),
+    ("competitor_pricing", "competitor_pricing"),
+]
+
+# Columnas de las estadísticas descriptivas del dashboard. El rollup guarda
+# además su suma de cuadrados (para el desvío estándar) y sus extremos del
+# día, que al combinarse se toman con MIN/MAX en lugar de sumarse.
+DESCRIBE_COLUMNS = ["inventory_level", "units_sold", "units_ordered", "demand_forecast", "price",
+                    "discount", "competitor_pricing"]
+ROLLUP_MEASURES += [(name + "_sq", "{0} * {0}".format(name)) for name in DESCRIBE_COLUMNS]
+ROLLUP_EXTREMES = [("{}_{}".format(name, extreme), extreme.upper(), name)
+                   for name in DESCRIBE_COLUMNS for extreme in ("min", "max")]
+
+
+def derived_column_names():
+    return [name for name, _ in DERIVED_COLUMNS]
+
+
+def rollup_measure_names():
+    return [name for name, _ in ROLLUP_MEASURES]
+
+
+def rollup_extreme_names():
+    return [name for name, _, _ in ROLLUP_EXTREMES]
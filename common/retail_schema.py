@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de esquema versionado de los lotes retail.
+
+Es la única definición de columnas y tipos que comparten el producer, el
+consumer Spark y el dashboard. Cada versión describe las columnas en el orden
+en que el producer las escribe; los tipos lógicos se traducen a Spark, Hive,
+PostgreSQL y pandas con las tablas de abajo.
+
+Este módulo no importa pyspark al cargarse (el producer y el dashboard no lo
+tienen instalado); los StructType y esquemas Arrow se construyen bajo demanda.
+"""
+
+SCHEMA_VERSION = 2
+
+# (nombre en el lote del producer, nombre normalizado, tipo lógico)
+SCHEMA_VERSIONS = {
+    1: [
+        ("Date", "date", "date"),
+        ("Store_ID", "store_id", "string"),
+        ("Product_ID", "product_id", "string"),
+        ("Category", "category", "string"),
+        ("Region", "region", "string"),
+        ("Inventory_Level", "inventory_level", "double"),
+        ("Units_Sold", "units_sold", "double"),
+        ("Units_Ordered", "units_ordered", "double"),
+        ("Demand_Forecast", "demand_forecast", "double"),
+        ("Price", "price", "double"),
+        ("Discount", "discount", "double"),
+        ("Weather_Condition", "weather_condition", "string"),
+        ("Holiday_Promotion", "holiday_promotion", "int"),
+        ("Competitor_Pricing", "competitor_pricing", "double"),
+        ("Seasonality", "seasonality", "string"),
+    ],
+}
+
+# v2: identidad estable de cada fila (lote + posición en el lote), para que
+# reprocesar un archivo no duplique filas en los destinos
+SCHEMA_VERSIONS[2] = SCHEMA_VERSIONS[1] + [
+    ("Batch_ID", "batch_id", "string"),
+    ("Row_Seq", "row_seq", "long"),
+]
+
+# Columnas que identifican una fila; no se limpian como datos
+IDENTITY_COLUMNS = ["batch_id", "row_seq"]
+
+# Tipos de almacenamiento por tipo lógico. Las fechas se guardan como texto
+# 'yyyy-MM-dd' en Hive (clave de partición) y como DATE en PostgreSQL.
+HIVE_TYPES = {"string": "STRING", "double": "DOUBLE", "int": "INT", "long": "BIGINT",
+              "date": "STRING"}
+POSTGRES_TYPES = {"string": "VARCHAR(50)", "double": "DOUBLE PRECISION",
+                  "int": "INTEGER", "long": "BIGINT", "date": "DATE"}
+PANDAS_TYPES = {"string": "object", "double": "float64", "int": "int64", "long": "int64",
+                "date": "object"}
+
+DATE_FORMAT = "yyyy-MM-dd"
+CORRUPT_RECORD_COLUMN = "_corrupt_record"
+
+# Modos de tratamiento de filas mal formadas al leer con el esquema declarado
+MALFORMED_MODES = {
+    "quarantine": "PERMISSIVE",  # se separan y se guardan aparte
+    "drop": "DROPMALFORMED",     # se descartan al leer
+    "fail": "FAILFAST",          # la lectura falla con la primera fila inválida
+}
+
+
+def data_column_names(version=None):
+    """Columnas normalizadas de datos (sin las de identidad)"""
+    return [name for name in clean_column_names(version) if name not in IDENTITY_COLUMNS]
+
+
+def normalize_column_name(name):
+    """Normaliza un nombre de columna del dataset original"""
+    return name.replace(' ', '_').replace('/', '_').replace('-', '_') \
+               .replace('(', '').replace(')', '').lower()
+
+
+def get_columns(version=None):
+    """Retorna la lista de columnas (raw, normalizado, tipo) de una versión"""
+    if version is None:
+        version = SCHEMA_VERSION
+    if version not in SCHEMA_VERSIONS:
+        raise ValueError("Versión de esquema desconocida: {}".format(version))
+    return SCHEMA_VERSIONS[version]
+
+
+def raw_column_names(version=None):
+    return [raw for raw, _, _ in get_columns(version)]
+
+
+def clean_column_names(version=None):
+    return [name for _, name, _ in get_columns(version)]
+
+
+def version_of_csv_header(header):
+    """
+    Versión del esquema de un lote CSV según su línea de encabezado (con o sin
+    comillas), o None si no coincide con ninguna
+    """
+    names = [name.strip().strip('"') for name in (header or "").lstrip("\ufeff").strip().split(",")]
+    for version in sorted(SCHEMA_VERSIONS):
+        if raw_column_names(version) == names:
+            return version
+    return None
+
+
+def column_types(version=None):
+    """Mapa nombre normalizado -> tipo lógico"""
+    return dict((name, logical) for _, name, logical in get_columns(version))
+
+
+def columns_of_type(logical_type, version=None):
+    return [name for _, name, logical in get_columns(version) if logical == logical_type]
+
+
+def pandas_dtypes(version=None):
+    """Mapa nombre raw -> dtype de pandas para conformar los lotes del producer"""
+    return dict((raw, PANDAS_TYPES[logical]) for raw, _, logical in get_columns(version))
+
+
+def hive_columns_ddl(version=None, indent="    ", exclude=()):
+    """Lista de columnas para un CREATE TABLE de Hive"""
+    return (",\n" + indent).join(
+        "{} {}".format(name, HIVE_TYPES[logical]) for _, name, logical in get_columns(version)
+        if name not in exclude)
+
+
+def hive_partition_ddl(partition_columns, version=None):
+    """Cláusula PARTITIONED BY para las columnas de partición dadas"""
+    types = column_types(version)
+    return "PARTITIONED BY ({})".format(", ".join(
+        "{} {}".format(name, HIVE_TYPES[types[name]]) for name in partition_columns))
+
+
+def postgres_column_types(version=None):
+    """Valor de la opción createTableColumnTypes del escritor JDBC"""
+    return ", ".join(
+        "{} {}".format(name, POSTGRES_TYPES[logical]) for _, name, logical in get_columns(version))
+
+
+def spark_read_schema(version=None, with_corrupt_record=False):
+    """StructType con los nombres raw, para leer los lotes en una sola pasada"""
+    from pyspark.sql.types import (StructType, StructField, StringType, DoubleType,
+                                   IntegerType, LongType, DateType)
+
+    spark_types = {"string": StringType, "double": DoubleType,
+                   "int": IntegerType, "long": LongType, "date": DateType}
+    fields = [StructField(raw, spark_types[logical](), True)
+              for raw, _, logical in get_columns(version)]
+    if with_corrupt_record:
+        fields.append(StructField(CORRUPT_RECORD_COLUMN, StringType(), True))
+    return StructType(fields)
+
+
+def arrow_schema(version=None):
+    """Esquema Arrow con los nombres raw, para los lotes Parquet/ORC del producer"""
+    import pyarrow as pa
+
+    arrow_types = {"string": pa.string, "double": pa.float64,
+                   "int": pa.int32, "long": pa.int64, "date": pa.date32}
+    return pa.schema([pa.field(raw, arrow_types[logical](), nullable=True)
+                      for raw, _, logical in get_columns(version)])
+
+
+def spark_read_options(malformed_mode="quarantine"):
+    """Opciones del lector CSV de Spark para el modo de filas mal formadas dado"""
+    if malformed_mode not in MALFORMED_MODES:
+        raise ValueError("Modo de filas mal formadas desconocido: {}".format(malformed_mode))
+    options = {
+        "header": "true",
+        "dateFormat": DATE_FORMAT,
+        "mode": MALFORMED_MODES[malformed_mode],
+    }
+    if malformed_mode == "quarantine":
+        options["columnNameOfCorruptRecord"] = CORRUPT_RECORD_COLUMN
+    return options
@@ -3,6 +3,7 @@ import time
 import os
 import subprocess
 import sys
+import threading
 import traceback
 
 # --- Configuración ---
@@ -11,6 +12,18 @@ POSTGRES_USER = "hive"
 POSTGRES_PASSWORD = "hive"
 POSTGRES_TABLE = "retail_sales"
 
+# Modo de ejecución: "batch" (un spark-submit por ciclo) o "streaming"
+# (un único job Structured Streaming de larga duración)
+CONSUMER_MODE = os.environ.get("CONSUMER_MODE", "batch")
+PROCESSING_SCRIPT = "/consumer/spark_processing.py"  # destinos por defecto: hive y postgres
+STREAMING_SCRIPT = "/consumer/spark_streaming.py"
+STREAMING_RESTART_DELAY = int(os.environ.get("STREAMING_RESTART_DELAY", "30"))
+
+# Compactación de archivos pequeños (/data/processed y Hive); 0 la desactiva
+COMPACTION_SCRIPT = "/consumer/spark_compaction.py"
+COMPACTION_INTERVAL_SECONDS = int(os.environ.get("COMPACTION_INTERVAL_SECONDS", "3600"))
+COMPACTION_TIMEOUT = int(os.environ.get("COMPACTION_TIMEOUT", "1800"))
+
 def log_message(message):
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
     print("[SPARK-CONSUMER] [{}] {}".format(timestamp, message))
@@ -42,203 +55,30 @@ def find_spark_submit():
     log_message("ERROR: No se pudo encontrar spark-submit")
     return None
 
+def build_spark_submit_cmd(spark_submit_path, script_path):
+    return [spark_submit_path, '--master', 'spark://spark-master:7077', 
+            '--driver-class-path', '/opt/spark/jars/postgresql-42.5.0.jar',
+            '--jars', '/opt/spark/jars/postgresql-42.5.0.jar', script_path]
+
+def log_spark_line(line, is_stderr=False):
+    if not line.strip():
+        return
+    if is_stderr:
+        if "WARN" not in line and "INFO" not in line:
+            log_message("SPARK-ERR: {}".format(line))
+    else:
+        log_message("SPARK: {}".format(line))
+
 def run_spark_processing():
     spark_submit_path = find_spark_submit()
     if not spark_submit_path:
         return False
 
-    spark_script_content = '''# -*- coding: utf-8 -*-
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import *
-from pyspark.sql.types import *
-
-print("=== INICIANDO PROCESAMIENTO SPARK CON HIVE Y POSTGRESQL ===")
-
-try:
-    # CONFIGURACIÓN CORREGIDA CON HIVE
-    spark = SparkSession.builder \\
-        .appName("RetailDataProcessor") \\
-        .config("spark.hadoop.fs.defaultFS", "hdfs://hadoop-namenode:8020") \\
-        .config("spark.jars", "/opt/spark/jars/postgresql-42.5.0.jar") \\
-        .config("hive.metastore.uris", "thrift://hive-metastore:9083") \\
-        .config("spark.sql.warehouse.dir", "hdfs://hadoop-namenode:8020/user/hive/warehouse") \\
-        .config("spark.hadoop.hive.metastore.warehouse.dir", "hdfs://hadoop-namenode:8020/user/hive/warehouse") \\
-        .enableHiveSupport() \\
-        .getOrCreate()
-    
-    spark.sparkContext.setLogLevel("WARN")
-    print("SPARK: Sesión Spark creada con soporte Hive")
-
-    # Rutas
-    hdfs_input_path = "hdfs://hadoop-namenode:8020/data/input/retail_batch_*.csv"
-    print("SPARK: Buscando datos en: " + hdfs_input_path)
-
-    # Leer datos
-    df = spark.read.option("header", "true").option("inferSchema", "true").csv(hdfs_input_path)
-    record_count = df.count()
-    
-    print("SPARK: Registros encontrados: " + str(record_count))
-    
-    if record_count > 0:
-        print("SPARK: Realizando limpieza y transformación...")
-        
-        # Limpieza (tu código existente)
-        clean_df = df
-        for column in clean_df.columns:
-            new_column = column.replace(' ', '_').replace('/', '_').replace('-', '_') \\
-                                .replace('(', '').replace(')', '').lower()
-            if new_column != column:
-                clean_df = clean_df.withColumnRenamed(column, new_column)
-        
-        numeric_columns = ['inventory_level', 'units_sold', 'units_ordered', 
-                         'demand_forecast', 'price', 'discount', 'competitor_pricing']
-        
-        for col_name in numeric_columns:
-            if col_name in clean_df.columns:
-                clean_df = clean_df.withColumn(col_name, 
-                    when(col(col_name).isNull(), 0.0).otherwise(col(col_name).cast("double")))
-        
-        string_columns = ['store_id', 'product_id', 'category', 'region', 
-                        'weather_condition', 'seasonality']
-        for col_name in string_columns:
-            if col_name in clean_df.columns:
-                clean_df = clean_df.withColumn(col_name, 
-                    when(col(col_name).isNull(), "Unknown").otherwise(trim(col(col_name))))
-        
-        if 'holiday_promotion' in clean_df.columns:
-            clean_df = clean_df.withColumn('holiday_promotion',
-                when(col('holiday_promotion').isin(['1', 'True', 'true', 'YES', 'Yes']), 1)
-                .when(col('holiday_promotion').isin(['0', 'False', 'false', 'NO', 'No']), 0)
-                .otherwise(0))
-        
-        if 'date' in clean_df.columns:
-            clean_df = clean_df.withColumn('date', 
-                when(col('date').isNull(), date_format(current_date(), 'yyyy-MM-dd'))
-                .otherwise(date_format(to_date(col('date'), 'yyyy-MM-dd'), 'yyyy-MM-dd')))
-        else:
-            clean_df = clean_df.withColumn('date', date_format(current_date(), 'yyyy-MM-dd'))
-
-        print("SPARK: Esquema final:")
-        clean_df.printSchema()
-        clean_df.show(2)
-
-        # --- ESCRITURA EN HIVE (CORREGIDA) ---
-        print("SPARK: Escribiendo datos en Hive...")
-        try:
-            # Usar base de datos default de Hive
-            spark.sql("USE default")
-            
-            # Crear tabla si no existe
-            spark.sql("""
-                CREATE TABLE IF NOT EXISTS retail_sales_raw (
-                    date STRING,
-                    store_id STRING,
-                    product_id STRING,
-                    category STRING,
-                    region STRING,
-                    inventory_level DOUBLE,
-                    units_sold DOUBLE,
-                    units_ordered DOUBLE,
-                    demand_forecast DOUBLE,
-                    price DOUBLE,
-                    discount DOUBLE,
-                    weather_condition STRING,
-                    holiday_promotion INT,
-                    competitor_pricing DOUBLE,
-                    seasonality STRING
-                ) STORED AS ORC
-            """)
-            
-            # Escribir datos
-            clean_df.write \\
-                .mode("append") \\
-                .insertInto("retail_sales_raw")
-            
-            print("SPARK: ✓ Datos escritos en Hive tabla 'retail_sales_raw'")
-            
-            # Verificar
-            table_count = spark.sql("SELECT COUNT(*) FROM retail_sales_raw").collect()[0][0]
-            print("SPARK: Total registros en Hive: {}".format(table_count))  # FIXED: sin f-string
-            
-        except Exception as hive_error:
-            print("SPARK: ✗ Error con Hive: {}".format(str(hive_error)))  # FIXED: sin f-string
-            print("SPARK: Continuando con PostgreSQL...")
-
-        # --- ESCRITURA EN POSTGRESQL (EXISTENTE) ---
-        print("SPARK: Escribiendo datos en PostgreSQL...")
-        
-        jdbc_url = "jdbc:postgresql://postgres:5432/hive"
-        properties = {
-            "user": "hive",
-            "password": "hive", 
-            "driver": "org.postgresql.Driver"
-        }
-
-        clean_df.write \\
-            .mode("append") \\
-            .option("createTableColumnTypes", 
-                   "date VARCHAR(10), store_id VARCHAR(50), product_id VARCHAR(50), " +
-                   "category VARCHAR(50), region VARCHAR(50), inventory_level DOUBLE PRECISION, " +
-                   "units_sold DOUBLE PRECISION, units_ordered DOUBLE PRECISION, " +
-                   "demand_forecast DOUBLE PRECISION, price DOUBLE PRECISION, " +
-                   "discount DOUBLE PRECISION, weather_condition VARCHAR(50), " +
-                   "holiday_promotion INTEGER, competitor_pricing DOUBLE PRECISION, " +
-                   "seasonality VARCHAR(50)") \\
-            .jdbc(url=jdbc_url, table="retail_sales", properties=properties)
-        
-        print("SPARK: ✓ Procesamiento completado - {} registros escritos".format(record_count))
-        
-        # Mover archivos procesados
-        try:
-            from py4j.java_gateway import java_import
-            java_import(spark._jvm, 'org.apache.hadoop.fs.*')
-            fs = spark._jvm.org.apache.hadoop.fs.FileSystem.get(spark._jsc.hadoopConfiguration())
-            
-            input_dir = spark._jvm.org.apache.hadoop.fs.Path("/data/input/retail_batch_*.csv")
-            statuses = fs.globStatus(input_dir)
-            
-            for status in statuses:
-                file_path = status.getPath()
-                processed_path = spark._jvm.org.apache.hadoop.fs.Path(
-                    "/data/processed/" + file_path.getName())
-                fs.rename(file_path, processed_path)
-                print("SPARK: Archivo movido: " + file_path.getName())
-                
-        except Exception as fs_e:
-            print("SPARK: Advertencia - No se pudieron mover archivos: {}".format(str(fs_e)))  # FIXED
-        
-    else:
-        print("SPARK: No hay datos nuevos para procesar.")
-
-except Exception as e:
-    print("SPARK: Error: " + str(e))
-    import traceback
-    traceback.print_exc()
-finally:
-    try:
-        spark.stop()
-        print("SPARK: Sesión Spark finalizada")
-    except:
-        pass
-'''
-
-    # Escribir y ejecutar script (código existente)
-    script_path = '/consumer/spark_processing.py'
-    try:
-        with open(script_path, 'w', encoding='utf-8') as f:
-            f.write(spark_script_content)
-        log_message("Script Spark escrito: {}".format(script_path))
-    except Exception as e:
-        log_message("Error escribiendo script Spark: {}".format(e))
-        return False
-    
     # Limpiar warehouse local antes de ejecutar
     log_message("Limpiando warehouse local de Spark...")
     subprocess.run(["rm", "-rf", "/consumer/spark-warehouse"], capture_output=True)
     
-    cmd = [spark_submit_path, '--master', 'spark://spark-master:7077', 
-           '--driver-class-path', '/opt/spark/jars/postgresql-42.5.0.jar',
-           '--jars', '/opt/spark/jars/postgresql-42.5.0.jar', script_path]
+    cmd = build_spark_submit_cmd(spark_submit_path, PROCESSING_SCRIPT)
     
     log_message("Ejecutando Spark processing con Hive y PostgreSQL...")
     
@@ -247,13 +87,11 @@ finally:
         
         if result.stdout:
             for line in result.stdout.split('\n'):
-                if line.strip():
-                    log_message("SPARK: {}".format(line))
+                log_spark_line(line)
         
         if result.stderr:
             for line in result.stderr.split('\n'):
-                if line.strip() and "WARN" not in line and "INFO" not in line:
-                    log_message("SPARK-ERR: {}".format(line))
+                log_spark_line(line, is_stderr=True)
         
         if result.returncode == 0:
             log_message("Spark processing completado exitosamente")
@@ -269,6 +107,67 @@ finally:
         log_message("Error ejecutando Spark: {}".format(str(e)))
         return False
 
+def run_spark_compaction(spark_submit_path):
+    """Ejecuta el job de compactación de archivos pequeños"""
+    cmd = build_spark_submit_cmd(spark_submit_path, COMPACTION_SCRIPT)
+    log_message("Ejecutando compactación de archivos pequeños...")
+    
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=COMPACTION_TIMEOUT)
+        for line in result.stdout.split('\n'):
+            log_spark_line(line)
+        for line in result.stderr.split('\n'):
+            log_spark_line(line, is_stderr=True)
+        log_message("Compactación terminó (código: {})".format(result.returncode))
+        return result.returncode == 0
+    except subprocess.TimeoutExpired:
+        log_message("Compactación timeout")
+        return False
+    except Exception as e:
+        log_message("Error ejecutando compactación: {}".format(str(e)))
+        return False
+
+def compaction_due(last_compaction):
+    return COMPACTION_INTERVAL_SECONDS > 0 and \
+        time.time() - last_compaction >= COMPACTION_INTERVAL_SECONDS
+
+def run_compaction_scheduler(spark_submit_path):
+    """Compacta periódicamente en segundo plano (modo streaming)"""
+    while True:
+        time.sleep(COMPACTION_INTERVAL_SECONDS)
+        run_spark_compaction(spark_submit_path)
+
+def run_spark_streaming(spark_submit_path):
+    """Lanza el job de streaming y reenvía su salida hasta que termine"""
+    cmd = build_spark_submit_cmd(spark_submit_path, STREAMING_SCRIPT)
+    log_message("Ejecutando Spark Structured Streaming: {}".format(STREAMING_SCRIPT))
+    
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   text=True, bufsize=1)
+        for line in process.stdout:
+            log_spark_line(line.rstrip('\n'), is_stderr=not line.startswith("SPARK:"))
+        process.wait()
+        log_message("Spark streaming terminó (código: {})".format(process.returncode))
+        return process.returncode == 0
+    except Exception as e:
+        log_message("Error ejecutando Spark streaming: {}".format(str(e)))
+        return False
+
+def run_streaming_loop(spark_submit_path):
+    """Mantiene vivo el job de streaming, relanzándolo si termina"""
+    restarts = 0
+    while True:
+        try:
+            log_message("--- Job de streaming (reinicios: {}) ---".format(restarts))
+            run_spark_streaming(spark_submit_path)
+            restarts += 1
+            log_message("Reiniciando streaming en {} segundos...".format(STREAMING_RESTART_DELAY))
+            time.sleep(STREAMING_RESTART_DELAY)
+        except KeyboardInterrupt:
+            log_message("Spark Consumer detenido por usuario")
+            break
+
 def main():
     log_message("INICIANDO SPARK CONSUMER (HIVe + POSTGRESQL)")
     
@@ -284,7 +183,15 @@ def main():
     log_message("Esperando inicialización de servicios (30s)...")
     time.sleep(30)
     
+    if CONSUMER_MODE == "streaming":
+        if COMPACTION_INTERVAL_SECONDS > 0:
+            threading.Thread(target=run_compaction_scheduler, args=(spark_submit_path,),
+                             daemon=True).start()
+        run_streaming_loop(spark_submit_path)
+        return
+    
     processing_count = 0
+    last_compaction = time.time()
     
     while True:
         try:
@@ -296,6 +203,11 @@ def main():
             else:
                 log_message("No hay datos nuevos o error en Spark")
             
+            # Entre ciclos, para no competir con las escrituras del consumer
+            if compaction_due(last_compaction):
+                run_spark_compaction(spark_submit_path)
+                last_compaction = time.time()
+            
             processing_count += 1
             log_message("Ciclo completado. Esperando 60 segundos...")
             time.sleep(60)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Ledger de ingesta en PostgreSQL.
+
+Cada lote procesado deja una fila en retail_ingest_ledger (filas, archivos,
+bytes y tiempos por etapa) y suma sus filas a retail_ingest_totals, una fila
+por destino ('hive', 'postgres'). Los totales se leen en O(1) en lugar de
+hacer COUNT(*) sobre tablas que crecen con el historial.
+
+Se usa el driver JDBC de PostgreSQL que ya está en el classpath del driver
+Spark (vía py4j), así que no hace falta psycopg2 en la imagen de Spark.
+"""
+from spark_common import HIVE_TABLE, POSTGRES_TABLE, jdbc_connection
+
+LEDGER_TABLE = "retail_ingest_ledger"
+TOTALS_TABLE = "retail_ingest_totals"
+SINKS = ("hive", "postgres")
+
+# (columna, tipo) de los campos que registra cada lote
+LEDGER_FIELDS = [
+    ("batch_key", "VARCHAR(100)"),
+    ("mode", "VARCHAR(20)"),
+    ("files", "INTEGER"),
+    ("bytes", "BIGINT"),
+    ("rows_read", "BIGINT"),
+    ("rows_malformed", "BIGINT"),
+    ("hive_rows", "BIGINT"),
+    ("postgres_rows", "BIGINT"),
+    ("read_seconds", "DOUBLE PRECISION"),
+    ("hive_seconds", "DOUBLE PRECISION"),
+    ("postgres_seconds", "DOUBLE PRECISION"),
+    ("total_seconds", "DOUBLE PRECISION"),
+]
+
+LEDGER_DDL = """
+    CREATE TABLE IF NOT EXISTS {} (
+        {},
+        recorded_at TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY (batch_key)
+    )
+""".format(LEDGER_TABLE, ",\n        ".join("{} {}".format(name, sql_type) for name, sql_type in LEDGER_FIELDS))
+
+TOTALS_DDL = """
+    CREATE TABLE IF NOT EXISTS {} (
+        sink VARCHAR(20) PRIMARY KEY,
+        row_count BIGINT NOT NULL DEFAULT 0,
+        batch_count BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP NOT NULL DEFAULT now()
+    )
+""".format(TOTALS_TABLE)
+
+
+def set_parameters(spark, statement, values):
+    for index, value in enumerate(values, 1):
+        if value is None:
+            statement.setNull(index, spark._jvm.java.sql.Types.NULL)
+        else:
+            statement.setObject(index, value)
+
+
+def fetch_totals(connection):
+    result = connection.createStatement().executeQuery(
+        "SELECT sink, row_count FROM {}".format(TOTALS_TABLE))
+    totals = {}
+    while result.next():
+        totals[result.getString(1)] = result.getLong(2)
+    return totals
+
+
+def initial_row_count(spark, connection, sink):
+    """Conteo completo de un destino, solo la primera vez que se crea su total"""
+    if sink == "hive":
+        try:
+            return spark.table(HIVE_TABLE).count()
+        except Exception:
+            return 0
+    result = connection.createStatement().executeQuery(
+        "SELECT to_regclass('{}') IS NOT NULL".format(POSTGRES_TABLE))
+    result.next()
+    if not result.getBoolean(1):
+        return 0
+    result = connection.createStatement().executeQuery("SELECT COUNT(*) FROM " + POSTGRES_TABLE)
+    result.next()
+    return result.getLong(1)
+
+
+def ensure_ledger(spark):
+    """Crea las tablas del ledger y siembra los totales que falten"""
+    connection = jdbc_connection(spark)
+    try:
+        statement = connection.createStatement()
+        statement.execute(LEDGER_DDL)
+        statement.execute(TOTALS_DDL)
+        existing = fetch_totals(connection)
+        for sink in SINKS:
+            if sink in existing:
+                continue
+            insert = connection.prepareStatement(
+                "INSERT INTO {} (sink, row_count) VALUES (?, ?) ON CONFLICT DO NOTHING".format(TOTALS_TABLE))
+            set_parameters(spark, insert, [sink, initial_row_count(spark, connection, sink)])
+            insert.executeUpdate()
+    finally:
+        connection.close()
+
+
+def record_batch(spark, entry):
+    """
+    Registra un lote y suma sus filas a los totales en una transacción.
+
+    `entry` es un dict con las claves de LEDGER_FIELDS (las que falten se
+    guardan como NULL). Un batch_key repetido (p. ej. un micro-batch
+    reintentado) no vuelve a sumar. Retorna los totales actualizados.
+    """
+    connection = jdbc_connection(spark)
+    try:
+        connection.setAutoCommit(False)
+        names = [name for name, _ in LEDGER_FIELDS]
+        insert = connection.prepareStatement(
+            "INSERT INTO {} ({}) VALUES ({}) ON CONFLICT (batch_key) DO NOTHING".format(
+                LEDGER_TABLE, ", ".join(names), ", ".join("?" for _ in names)))
+        set_parameters(spark, insert, [entry.get(name) for name in names])
+
+        if insert.executeUpdate():
+            update = connection.prepareStatement(
+                "UPDATE {} SET row_count = row_count + ?, batch_count = batch_count + 1, "
+                "updated_at = now() WHERE sink = ?".format(TOTALS_TABLE))
+            for sink in SINKS:
+                set_parameters(spark, update, [entry.get(sink + "_rows") or 0, sink])
+                update.executeUpdate()
+        connection.commit()
+        return fetch_totals(connection)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
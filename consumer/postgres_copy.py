@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Carga de particiones Spark en PostgreSQL con COPY FROM STDIN.
+
+Se ejecuta en los executors (el driver lo distribuye con addPyFile), así que
+no depende de spark_common ni de pyspark: solo de psycopg2. Las filas se
+serializan a CSV a medida que COPY las lee, sin materializar la partición.
+"""
+import io
+
+# Filas que se serializan por cada lectura de COPY
+ROWS_PER_CHUNK = 5000
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
+class CsvRowStream(io.RawIOBase):
+    """Archivo de solo lectura que produce CSV a partir de un iterador de filas"""
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.pending = b""
+        self.row_count = 0
+
+    def readable(self):
+        return True
+
+    def next_chunk(self):
+        lines = []
+        for row in self.rows:
+            lines.append(",".join(csv_value(value) for value in row))
+            if len(lines) >= ROWS_PER_CHUNK:
+                break
+        self.row_count += len(lines)
+        return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+    def read(self, size=-1):
+        while size < 0 or len(self.pending) < size:
+            chunk = self.next_chunk()
+            if not chunk:
+                break
+            self.pending += chunk
+        if size < 0:
+            size = len(self.pending)
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+
+def copy_partition(rows, connection_params, table, columns):
+    """
+    Carga una partición con un COPY en su propia transacción y conexión.
+
+    Cada partición confirma por separado, igual que el escritor JDBC de
+    Spark: si una falla, las que ya terminaron quedan escritas.
+    """
+    import psycopg2
+
+    stream = CsvRowStream(rows)
+    connection = psycopg2.connect(**connection_params)
+    try:
+        with connection, connection.cursor() as cursor:
+            cursor.copy_expert(
+                "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(table, ", ".join(columns)),
+                stream)
+    finally:
+        connection.close()
+    return stream.row_count
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Rollups diarios de retail_sales en PostgreSQL, mantenidos por el consumer.
+
+retail_sales_daily_rollup guarda una fila por (date, region, category) con
+las sumas de retail_metrics.ROLLUP_MEASURES y los mínimos y máximos de
+retail_metrics.ROLLUP_EXTREMES. Cada lote suma sus deltas (y combina sus
+extremos con LEAST/GREATEST) con INSERT ... ON CONFLICT DO UPDATE en la misma
+sentencia que inserta las filas
+en retail_sales: solo cuentan las filas realmente insertadas, así que un lote
+reprocesado en modo merge no altera los rollups.
+
+La misma sentencia incrementa la versión de la tabla en retail_data_version
+cuando inserta filas, y marca cada fila de rollup que tocó con esa versión
+(ingest_seq). El dashboard usa la versión para invalidar su cache, e
+ingest_seq como marca de agua para traer solo las filas de rollup nuevas.
+
+Las funciones reciben una conexión JDBC (java.sql.Connection vía py4j).
+"""
+import postgres_state
+import retail_metrics
+from postgres_schema import execute, query_column
+
+ROLLUP_TABLE = "retail_sales_daily_rollup"
+# Una fila por tabla destino con un contador que sube con cada carga
+VERSION_TABLE = "retail_data_version"
+
+VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS {} (
+        table_name VARCHAR(100) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP NOT NULL DEFAULT now()
+    )
+""".format(VERSION_TABLE)
+
+
+def create_table_statement(table):
+    columns = ["date DATE NOT NULL", "region VARCHAR(50) NOT NULL", "category VARCHAR(50) NOT NULL"]
+    columns += ["{} {} NOT NULL DEFAULT 0".format(name, "BIGINT" if name in ("row_count", "promo_rows")
+                                                  else "DOUBLE PRECISION")
+                for name in retail_metrics.rollup_measure_names()]
+    columns += ["{} DOUBLE PRECISION".format(name) for name in retail_metrics.rollup_extreme_names()]
+    columns.append("ingest_seq BIGINT NOT NULL DEFAULT 0")
+    columns.append("updated_at TIMESTAMP NOT NULL DEFAULT now()")
+    return "CREATE TABLE {} ({}, PRIMARY KEY ({}))".format(
+        table, ", ".join(columns), ", ".join(retail_metrics.ROLLUP_DIMENSIONS))
+
+
+def version_sql(table):
+    """Subconsulta con la versión actual de `table`"""
+    return "(SELECT version FROM {} WHERE table_name = '{}')".format(VERSION_TABLE, table)
+
+
+def aggregate_sql(table, source, ingest_seq):
+    """
+    INSERT que agrega las filas de `source` (tabla o nombre de CTE), suma los
+    resultados a los rollups existentes y marca las filas tocadas con la
+    expresión `ingest_seq`
+    """
+    dimensions = ", ".join(retail_metrics.ROLLUP_DIMENSIONS)
+    names = retail_metrics.rollup_measure_names()
+    extremes = retail_metrics.rollup_extreme_names()
+    sums = ["COALESCE(SUM({}), 0)".format(expression) for _, expression in retail_metrics.ROLLUP_MEASURES]
+    sums += ["{}({})".format(function, column) for _, function, column in retail_metrics.ROLLUP_EXTREMES]
+    updates = ["{0} = {1}.{0} + EXCLUDED.{0}".format(name, table) for name in names]
+    # LEAST/GREATEST ignoran los NULL
+    combine = {"MIN": "LEAST", "MAX": "GREATEST"}
+    updates += ["{0} = {1}({2}.{0}, EXCLUDED.{0})".format(name, combine[function], table)
+                for name, function, _ in retail_metrics.ROLLUP_EXTREMES]
+    return """
+        INSERT INTO {table} ({dimensions}, {measures}, ingest_seq)
+        SELECT {dimensions}, {sums}, {ingest_seq} FROM {source} GROUP BY {dimensions}
+        ON CONFLICT ({dimensions}) DO UPDATE SET {updates},
+            ingest_seq = EXCLUDED.ingest_seq, updated_at = now()
+    """.format(
+        table=table, source=source, dimensions=dimensions, measures=", ".join(names + extremes),
+        ingest_seq=ingest_seq, sums=", ".join(sums), updates=", ".join(updates))
+
+
+def bump_version_sql(table, condition="TRUE"):
+    """INSERT que incrementa la versión de `table` si se cumple `condition` y la retorna"""
+    return """
+        INSERT INTO {0} (table_name, version) SELECT '{1}', 1 WHERE {2}
+        ON CONFLICT (table_name) DO UPDATE SET version = {0}.version + 1, updated_at = now()
+        RETURNING version
+    """.format(VERSION_TABLE, table, condition)
+
+
+def insert_with_rollup_sql(table, rollup_table, columns, select_sql, conflict_clause="", state_table=None):
+    """
+    Sentencia única que inserta `select_sql` en `table` y, si hubo filas
+    nuevas, sube la versión de `table` y suma a los rollups solo esas filas,
+    marcadas con la nueva versión. Con `state_table`, también actualiza el
+    estado actual por tienda/producto (postgres_state). Su resultado es una
+    fila con el conteo de filas insertadas.
+    """
+    state = ""
+    if state_table:
+        state = ", latest AS ({})".format(postgres_state.upsert_latest_sql(state_table, "inserted"))
+    return """
+        WITH inserted AS (
+            INSERT INTO {table} ({columns}) {select_sql} {conflict_clause}
+            RETURNING *
+        ), bumped AS ({bump}
+        ), rolled_up AS ({rollup}){state}
+        SELECT COUNT(*) FROM inserted
+    """.format(table=table, columns=", ".join(columns), select_sql=select_sql,
+               conflict_clause=conflict_clause, state=state,
+               bump=bump_version_sql(table, "EXISTS (SELECT 1 FROM inserted)"),
+               rollup=aggregate_sql(rollup_table, "inserted", "(SELECT version FROM bumped)"))
+
+
+def ensure_rollup_table(connection, table, source_table):
+    """
+    Crea el rollup si no existe o si sus medidas cambiaron, y lo reconstruye
+    desde `source_table`. Retorna un mensaje si lo (re)construyó, o None.
+    """
+    execute(connection, VERSION_DDL)
+    expected = retail_metrics.ROLLUP_DIMENSIONS + retail_metrics.rollup_measure_names() + \
+        retail_metrics.rollup_extreme_names() + ["ingest_seq", "updated_at"]
+    current = query_column(connection, """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = '{}' ORDER BY ordinal_position
+    """.format(table))
+    if current == expected:
+        return None
+
+    connection.setAutoCommit(False)
+    try:
+        execute(connection, "DROP TABLE IF EXISTS {}".format(table))
+        execute(connection, create_table_statement(table))
+        execute(connection, "CREATE INDEX {0}_ingest_seq ON {0} (ingest_seq)".format(table))
+        # Con RETURNING: execute() en lugar de executeUpdate()
+        connection.createStatement().execute(bump_version_sql(source_table))
+        execute(connection, aggregate_sql(table, source_table, version_sql(source_table)))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.setAutoCommit(True)
+    return "Rollup '{}' {} desde '{}'".format(table, "reconstruido" if current else "creado", source_table)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Esquema de retail_sales en PostgreSQL, gestionado por el pipeline.
+
+La tabla se particiona por rango mensual sobre `date` (tipo DATE nativo) y
+lleva estos índices, que se propagan a cada partición:
+
+    <tabla>_row_identity   único (batch_id, row_seq, date), destino del merge
+    <tabla>_date_brin      BRIN sobre date: los lotes llegan en orden de fecha
+    <tabla>_category_date  B-tree (category, date) para filtros por categoría
+    <tabla>_region_date    B-tree (region, date) para filtros por región
+
+Además de las columnas del lote, la tabla guarda las métricas derivadas de
+retail_metrics.DERIVED_COLUMNS, que el consumer calcula al ingerir, y la hora
+de ingesta de cada fila (ingested_at, la de la transacción que la insertó),
+que crece con cada carga y ordena las lecturas de un mismo día.
+
+migrate() lleva la tabla a este esquema: la crea, convierte en una sola
+transacción una tabla plana anterior (fecha VARCHAR) copiando sus filas, o
+agrega y completa las columnas derivadas y de ingesta que falten. Las
+particiones de cada mes se crean antes de escribir el lote que las necesita.
+
+Las funciones reciben una conexión JDBC (java.sql.Connection vía py4j).
+"""
+import datetime
+
+import retail_metrics
+import retail_schema
+
+# Columnas del índice único usado por INSERT ... ON CONFLICT. PostgreSQL exige
+# que los índices únicos de una tabla particionada incluyan la clave de partición.
+CONFLICT_COLUMNS = retail_schema.IDENTITY_COLUMNS + ["date"]
+
+# Hora de ingesta de cada fila; no la escribe el lote sino el valor por defecto
+INGEST_COLUMN = "ingested_at"
+INGEST_COLUMN_DDL = "{} TIMESTAMP NOT NULL DEFAULT now()".format(INGEST_COLUMN)
+
+
+def column_names():
+    """Columnas de retail_sales que escribe el lote: las del lote y luego las derivadas"""
+    return retail_schema.clean_column_names() + retail_metrics.derived_column_names()
+
+
+def execute(connection, statement):
+    return connection.createStatement().executeUpdate(statement)
+
+
+def query_column(connection, statement):
+    result = connection.createStatement().executeQuery(statement)
+    values = []
+    while result.next():
+        values.append(result.getString(1))
+    return values
+
+
+def table_kind(connection, table):
+    """'p' (particionada), 'r' (tabla normal) o None si no existe"""
+    kinds = query_column(connection,
+                         "SELECT relkind FROM pg_class WHERE oid = to_regclass('{}')".format(table))
+    return kinds[0] if kinds else None
+
+
+def month_start(value):
+    """Primer día del mes de una fecha o de un texto 'yyyy-MM[-dd]'"""
+    if isinstance(value, str):
+        year, month = value[:7].split("-")
+        return datetime.date(int(year), int(month), 1)
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_month(month):
+    return datetime.date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_ddl(table, month):
+    return "CREATE TABLE IF NOT EXISTS {}_p{:%Y_%m} PARTITION OF {} FOR VALUES FROM ('{}') TO ('{}')".format(
+        table, month, table, month.isoformat(), next_month(month).isoformat())
+
+
+def create_table_statements(table):
+    columns = ", ".join(["{} {}".format(name, retail_schema.POSTGRES_TYPES[logical])
+                         for _, name, logical in retail_schema.get_columns()] +
+                        ["{} DOUBLE PRECISION".format(name) for name in retail_metrics.derived_column_names()] +
+                        [INGEST_COLUMN_DDL])
+    return [
+        "CREATE TABLE {} ({}) PARTITION BY RANGE (date)".format(table, columns),
+        "CREATE UNIQUE INDEX IF NOT EXISTS {0}_row_identity ON {0} ({1})".format(
+            table, ", ".join(CONFLICT_COLUMNS)),
+        "CREATE INDEX IF NOT EXISTS {0}_date_brin ON {0} USING BRIN (date)".format(table),
+        "CREATE INDEX IF NOT EXISTS {0}_category_date ON {0} (category, date)".format(table),
+        "CREATE INDEX IF NOT EXISTS {0}_region_date ON {0} (region, date)".format(table),
+    ]
+
+
+def ensure_partitions(connection, table, months):
+    """Crea las particiones mensuales que falten para las fechas/meses dados"""
+    for month in sorted(set(month_start(value) for value in months)):
+        execute(connection, partition_ddl(table, month))
+
+
+def migrate_flat_table(connection, table):
+    """Copia una tabla plana anterior a la nueva tabla particionada"""
+    legacy_table = table + "_legacy"
+    date_expression = "COALESCE(CAST(NULLIF(CAST(date AS TEXT), '') AS DATE), CURRENT_DATE)"
+
+    execute(connection, "ALTER TABLE {} RENAME TO {}".format(table, legacy_table))
+    # Los nombres de índice son globales al esquema
+    execute(connection, "DROP INDEX IF EXISTS {}_row_identity".format(table))
+    for _, name, logical in retail_schema.get_columns():
+        if name != "date":
+            execute(connection, "ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} {}".format(
+                legacy_table, name, retail_schema.POSTGRES_TYPES[logical]))
+
+    for statement in create_table_statements(table):
+        execute(connection, statement)
+    ensure_partitions(connection, table, query_column(connection, "SELECT DISTINCT {} FROM {}".format(
+        date_expression, legacy_table)))
+
+    columns = retail_schema.clean_column_names()
+    expressions = [date_expression if name == "date" else name for name in columns]
+    expressions += [expression for _, expression in retail_metrics.DERIVED_COLUMNS]
+    copied = execute(connection, "INSERT INTO {} ({}) SELECT {} FROM {}".format(
+        table, ", ".join(column_names()), ", ".join(expressions), legacy_table))
+    execute(connection, "DROP TABLE {}".format(legacy_table))
+    return copied
+
+
+def add_derived_columns(connection, table):
+    """
+    Agrega las columnas derivadas que falten y las calcula para las filas
+    existentes, y la de ingesta (las filas existentes toman la hora de la
+    migración, anterior a la de toda carga posterior)
+    """
+    current = query_column(connection, """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = '{}'
+    """.format(table))
+    missing = [(name, expression) for name, expression in retail_metrics.DERIVED_COLUMNS
+               if name not in current]
+    added = [name for name, _ in missing]
+    if missing:
+        for name, _ in missing:
+            execute(connection, "ALTER TABLE {} ADD COLUMN {} DOUBLE PRECISION".format(table, name))
+        execute(connection, "UPDATE {} SET {}".format(
+            table, ", ".join("{} = {}".format(name, expression) for name, expression in missing)))
+    if INGEST_COLUMN not in current:
+        execute(connection, "ALTER TABLE {} ADD COLUMN {}".format(table, INGEST_COLUMN_DDL))
+        added.append(INGEST_COLUMN)
+    return added
+
+
+def migrate(connection, table, premake_months=2):
+    """
+    Lleva `table` al esquema particionado y crea las particiones del mes en
+    curso y de los `premake_months` siguientes. Retorna un mensaje si hubo
+    cambios de esquema, o None.
+    """
+    connection.setAutoCommit(False)
+    try:
+        kind = table_kind(connection, table)
+        message = None
+        if kind is None:
+            for statement in create_table_statements(table):
+                execute(connection, statement)
+            message = "Tabla '{}' creada (particionada por mes)".format(table)
+        elif kind == "r":
+            copied = migrate_flat_table(connection, table)
+            message = "Tabla '{}' migrada a particiones mensuales ({} filas copiadas)".format(table, copied)
+        else:
+            added = add_derived_columns(connection, table)
+            if added:
+                message = "Columnas agregadas a '{}': {}".format(table, ", ".join(added))
+
+        month = month_start(datetime.date.today())
+        months = [month]
+        for _ in range(premake_months):
+            month = next_month(month)
+            months.append(month)
+        ensure_partitions(connection, table, months)
+        connection.commit()
+        return message
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.setAutoCommit(True)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Estado actual de inventario por (store_id, product_id) en PostgreSQL.
+
+retail_sales guarda una fila por lectura de cada producto en cada tienda; las
+alertas de stock solo necesitan la última. retail_inventory_state guarda esa
+última fila (todas las columnas de retail_sales) y se actualiza en la misma
+sentencia que inserta cada lote: de las filas nuevas se toma la más reciente
+de cada par y reemplaza a la guardada solo si no es más vieja, así que un
+lote atrasado o reprocesado no retrocede el estado.
+
+La más reciente es la de fecha mayor y, en la misma fecha, la de ingesta
+posterior (ingested_at de retail_sales, que también se guarda aquí); dentro
+de un lote desempata row_seq.
+
+Índices para las consultas de umbral, que devuelven el top-K recorriendo un
+rango del índice en lugar de la historia:
+
+    <tabla>_inventory    B-tree (inventory_level): stock bajo el umbral
+    <tabla>_stock_gap    B-tree (stock_gap) donde stock_gap > 0: riesgo de
+                         desabastecimiento, con stock_gap = demand_forecast -
+                         inventory_level (columna generada)
+
+Las funciones reciben una conexión JDBC (java.sql.Connection vía py4j).
+"""
+import retail_schema
+from postgres_schema import INGEST_COLUMN, column_names, execute, query_column
+
+STATE_TABLE = "retail_inventory_state"
+STATE_KEY = ["store_id", "product_id"]
+# Orden que define la fila más reciente de un par. batch_id no sirve: el
+# texto no ordena por hora y row_seq de los lotes sin identidad es un hash.
+RECENCY_COLUMNS = ["date", INGEST_COLUMN, "row_seq"]
+
+
+def state_column_names():
+    """Columnas copiadas de retail_sales: las del lote, las derivadas y la de ingesta"""
+    return column_names() + [INGEST_COLUMN]
+
+
+def create_table_statements(table):
+    types = retail_schema.column_types()
+    columns = ["{} {}{}".format(name, retail_schema.POSTGRES_TYPES[types[name]] if name in types
+                                else "DOUBLE PRECISION", " NOT NULL" if name in STATE_KEY else "")
+               for name in column_names()]
+    columns.append("{} TIMESTAMP NOT NULL".format(INGEST_COLUMN))
+    columns.append("stock_gap DOUBLE PRECISION GENERATED ALWAYS AS (demand_forecast - inventory_level) STORED")
+    columns.append("updated_at TIMESTAMP NOT NULL DEFAULT now()")
+    return [
+        "CREATE TABLE {} ({}, PRIMARY KEY ({}))".format(table, ", ".join(columns), ", ".join(STATE_KEY)),
+        "CREATE INDEX {0}_inventory ON {0} (inventory_level)".format(table),
+        "CREATE INDEX {0}_stock_gap ON {0} (stock_gap) WHERE stock_gap > 0".format(table),
+    ]
+
+
+def upsert_latest_sql(table, source):
+    """
+    INSERT con la fila más reciente de cada (store_id, product_id) de
+    `source` (tabla o nombre de CTE), que reemplaza la guardada si no es más vieja
+    """
+    columns = state_column_names()
+    return """
+        INSERT INTO {table} ({columns})
+        SELECT DISTINCT ON ({key}) {columns} FROM {source}
+        ORDER BY {key}, {recency_desc}
+        ON CONFLICT ({key}) DO UPDATE SET {updates}, updated_at = now()
+        WHERE ({excluded_recency}) >= ({current_recency})
+    """.format(
+        table=table, source=source, columns=", ".join(columns), key=", ".join(STATE_KEY),
+        recency_desc=", ".join(name + " DESC" for name in RECENCY_COLUMNS),
+        updates=", ".join("{0} = EXCLUDED.{0}".format(name) for name in columns if name not in STATE_KEY),
+        excluded_recency=", ".join("EXCLUDED." + name for name in RECENCY_COLUMNS),
+        current_recency=", ".join("{}.{}".format(table, name) for name in RECENCY_COLUMNS))
+
+
+def ensure_state_table(connection, table, source_table):
+    """
+    Crea la tabla de estado si no existe o si sus columnas cambiaron, y la
+    completa desde `source_table`. Retorna un mensaje si la (re)construyó, o None.
+    """
+    expected = state_column_names() + ["stock_gap", "updated_at"]
+    current = query_column(connection, """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = '{}' ORDER BY ordinal_position
+    """.format(table))
+    if current == expected:
+        return None
+
+    connection.setAutoCommit(False)
+    try:
+        execute(connection, "DROP TABLE IF EXISTS {}".format(table))
+        for statement in create_table_statements(table):
+            execute(connection, statement)
+        rows = execute(connection, upsert_latest_sql(table, source_table))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.setAutoCommit(True)
+    return "Estado '{}' {} desde '{}' ({} pares tienda/producto)".format(
+        table, "reconstruido" if current else "creado", source_table, rows)
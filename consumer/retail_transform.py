@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Transformaciones del lote retail, sin E/S ni configuración del despliegue.
+
+Reciben y devuelven DataFrames: no leen variables de entorno, no abren
+conexiones ni tocan HDFS, así que se pueden ejecutar y medir con una sesión
+local sobre cualquier DataFrame con las columnas del lote. Los jobs del
+consumer (spark_processing, spark_streaming) las usan vía spark_common.
+"""
+import os
+import sys
+
+from pyspark.sql import Window
+from pyspark.sql.functions import (coalesce, col, count, current_date, date_format, expr, lit,
+                                   regexp_extract, row_number, to_date, trim, when, xxhash64)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+import retail_metrics
+import retail_schema
+
+# Archivo de origen de cada fila, para derivar la identidad de lotes sin ella
+SOURCE_FILE_COLUMN = "_source_file"
+
+
+def count_batch_rows(df):
+    """(filas leídas, filas mal formadas) de un lote cacheado, en una sola agregación"""
+    if retail_schema.CORRUPT_RECORD_COLUMN in df.columns:
+        malformed = count(col(retail_schema.CORRUPT_RECORD_COLUMN))
+    else:
+        malformed = lit(0)
+    row = df.select(count(lit(1)), malformed).first()
+    return row[0], row[1]
+
+
+def split_malformed(df):
+    """Separa las filas mal formadas (solo en modo quarantine)"""
+    if retail_schema.CORRUPT_RECORD_COLUMN not in df.columns:
+        return df, None
+    corrupt = col(retail_schema.CORRUPT_RECORD_COLUMN)
+    valid_df = df.filter(corrupt.isNull()).drop(retail_schema.CORRUPT_RECORD_COLUMN)
+    malformed_df = df.filter(corrupt.isNotNull())
+    return valid_df, malformed_df
+
+
+def source_columns(df):
+    """Nombre normalizado -> nombre en `df` de cada columna"""
+    return dict((retail_schema.normalize_column_name(name), name) for name in df.columns)
+
+
+def content_hash(df):
+    """Hash de las columnas de datos de cada fila de `df`"""
+    sources = source_columns(df)
+    return xxhash64(*[col("`{}`".format(sources[name])) for name in retail_schema.data_column_names()
+                      if name in sources])
+
+
+def occurrence_row_seq(df):
+    """
+    Row_Seq de las filas de un lote anterior al esquema v2: el hash del
+    contenido no basta, porque dos filas idénticas de un mismo archivo lo
+    comparten. Se combina con el ordinal de la fila entre sus idénticas del
+    archivo, que no depende del orden de lectura. La ventana agrega un
+    shuffle, así que solo se usa para los lotes que no traen Row_Seq.
+    """
+    row_hash = content_hash(df)
+    partition = [row_hash]
+    if SOURCE_FILE_COLUMN in df.columns:
+        partition.append(col(SOURCE_FILE_COLUMN))
+    if retail_schema.CORRUPT_RECORD_COLUMN in df.columns:
+        # Una fila mal formada no le quita el ordinal a una válida igual
+        partition.append(col(retail_schema.CORRUPT_RECORD_COLUMN).isNull())
+    ordinal = row_number().over(Window.partitionBy(*partition).orderBy(row_hash))
+    return xxhash64(row_hash, ordinal)
+
+
+def clean_retail_df(df):
+    """
+    Normaliza nombres de columnas y valores nulos de un lote ya tipado, en una
+    sola proyección (un withColumn por columna agranda el plan en cada paso)
+    """
+    sources = source_columns(df)
+
+    def source(name):
+        return col("`{}`".format(sources.get(name, name)))
+
+    # Identidad de fila. Los lotes anteriores al esquema v2 no la traen: se
+    # deriva del nombre del archivo y del contenido, estables entre reintentos.
+    # read_retail_batches ya completa el Row_Seq de los CSV anteriores; un
+    # Row_Seq nulo que quede se cubre solo con el hash del contenido
+    if SOURCE_FILE_COLUMN in sources:
+        source_batch = regexp_extract(source(SOURCE_FILE_COLUMN), r"retail_batch_([^/]+)\.\w+$", 1)
+    else:
+        source_batch = lit("unknown")
+
+    double_columns = retail_schema.columns_of_type("double")
+    string_columns = retail_schema.columns_of_type("string")
+    projection = []
+    for name in retail_schema.clean_column_names():
+        if name == "batch_id":
+            expression = coalesce(source(name).cast("string"), source_batch) if name in sources \
+                else source_batch
+        elif name == "row_seq":
+            expression = coalesce(source(name).cast("long"), content_hash(df)) if name in sources \
+                else occurrence_row_seq(df)
+        elif name == "date":
+            expression = date_format(coalesce(source(name), current_date()) if name in sources
+                                     else current_date(), retail_schema.DATE_FORMAT)
+        elif name == "holiday_promotion":
+            expression = when(source(name) == 1, 1).otherwise(0)
+        elif name in double_columns:
+            expression = coalesce(source(name), lit(0.0))
+        elif name in string_columns:
+            expression = when(source(name).isNull(), "Unknown").otherwise(trim(source(name)))
+        else:
+            expression = source(name)
+        projection.append(expression.alias(name))
+    return df.select(projection)
+
+
+def size_partitions(df, rows, target_rows):
+    """
+    Ajusta las particiones de `df` a `rows` filas, `target_rows` por
+    partición: coalesce sin shuffle cuando sobran (muchos archivos chicos) y
+    repartition cuando faltan (pocos archivos grandes o no divisibles)
+    """
+    target = max(1, -(-rows // target_rows))
+    current = df.rdd.getNumPartitions()
+    if current > target:
+        return df.coalesce(target)
+    if current * 2 <= target:
+        return df.repartition(target)
+    return df
+
+
+def add_derived_metrics(df):
+    """Columnas de retail_metrics.DERIVED_COLUMNS, calculadas una vez al ingerir el lote"""
+    return df.select("*", *[expr(expression).alias(name)
+                            for name, expression in retail_metrics.DERIVED_COLUMNS])
+
+
+def postgres_frame(clean_df):
+    """Lote limpio con los tipos y columnas de retail_sales (date como DATE y métricas derivadas)"""
+    return add_derived_metrics(clean_df.withColumn("date", to_date(col("date"), retail_schema.DATE_FORMAT)))
@@ -0,0 +1,519 @@
+# -*- coding: utf-8 -*-
+"""Piezas compartidas por los jobs Spark del consumer (batch y streaming)."""
+import os
+import re
+import sys
+import uuid
+from functools import partial
+
+from pyspark.sql import SparkSession
+from pyspark.sql.functions import col, current_timestamp, input_file_name, lit, substring
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+import retail_schema
+import postgres_rollups
+import postgres_schema
+import postgres_state
+from retail_transform import (SOURCE_FILE_COLUMN, add_derived_metrics, clean_retail_df,
+                              count_batch_rows, occurrence_row_seq, postgres_frame, size_partitions,
+                              split_malformed)
+
+# --- Configuración ---
+HDFS_URI = "hdfs://hadoop-namenode:8020"
+POSTGRES_JAR = "/opt/spark/jars/postgresql-42.5.0.jar"
+HIVE_TABLE = "retail_sales_raw"
+POSTGRES_JDBC_URL = os.environ.get("POSTGRES_JDBC_URL", "jdbc:postgresql://postgres:5432/hive")
+POSTGRES_USER = os.environ.get("POSTGRES_USER", "hive")
+POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASSWORD", "hive")
+POSTGRES_TABLE = "retail_sales"
+POSTGRES_ROLLUP_TABLE = postgres_rollups.ROLLUP_TABLE
+POSTGRES_STATE_TABLE = postgres_state.STATE_TABLE
+
+INPUT_DIR = "/data/input"
+PROCESSED_DIR = "/data/processed"
+QUARANTINE_DIR = "/data/quarantine"
+
+# Formato de los lotes del producer: csv, parquet u orc
+INPUT_FORMAT = os.environ.get("INPUT_FORMAT", "csv")
+INPUT_FILE_PATTERN = "retail_batch_*." + INPUT_FORMAT
+
+# quarantine | drop | fail (ver retail_schema.MALFORMED_MODES). Solo aplica a
+# CSV: los formatos columnares ya llevan tipos y no tienen filas mal formadas.
+MALFORMED_ROWS_MODE = os.environ.get("MALFORMED_ROWS_MODE", "quarantine")
+
+POSTGRES_COLUMN_TYPES = retail_schema.postgres_column_types()
+
+# Escritura en PostgreSQL:
+#   jdbc  escritor JDBC de Spark con inserciones por lotes (reWriteBatchedInserts)
+#   copy  COPY FROM STDIN por partición (requiere psycopg2 en los executors)
+POSTGRES_SINK_MODE = os.environ.get("POSTGRES_SINK_MODE", "jdbc")
+# Conexiones simultáneas máximas contra PostgreSQL (una por partición escrita)
+POSTGRES_WRITE_PARTITIONS = int(os.environ.get("POSTGRES_WRITE_PARTITIONS", "4"))
+POSTGRES_BATCH_SIZE = int(os.environ.get("POSTGRES_BATCH_SIZE", "10000"))
+# Particiones mensuales que se crean por adelantado además del mes en curso
+POSTGRES_PARTITION_PREMAKE_MONTHS = int(os.environ.get("POSTGRES_PARTITION_PREMAKE_MONTHS", "2"))
+
+# Columnas de partición de la tabla Hive, de la más general a la más fina.
+# La fecha permite descartar particiones en consultas por rango; region y/o
+# category se pueden agregar (p. ej. "date,region") cuando la tabla crece.
+HIVE_PARTITION_COLUMNS = [name.strip() for name in
+                          os.environ.get("HIVE_PARTITION_COLUMNS", "date").split(",") if name.strip()]
+for _partition_column in HIVE_PARTITION_COLUMNS:
+    if _partition_column not in retail_schema.clean_column_names():
+        raise ValueError("Columna de partición desconocida: {}".format(_partition_column))
+
+
+# Ajustes de ejecución de Spark (variable de entorno -> propiedad). Solo se
+# aplican los definidos; vacíos quedan los valores por defecto de Spark.
+SPARK_TUNING_SETTINGS = [
+    ("SPARK_EXECUTOR_MEMORY", "spark.executor.memory"),
+    ("SPARK_EXECUTOR_CORES", "spark.executor.cores"),
+    ("SPARK_CORES_MAX", "spark.cores.max"),
+    # 200 particiones de shuffle por defecto es demasiado para lotes de minutos
+    ("SPARK_SHUFFLE_PARTITIONS", "spark.sql.shuffle.partitions"),
+    # AQE (Spark 3.0) une particiones de shuffle pequeñas según su tamaño real
+    ("SPARK_ADAPTIVE_ENABLED", "spark.sql.adaptive.enabled"),
+    ("SPARK_ADAPTIVE_COALESCE_PARTITIONS", "spark.sql.adaptive.coalescePartitions.enabled"),
+]
+
+# Filas por partición del lote limpio: el número de particiones se ajusta al
+# tamaño del lote y no a la cantidad de archivos leídos
+TARGET_PARTITION_ROWS = int(os.environ.get("SPARK_TARGET_PARTITION_ROWS", "500000"))
+# Nivel de almacenamiento del lote limpio mientras se escribe en Hive y PostgreSQL
+BATCH_STORAGE_LEVEL = os.environ.get("SPARK_BATCH_STORAGE_LEVEL", "MEMORY_AND_DISK")
+
+
+def spark_tuning_conf():
+    """Propiedades de SPARK_TUNING_SETTINGS definidas en el entorno"""
+    return dict((name, os.environ[variable]) for variable, name in SPARK_TUNING_SETTINGS
+                if os.environ.get(variable, "").strip())
+
+
+def build_spark_session(app_name, master=None, hive=True):
+    """
+    Crea (o reutiliza) la sesión Spark. Con `hive`, sobre HDFS y con soporte
+    Hive (el cluster); sin él, una sesión simple sobre el sistema de archivos
+    por defecto, p. ej. con master local[*] y rutas locales. `master` None
+    deja el de spark-submit.
+    """
+    builder = SparkSession.builder.appName(app_name)
+    if master:
+        builder = builder.master(master)
+    for name, value in spark_tuning_conf().items():
+        builder = builder.config(name, value)
+    if os.path.exists(POSTGRES_JAR):
+        builder = builder.config("spark.jars", POSTGRES_JAR)
+    if hive:
+        builder = builder \
+            .config("spark.hadoop.fs.defaultFS", HDFS_URI) \
+            .config("hive.metastore.uris", "thrift://hive-metastore:9083") \
+            .config("spark.sql.warehouse.dir", HDFS_URI + "/user/hive/warehouse") \
+            .config("spark.hadoop.hive.metastore.warehouse.dir", HDFS_URI + "/user/hive/warehouse") \
+            .config("hive.exec.dynamic.partition", "true") \
+            .config("hive.exec.dynamic.partition.mode", "nonstrict") \
+            .config("hive.exec.max.dynamic.partitions", "10000") \
+            .enableHiveSupport()
+    spark = builder.getOrCreate()
+
+    spark.sparkContext.setLogLevel("WARN")
+    return spark
+
+
+def read_schema(version=None, file_format=None, malformed_mode=None):
+    """
+    Esquema declarado de lectura según la versión, el formato y el modo de
+    filas mal formadas (por defecto INPUT_FORMAT y MALFORMED_ROWS_MODE)
+    """
+    file_format = file_format or INPUT_FORMAT
+    malformed_mode = malformed_mode or MALFORMED_ROWS_MODE
+    return retail_schema.spark_read_schema(
+        version, with_corrupt_record=(file_format == "csv" and malformed_mode == "quarantine"))
+
+
+def read_options(file_format=None, malformed_mode=None):
+    if (file_format or INPUT_FORMAT) != "csv":
+        return {}
+    return retail_schema.spark_read_options(malformed_mode or MALFORMED_ROWS_MODE)
+
+
+def expand_paths(spark, path):
+    """Archivos de `path`: una ruta, un patrón o un directorio, o una lista de ellos"""
+    files = []
+    for pattern in [path] if isinstance(path, str) else path:
+        fs = path_fs(spark, pattern)
+        for status in fs.globStatus(hadoop_path(spark, pattern)) or []:
+            if status.isDirectory():
+                files.extend(child.getPath().toString() for child in fs.listStatus(status.getPath())
+                             if child.isFile() and not child.getPath().getName().startswith(("_", ".")))
+            else:
+                files.append(status.getPath().toString())
+    return files
+
+
+def csv_schema_version(spark, path):
+    """Versión del esquema de un lote CSV según su encabezado (la actual si no se reconoce)"""
+    jvm = spark._jvm
+    stream = path_fs(spark, path).open(hadoop_path(spark, path))
+    try:
+        header = jvm.java.io.BufferedReader(jvm.java.io.InputStreamReader(stream, "UTF-8")).readLine()
+    finally:
+        stream.close()
+    return retail_schema.version_of_csv_header(header) or retail_schema.SCHEMA_VERSION
+
+
+def load_batch_version(spark, paths, version, file_format, malformed_mode):
+    """
+    Lee lotes de una misma versión y los lleva a las columnas del esquema
+    actual: las que faltan quedan nulas, salvo Row_Seq, que se deriva del
+    contenido de cada fila y de su ordinal entre las idénticas del archivo
+    """
+    df = spark.read.schema(read_schema(version, file_format, malformed_mode)) \
+        .options(**read_options(file_format, malformed_mode)).format(file_format).load(paths) \
+        .withColumn(SOURCE_FILE_COLUMN, input_file_name())
+    if version == retail_schema.SCHEMA_VERSION:
+        return df
+    return df.select([col(field.name) if field.name in df.columns
+                      else occurrence_row_seq(df).cast(field.dataType).alias(field.name)
+                      if retail_schema.normalize_column_name(field.name) == "row_seq"
+                      else lit(None).cast(field.dataType).alias(field.name)
+                      for field in read_schema(None, file_format, malformed_mode).fields]
+                     + [col(SOURCE_FILE_COLUMN)])
+
+
+def read_retail_batches(spark, path, file_format=None, malformed_mode=None):
+    """
+    Lee los lotes en una sola pasada con el esquema declarado.
+
+    Un CSV de una versión anterior (sin Batch_ID ni Row_Seq) tiene menos
+    columnas que el esquema actual, y Spark 3.0 trataría cada una de sus filas
+    como mal formada. Los CSV se agrupan por la versión de su encabezado, cada
+    grupo se lee con su esquema y las columnas que le faltan quedan nulas.
+    Los formatos columnares ya completan con nulos las columnas ausentes.
+    """
+    file_format = file_format or INPUT_FORMAT
+    if file_format != "csv":
+        return load_batch_version(spark, path, retail_schema.SCHEMA_VERSION, file_format, malformed_mode)
+
+    groups = {}
+    for file_path in expand_paths(spark, path):
+        groups.setdefault(csv_schema_version(spark, file_path), []).append(file_path)
+    if not groups:
+        return load_batch_version(spark, path, retail_schema.SCHEMA_VERSION, file_format, malformed_mode)
+
+    frames = [load_batch_version(spark, paths, version, file_format, malformed_mode)
+              for version, paths in sorted(groups.items())]
+    df = frames[0]
+    for frame in frames[1:]:
+        df = df.union(frame)
+    return df
+
+
+def reread_legacy_batches(spark, batch_df):
+    """
+    Vuelve a leer con su versión del esquema los CSV anteriores que aparecen
+    entre las filas mal formadas de `batch_df` (un micro-batch de streaming,
+    que la fuente lee entero con el esquema actual). Retorna `batch_df` si no
+    hay ninguno. Solo en modo quarantine: en drop o fail esas filas no llegan.
+    """
+    if retail_schema.CORRUPT_RECORD_COLUMN not in batch_df.columns:
+        return batch_df
+    malformed_paths = [row[0] for row in batch_df
+                       .filter(col(retail_schema.CORRUPT_RECORD_COLUMN).isNotNull())
+                       .select(SOURCE_FILE_COLUMN).distinct().collect()]
+    legacy_paths = [path for path in malformed_paths
+                    if csv_schema_version(spark, path) != retail_schema.SCHEMA_VERSION]
+    if not legacy_paths:
+        return batch_df
+    return batch_df.filter(~col(SOURCE_FILE_COLUMN).isin(legacy_paths)) \
+        .union(read_retail_batches(spark, legacy_paths))
+
+
+def quarantine_rows(malformed_df, quarantine_dir=HDFS_URI + QUARANTINE_DIR):
+    """Guarda las filas mal formadas en /data/quarantine para revisión"""
+    malformed_df \
+        .withColumn("_quarantined_at", current_timestamp()) \
+        .write \
+        .mode("append") \
+        .json(quarantine_dir)
+
+
+def persist_batch(df):
+    """Persiste un lote que se escribe en varios destinos (BATCH_STORAGE_LEVEL)"""
+    from pyspark import StorageLevel
+    return df.persist(getattr(StorageLevel, BATCH_STORAGE_LEVEL))
+
+
+def hive_column_order():
+    """Orden de columnas para insertInto: primero los datos, al final las particiones"""
+    return [name for name in retail_schema.clean_column_names()
+            if name not in HIVE_PARTITION_COLUMNS] + HIVE_PARTITION_COLUMNS
+
+
+def hive_table_ddl(table):
+    return """
+        CREATE TABLE IF NOT EXISTS {} (
+            {}
+        ) {}
+        STORED AS ORC
+    """.format(table,
+               retail_schema.hive_columns_ddl(indent="            ", exclude=HIVE_PARTITION_COLUMNS),
+               retail_schema.hive_partition_ddl(HIVE_PARTITION_COLUMNS))
+
+
+def hive_table_exists(spark, table):
+    return table in [t.name for t in spark.catalog.listTables("default")]
+
+
+def migrate_hive_table(spark):
+    """
+    Reescribe la tabla Hive existente con las columnas y particiones actuales.
+
+    Los datos se copian a una tabla nueva con inserción dinámica de
+    particiones y luego se intercambian los nombres, de modo que la tabla
+    original sigue consultable hasta el final. Si la migración se interrumpe
+    entre los dos renombrados, la siguiente llamada la completa.
+    """
+    staging_table = HIVE_TABLE + "_migration"
+    legacy_table = HIVE_TABLE + "_legacy"
+
+    if hive_table_exists(spark, HIVE_TABLE):
+        spark.sql("DROP TABLE IF EXISTS " + staging_table)
+        spark.sql(hive_table_ddl(staging_table))
+        # Las columnas que la tabla anterior no tenía se copian como nulas
+        source = spark.table(HIVE_TABLE)
+        types = retail_schema.column_types()
+        source.select([col(name) if name in source.columns
+                       else lit(None).cast(retail_schema.HIVE_TYPES[types[name]].lower()).alias(name)
+                       for name in hive_column_order()]) \
+            .write.insertInto(staging_table)
+        spark.sql("DROP TABLE IF EXISTS " + legacy_table)
+        spark.sql("ALTER TABLE {} RENAME TO {}".format(HIVE_TABLE, legacy_table))
+
+    spark.sql("ALTER TABLE {} RENAME TO {}".format(staging_table, HIVE_TABLE))
+    spark.sql("DROP TABLE IF EXISTS " + legacy_table)
+
+
+def ensure_hive_table(spark):
+    """Crea la tabla Hive particionada, migrando una tabla con otro esquema o particiones"""
+    spark.sql("USE default")
+    if not hive_table_exists(spark, HIVE_TABLE):
+        if hive_table_exists(spark, HIVE_TABLE + "_migration"):
+            print("SPARK: Completando migración interrumpida de '{}'...".format(HIVE_TABLE))
+            migrate_hive_table(spark)
+        else:
+            spark.sql(hive_table_ddl(HIVE_TABLE))
+        return
+
+    columns = spark.catalog.listColumns(HIVE_TABLE)
+    partitions = [c.name for c in columns if c.isPartition]
+    data_columns = [c.name for c in columns if not c.isPartition]
+    expected_columns = [name for name in hive_column_order() if name not in HIVE_PARTITION_COLUMNS]
+    if partitions != HIVE_PARTITION_COLUMNS or data_columns != expected_columns:
+        print("SPARK: Migrando '{}' (particiones {} -> {}, {} -> {} columnas)...".format(
+            HIVE_TABLE, partitions or "(ninguna)", HIVE_PARTITION_COLUMNS,
+            len(data_columns), len(expected_columns)))
+        migrate_hive_table(spark)
+        print("SPARK: ✓ Tabla '{}' migrada".format(HIVE_TABLE))
+
+
+def write_to_hive(clean_df):
+    """Agrega un lote limpio a la tabla Hive (particiones dinámicas)"""
+    clean_df.select(hive_column_order()) \
+        .write \
+        .mode("append") \
+        .insertInto(HIVE_TABLE)
+
+
+def postgres_connection_params():
+    """Parámetros de psycopg2 equivalentes a POSTGRES_JDBC_URL"""
+    match = re.match(r"jdbc:postgresql://([^:/]+)(?::(\d+))?/([^?]+)", POSTGRES_JDBC_URL)
+    if not match:
+        raise ValueError("URL JDBC de PostgreSQL no reconocida: {}".format(POSTGRES_JDBC_URL))
+    host, port, database = match.groups()
+    return {"host": host, "port": int(port or 5432), "dbname": database,
+            "user": POSTGRES_USER, "password": POSTGRES_PASSWORD}
+
+
+def jdbc_connection(spark):
+    """Conexión JDBC a PostgreSQL abierta en la JVM del driver"""
+    jvm = spark._jvm
+    jvm.java.lang.Class.forName("org.postgresql.Driver")
+    return jvm.java.sql.DriverManager.getConnection(POSTGRES_JDBC_URL, POSTGRES_USER, POSTGRES_PASSWORD)
+
+
+def run_postgres_statements(spark, statements):
+    """Ejecuta sentencias en una conexión JDBC; retorna las filas afectadas de cada una"""
+    connection = jdbc_connection(spark)
+    try:
+        return [connection.createStatement().executeUpdate(statement) for statement in statements]
+    finally:
+        connection.close()
+
+
+_postgres_table_ready = False
+
+
+def ensure_postgres_table(spark):
+    """
+    Crea o migra la tabla destino al esquema particionado de postgres_schema,
+    y su rollup diario y su estado por tienda/producto si faltan.
+
+    Una vez por proceso: la comprobación toma locks sobre la tabla.
+    """
+    global _postgres_table_ready
+    if _postgres_table_ready:
+        return
+    connection = jdbc_connection(spark)
+    try:
+        message = postgres_schema.migrate(connection, POSTGRES_TABLE, POSTGRES_PARTITION_PREMAKE_MONTHS)
+        if message:
+            print("SPARK: " + message)
+        message = postgres_rollups.ensure_rollup_table(connection, POSTGRES_ROLLUP_TABLE, POSTGRES_TABLE)
+        if message:
+            print("SPARK: " + message)
+        message = postgres_state.ensure_state_table(connection, POSTGRES_STATE_TABLE, POSTGRES_TABLE)
+        if message:
+            print("SPARK: " + message)
+    finally:
+        connection.close()
+    _postgres_table_ready = True
+
+
+def ensure_postgres_partitions(spark, clean_df):
+    """Crea las particiones mensuales que necesita el lote antes de escribirlo"""
+    months = [row[0] for row in clean_df.select(substring(col("date"), 1, 7)).distinct().collect()]
+    connection = jdbc_connection(spark)
+    try:
+        postgres_schema.ensure_partitions(connection, POSTGRES_TABLE, months)
+    finally:
+        connection.close()
+
+
+def write_to_postgres_jdbc(clean_df, table=None):
+    """Escritor JDBC de Spark con lotes grandes y conexiones acotadas"""
+    separator = "&" if "?" in POSTGRES_JDBC_URL else "?"
+    properties = {
+        "user": POSTGRES_USER,
+        "password": POSTGRES_PASSWORD,
+        "driver": "org.postgresql.Driver",
+        "batchsize": str(POSTGRES_BATCH_SIZE),
+        "numPartitions": str(POSTGRES_WRITE_PARTITIONS),
+    }
+
+    clean_df.write \
+        .mode("append") \
+        .option("createTableColumnTypes", POSTGRES_COLUMN_TYPES) \
+        .jdbc(url=POSTGRES_JDBC_URL + separator + "reWriteBatchedInserts=true",
+              table=table or POSTGRES_TABLE, properties=properties)
+
+
+def write_to_postgres_copy(clean_df, table=None):
+    """COPY FROM STDIN en paralelo, una conexión por partición"""
+    spark = clean_df.sql_ctx.sparkSession
+    spark.sparkContext.addPyFile(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "postgres_copy.py"))
+    import postgres_copy
+
+    columns = [name for name in postgres_schema.column_names() if name in clean_df.columns]
+    df = clean_df.select(columns)
+    if df.rdd.getNumPartitions() > POSTGRES_WRITE_PARTITIONS:
+        df = df.coalesce(POSTGRES_WRITE_PARTITIONS)
+    df.foreachPartition(partial(postgres_copy.copy_partition,
+                                connection_params=postgres_connection_params(),
+                                table=table or POSTGRES_TABLE, columns=columns))
+
+
+def write_postgres_rows(clean_df, table):
+    """Escribe las filas en `table` con el escritor de POSTGRES_SINK_MODE"""
+    if POSTGRES_SINK_MODE == "copy":
+        write_to_postgres_copy(clean_df, table)
+    elif POSTGRES_SINK_MODE == "jdbc":
+        write_to_postgres_jdbc(clean_df, table)
+    else:
+        raise ValueError("Modo de escritura PostgreSQL desconocido: {}".format(POSTGRES_SINK_MODE))
+
+
+def merge_into_postgres(clean_df):
+    """
+    Carga el lote en una tabla de staging y lo pasa a la tabla destino en una
+    sola sentencia que también suma sus deltas al rollup diario y actualiza
+    el estado actual por tienda/producto. INSERT ... ON CONFLICT DO NOTHING
+    sobre la identidad de fila: reprocesar un lote ya escrito no agrega filas
+    ni altera los rollups.
+    Retorna las filas nuevas insertadas.
+    """
+    spark = clean_df.sql_ctx.sparkSession
+    stage_table = "{}_stage_{}".format(POSTGRES_TABLE, uuid.uuid4().hex[:12])
+    columns = postgres_schema.column_names()
+    conflict_clause = "ON CONFLICT ({}) DO NOTHING".format(", ".join(postgres_schema.CONFLICT_COLUMNS))
+
+    run_postgres_statements(spark, ["CREATE UNLOGGED TABLE {} (LIKE {} INCLUDING DEFAULTS)".format(
+        stage_table, POSTGRES_TABLE)])
+    try:
+        write_postgres_rows(clean_df, stage_table)
+        connection = jdbc_connection(spark)
+        try:
+            result = connection.createStatement().executeQuery(postgres_rollups.insert_with_rollup_sql(
+                POSTGRES_TABLE, POSTGRES_ROLLUP_TABLE, columns,
+                "SELECT {} FROM {}".format(", ".join(columns), stage_table), conflict_clause,
+                POSTGRES_STATE_TABLE))
+            result.next()
+            return result.getLong(1)
+        finally:
+            connection.close()
+    finally:
+        run_postgres_statements(spark, ["DROP TABLE IF EXISTS " + stage_table])
+
+
+def write_to_postgres(clean_df):
+    """
+    Escribe un lote limpio en PostgreSQL con merge_into_postgres, idempotente
+    ante reintentos. Retorna las filas insertadas.
+    """
+    spark = clean_df.sql_ctx.sparkSession
+    ensure_postgres_table(spark)
+    ensure_postgres_partitions(spark, clean_df)
+    postgres_df = postgres_frame(clean_df)
+    return merge_into_postgres(postgres_df)
+
+
+def get_hadoop_fs(spark):
+    """FileSystem de Hadoop de la sesión (cliente JVM en proceso vía py4j)"""
+    from py4j.java_gateway import java_import
+    java_import(spark._jvm, 'org.apache.hadoop.fs.*')
+    return spark._jvm.org.apache.hadoop.fs.FileSystem.get(spark._jsc.hadoopConfiguration())
+
+
+def hadoop_path(spark, path):
+    return spark._jvm.org.apache.hadoop.fs.Path(path)
+
+
+def path_fs(spark, path):
+    """FileSystem de Hadoop de una ruta (HDFS, file://, o el de la sesión si no lleva esquema)"""
+    return hadoop_path(spark, path).getFileSystem(spark._jsc.hadoopConfiguration())
+
+
+def list_input_files(spark, input_dir=INPUT_DIR):
+    """
+    Lotes presentes en `input_dir` (/data/input) como [(ruta, bytes, epoch de
+    modificación)]; la modificación es cuando el producer terminó de escribirlo
+    """
+    pattern = input_dir.rstrip("/") + "/" + INPUT_FILE_PATTERN
+    statuses = path_fs(spark, pattern).globStatus(hadoop_path(spark, pattern))
+    return [(status.getPath().toString(), status.getLen(), status.getModificationTime() / 1000.0)
+            for status in statuses or []]
+
+
+def move_processed_files(spark, paths, processed_dir=PROCESSED_DIR):
+    """Mueve los archivos leídos a `processed_dir` (/data/processed, modo batch)"""
+    fs = path_fs(spark, processed_dir)
+    fs.mkdirs(hadoop_path(spark, processed_dir))
+
+    moved = []
+    for path in paths:
+        file_path = hadoop_path(spark, path)
+        processed_path = hadoop_path(spark, processed_dir.rstrip("/") + "/" + file_path.getName())
+        fs.rename(file_path, processed_path)
+        moved.append(file_path.getName())
+    return moved
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Job Spark de compactación de archivos pequeños.
+
+Reescribe en archivos de un tamaño objetivo los lotes pequeños que se
+acumulan en /data/processed y los archivos ORC que cada ciclo del consumer
+agrega a la tabla Hive retail_sales_raw (por directorio, de modo que cada
+partición se compacta por separado).
+
+Este job es el único que reescribe /data/processed: el consumer solo mueve
+ahí los lotes que ya leyó (en modo streaming, cleanSource los archiva bajo
+/data/processed/data/input/, que se recorre de forma recursiva) y el
+producer nunca escribe en ese directorio.
+
+Es seguro frente a escrituras concurrentes del consumer: se toma una foto de
+los archivos a compactar al empezar, el resultado se escribe en un directorio
+oculto (prefijo '.', que Hive y Spark ignoran) y solo se borran los archivos
+de esa foto. Lo que el consumer agregue mientras tanto no se toca. Entre el
+renombrado del resultado y el borrado de los originales hay una ventana de
+milisegundos en la que un lector podría ver ambos.
+
+Los originales solo se borran si el resultado tiene las mismas filas que la
+entrada. Los CSV se leen en modo PERMISSIVE, cada uno con la versión del
+esquema de su encabezado; un grupo con filas mal formadas no se compacta.
+"""
+import math
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from spark_common import (HDFS_URI, HIVE_TABLE, PROCESSED_DIR, build_spark_session,
+                          count_batch_rows, get_hadoop_fs, hadoop_path, read_retail_batches,
+                          retail_schema)
+
+# --- Configuración ---
+COMPACTION_TARGET_BYTES = int(os.environ.get("COMPACTION_TARGET_BYTES", str(128 * 1024 * 1024)))
+# Mínimo de archivos pequeños en un directorio para que valga la pena compactarlo
+COMPACTION_MIN_FILES = int(os.environ.get("COMPACTION_MIN_FILES", "5"))
+
+FILE_FORMATS = ["csv", "parquet", "orc"]
+
+
+def list_data_files(spark, fs, root):
+    """Archivos de datos bajo `root` (recursivo), ignorando rutas ocultas o de staging"""
+    root_path = hadoop_path(spark, root)
+    if not fs.exists(root_path):
+        return []
+    root_uri = fs.makeQualified(root_path).toUri().getPath().rstrip("/")
+
+    files = []
+    iterator = fs.listFiles(root_path, True)
+    while iterator.hasNext():
+        status = iterator.next()
+        path = status.getPath()
+        relative = path.toUri().getPath()[len(root_uri):]
+        if any(part.startswith(("_", ".")) for part in relative.split("/") if part):
+            continue
+        files.append({
+            "path": path.toString(),
+            "name": path.getName(),
+            "parent": path.getParent().toString(),
+            "bytes": status.getLen(),
+        })
+    return files
+
+
+def file_format_of(name):
+    for file_format in FILE_FORMATS:
+        if name.endswith("." + file_format):
+            return file_format
+    return None
+
+
+def read_files(spark, paths, file_format):
+    """
+    Leer un conjunto de archivos de lote con el esquema registrado (cada CSV
+    con la versión de su encabezado), sin descartar filas: retorna (lote
+    cacheado con las columnas del esquema, filas, filas mal formadas)
+    """
+    df = read_retail_batches(spark, paths, file_format, "quarantine").cache()
+    rows, malformed = count_batch_rows(df)
+    return df, rows, malformed
+
+
+def count_written(spark, path, file_format):
+    """Filas de los archivos escritos en `path`"""
+    reader = spark.read.format(file_format)
+    if file_format == "csv":
+        reader = reader.option("header", "true")
+    return reader.load(path).count()
+
+
+def write_files(df, path, file_format):
+    writer = df.write.mode("overwrite")
+    if file_format == "csv":
+        writer = writer.option("header", "true")
+    writer.format(file_format).save(path)
+
+
+def compact_group(spark, fs, files, target_dir, df, rows, file_format, output_prefix):
+    """
+    Reescribe `df` (el contenido de `files`, `rows` filas) en archivos del
+    tamaño objetivo dentro de `target_dir` y borra los originales. Si el
+    resultado no tiene las mismas filas, se descarta y los originales quedan.
+    Retorna (archivos antes, archivos después, bytes antes, bytes después), o
+    None si el grupo no se compactó.
+    """
+    bytes_before = sum(f["bytes"] for f in files)
+    num_outputs = max(1, int(math.ceil(bytes_before / float(COMPACTION_TARGET_BYTES))))
+    run_id = "{}_{}".format(time.strftime("%Y%m%d_%H%M%S"), uuid.uuid4().hex[:8])
+    staging_dir = "{}/.compaction_{}".format(target_dir, run_id)
+
+    write_files(df.coalesce(num_outputs), staging_dir, file_format)
+    written = count_written(spark, staging_dir, file_format)
+    if written != rows:
+        fs.delete(hadoop_path(spark, staging_dir), True)
+        print("SPARK: ✗ {}: {} filas leídas y {} escritas; se conservan los {} originales".format(
+            target_dir, rows, written, len(files)))
+        return None
+
+    outputs = [status for status in fs.listStatus(hadoop_path(spark, staging_dir))
+               if status.getPath().getName().startswith("part-")]
+    bytes_after = 0
+    for index, status in enumerate(outputs):
+        destination = "{}/{}_{}_{:03d}.{}".format(target_dir, output_prefix, run_id, index, file_format)
+        fs.rename(status.getPath(), hadoop_path(spark, destination))
+        bytes_after += status.getLen()
+
+    for f in files:
+        fs.delete(hadoop_path(spark, f["path"]), False)
+    fs.delete(hadoop_path(spark, staging_dir), True)
+    return len(files), len(outputs), bytes_before, bytes_after
+
+
+def compact_processed_dir(spark, fs):
+    """
+    Compacta los lotes pequeños de /data/processed, agrupados por formato.
+
+    Es el único escritor del directorio aparte de los movimientos del
+    consumer; el resultado queda en la raíz de /data/processed.
+    """
+    totals = [0, 0, 0, 0]
+    files = [f for f in list_data_files(spark, fs, PROCESSED_DIR)
+             if f["bytes"] < COMPACTION_TARGET_BYTES and file_format_of(f["name"])]
+
+    for file_format in FILE_FORMATS:
+        group = [f for f in files if file_format_of(f["name"]) == file_format]
+        if len(group) < COMPACTION_MIN_FILES:
+            continue
+        df, rows, malformed = read_files(spark, [f["path"] for f in group], file_format)
+        try:
+            if malformed:
+                print("SPARK: ✗ {} ({}): {} filas mal formadas; el grupo no se compacta".format(
+                    PROCESSED_DIR, file_format, malformed))
+                continue
+            result = compact_group(spark, fs, group, HDFS_URI + PROCESSED_DIR,
+                                   df.select(retail_schema.raw_column_names()), rows,
+                                   file_format, "retail_compacted")
+        finally:
+            df.unpersist()
+        if result is None:
+            continue
+        print("SPARK: {} ({}): {} -> {} archivos, {:.1f} -> {:.1f} MB".format(
+            PROCESSED_DIR, file_format, result[0], result[1], result[2] / 1e6, result[3] / 1e6))
+        totals = [a + b for a, b in zip(totals, result)]
+    return totals
+
+
+def hive_table_location(spark, table):
+    for row in spark.sql("DESCRIBE FORMATTED {}".format(table)).collect():
+        if row[0] and row[0].strip() == "Location":
+            return row[1].strip()
+    raise RuntimeError("No se encontró la ubicación de la tabla {}".format(table))
+
+
+def compact_hive_table(spark, fs, table):
+    """Compacta los archivos ORC pequeños de cada directorio (partición) de la tabla"""
+    totals = [0, 0, 0, 0]
+    location = hive_table_location(spark, table)
+    files = [f for f in list_data_files(spark, fs, location)
+             if f["bytes"] < COMPACTION_TARGET_BYTES]
+
+    directories = {}
+    for f in files:
+        directories.setdefault(f["parent"], []).append(f)
+
+    for directory, group in sorted(directories.items()):
+        if len(group) < COMPACTION_MIN_FILES:
+            continue
+        # Los archivos de una partición no contienen la columna de partición,
+        # así que se leen y reescriben tal cual en el mismo directorio
+        df = spark.read.orc([f["path"] for f in group]).cache()
+        try:
+            result = compact_group(spark, fs, group, directory, df, df.count(), "orc", "compacted")
+        finally:
+            df.unpersist()
+        if result is None:
+            continue
+        print("SPARK: {}: {} -> {} archivos, {:.1f} -> {:.1f} MB".format(
+            directory, result[0], result[1], result[2] / 1e6, result[3] / 1e6))
+        totals = [a + b for a, b in zip(totals, result)]
+
+    if totals[0]:
+        spark.sql("REFRESH TABLE {}".format(table))
+    return totals
+
+
+def report(label, totals):
+    files_before, files_after, bytes_before, bytes_after = totals
+    if not files_before:
+        print("SPARK: {}: nada que compactar".format(label))
+        return
+    print("SPARK: ✓ {}: {} -> {} archivos (-{}), {:.1f} -> {:.1f} MB (-{:.1f} MB)".format(
+        label, files_before, files_after, files_before - files_after,
+        bytes_before / 1e6, bytes_after / 1e6, (bytes_before - bytes_after) / 1e6))
+
+
+def main():
+    print("=== INICIANDO COMPACTACIÓN DE ARCHIVOS PEQUEÑOS ===")
+    spark = build_spark_session("RetailCompaction")
+    try:
+        fs = get_hadoop_fs(spark)
+        print("SPARK: Tamaño objetivo: {:.0f} MB, mínimo {} archivos por directorio".format(
+            COMPACTION_TARGET_BYTES / 1e6, COMPACTION_MIN_FILES))
+
+        report(PROCESSED_DIR, compact_processed_dir(spark, fs))
+
+        try:
+            spark.sql("USE default")
+            report("Hive " + HIVE_TABLE, compact_hive_table(spark, fs, HIVE_TABLE))
+        except Exception as hive_error:
+            print("SPARK: ✗ Error compactando Hive: {}".format(str(hive_error)))
+    finally:
+        spark.stop()
+        print("SPARK: Sesión Spark finalizada")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Job Spark batch: procesa los lotes pendientes en /data/input.
+
+consumer.py lo lanza con spark-submit en cada ciclo contra el cluster, con
+los destinos hive y postgres. También corre en una sola máquina, sobre rutas
+locales y con otros destinos, para perfilar o medir la transformación:
+
+    spark-submit consumer/spark_processing.py --master "local[*]" \\
+        --input /tmp/retail/input --sinks parquet --parquet-dir /tmp/retail/out --keep-files
+
+Destinos (--sinks, separados por coma), en SINKS:
+
+    hive      insertInto en retail_sales_raw (un error no detiene los demás)
+    postgres  merge en retail_sales con su rollup y estado (staging JDBC)
+    parquet   Parquet particionado por HIVE_PARTITION_COLUMNS en --parquet-dir
+    noop      materializa el lote sin escribirlo (mide solo la transformación)
+    memory    agrega las filas a MEMORY_SINK, para pruebas en el mismo proceso
+
+Cada destino es una función (spark, clean_df, rows, args) que retorna las
+filas escritas. El ledger de ingesta se registra si hay destino hive o postgres.
+Los tiempos de cada etapa van a PIPELINE_METRICS_FILE (ver pipeline_metrics).
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from spark_common import (HDFS_URI, HIVE_PARTITION_COLUMNS, INPUT_DIR, INPUT_FILE_PATTERN,
+                          PROCESSED_DIR, QUARANTINE_DIR, TARGET_PARTITION_ROWS, build_spark_session,
+                          clean_retail_df, count_batch_rows, ensure_hive_table, list_input_files,
+                          move_processed_files, persist_batch, quarantine_rows, read_retail_batches,
+                          size_partitions, split_malformed, write_to_hive, write_to_postgres)
+from ingest_ledger import ensure_ledger, record_batch
+import pipeline_metrics
+
+# Filas recibidas por el destino memory (Row de pyspark), en orden de escritura
+MEMORY_SINK = []
+
+
+def write_hive_sink(spark, clean_df, rows, args):
+    ensure_hive_table(spark)
+    write_to_hive(clean_df)
+    return rows
+
+
+def write_postgres_sink(spark, clean_df, rows, args):
+    return write_to_postgres(clean_df)
+
+
+def write_parquet_sink(spark, clean_df, rows, args):
+    clean_df.write.mode("append").partitionBy(*HIVE_PARTITION_COLUMNS).parquet(args.parquet_dir)
+    return rows
+
+
+def write_noop_sink(spark, clean_df, rows, args):
+    clean_df.write.format("noop").mode("overwrite").save()
+    return rows
+
+
+def write_memory_sink(spark, clean_df, rows, args):
+    collected = clean_df.collect()
+    MEMORY_SINK.extend(collected)
+    return len(collected)
+
+
+SINKS = {
+    "hive": write_hive_sink,
+    "postgres": write_postgres_sink,
+    "parquet": write_parquet_sink,
+    "noop": write_noop_sink,
+    "memory": write_memory_sink,
+}
+# Destinos cuyo error se informa y no detiene los siguientes
+BEST_EFFORT_SINKS = {"hive"}
+# Destinos que cuenta el ledger (ingest_ledger.SINKS)
+LEDGER_SINKS = {"hive", "postgres"}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--master", default=None,
+                        help="master de Spark (p. ej. local[*]); por defecto el de spark-submit")
+    parser.add_argument("--input", default=HDFS_URI + INPUT_DIR,
+                        help="directorio con los lotes " + INPUT_FILE_PATTERN)
+    parser.add_argument("--processed-dir", default=HDFS_URI + PROCESSED_DIR,
+                        help="a dónde se mueven los archivos procesados")
+    parser.add_argument("--quarantine-dir", default=HDFS_URI + QUARANTINE_DIR,
+                        help="a dónde van las filas mal formadas")
+    parser.add_argument("--keep-files", action="store_true",
+                        help="no mover los archivos procesados")
+    parser.add_argument("--sinks", default="hive,postgres",
+                        help="destinos separados por coma: " + ", ".join(sorted(SINKS)))
+    parser.add_argument("--parquet-dir", default=None, help="directorio del destino parquet")
+    args = parser.parse_args(argv)
+
+    args.sinks = [name.strip() for name in args.sinks.split(",") if name.strip()]
+    unknown = [name for name in args.sinks if name not in SINKS]
+    if unknown:
+        parser.error("destinos desconocidos: {}".format(", ".join(unknown)))
+    if "parquet" in args.sinks and not args.parquet_dir:
+        parser.error("el destino parquet requiere --parquet-dir")
+    return args
+
+
+def sink_stage(name):
+    """Nombre de la etapa de un destino en pipeline_metrics (hive_write, postgres_write, ...)"""
+    return name + "_write"
+
+
+def process_files(spark, input_files, args):
+    """
+    Lee, limpia y escribe en los destinos de args.sinks los archivos dados
+    ([(ruta, bytes, modificación)]). Retorna la entrada del ledger del lote.
+    Cada etapa deja un evento en pipeline_metrics con el batch_key del lote.
+    """
+    paths = [path for path, _, _ in input_files]
+    entry = {
+        "batch_key": "batch_{}_{}".format(time.strftime("%Y%m%d_%H%M%S"), uuid.uuid4().hex[:8]),
+        "mode": "batch",
+        "files": len(input_files),
+        "bytes": sum(size for _, size, _ in input_files),
+    }
+    batch_key = entry["batch_key"]
+    use_ledger = bool(LEDGER_SINKS.intersection(args.sinks))
+    if use_ledger:
+        ensure_ledger(spark)
+
+    # Leer datos (una sola pasada con el esquema declarado, sin inferSchema)
+    started = time.time()
+    with pipeline_metrics.timed("consumer", "read", batch_key, files=entry["files"],
+                                bytes=entry["bytes"]) as stage:
+        df = read_retail_batches(spark, paths).cache()
+        record_count, malformed_count = count_batch_rows(df)
+        stage["rows"] = record_count
+    entry["rows_read"] = record_count
+    entry["rows_malformed"] = malformed_count
+    entry["read_seconds"] = time.time() - started
+    print("SPARK: Registros encontrados: {}".format(record_count))
+
+    valid_df, malformed_df = split_malformed(df)
+    if malformed_count > 0:
+        quarantine_rows(malformed_df, args.quarantine_dir)
+        print("SPARK: ⚠ {} filas mal formadas enviadas a {}".format(malformed_count, args.quarantine_dir))
+
+    print("SPARK: Realizando limpieza y transformación...")
+    # El lote limpio se escribe en varios destinos: se persiste con
+    # particiones según su tamaño y se materializa una vez, antes de
+    # liberar el lote leído
+    clean_df = persist_batch(size_partitions(clean_retail_df(valid_df),
+                                             record_count - malformed_count, TARGET_PARTITION_ROWS))
+    try:
+        with pipeline_metrics.timed("consumer", "transform", batch_key) as stage:
+            clean_count = stage["rows"] = clean_df.count()
+        df.unpersist()
+        print("SPARK: Lote limpio: {} filas en {} particiones".format(
+            clean_count, clean_df.rdd.getNumPartitions()))
+
+        print("SPARK: Esquema final:")
+        clean_df.printSchema()
+        clean_df.show(2)
+
+        for name in args.sinks:
+            print("SPARK: Escribiendo datos en {}...".format(name))
+            stage_started = time.time()
+            try:
+                with pipeline_metrics.timed("consumer", sink_stage(name), batch_key) as stage:
+                    entry[name + "_rows"] = stage["rows"] = SINKS[name](spark, clean_df, clean_count, args)
+                print("SPARK: ✓ {} filas escritas en {}".format(entry[name + "_rows"], name))
+            except Exception as sink_error:
+                if name not in BEST_EFFORT_SINKS:
+                    raise
+                entry[name + "_rows"] = 0
+                print("SPARK: ✗ Error con {}: {}".format(name, str(sink_error)))
+                print("SPARK: Continuando con los demás destinos...")
+            entry[name + "_seconds"] = time.time() - stage_started
+    finally:
+        clean_df.unpersist()
+        df.unpersist()
+    if "postgres" in args.sinks:
+        pipeline_metrics.record_end_to_end("consumer", paths)
+
+    # Mover archivos procesados
+    if not args.keep_files:
+        try:
+            with pipeline_metrics.timed("consumer", "file_move", batch_key, files=len(paths)):
+                for file_name in move_processed_files(spark, paths, args.processed_dir):
+                    print("SPARK: Archivo movido: " + file_name)
+        except Exception as fs_e:
+            print("SPARK: Advertencia - No se pudieron mover archivos: {}".format(str(fs_e)))
+
+    entry["total_seconds"] = time.time() - started
+    if use_ledger:
+        totals = record_batch(spark, entry)
+        print("SPARK: Total registros (ledger): Hive {}, PostgreSQL {}".format(
+            totals.get("hive", 0), totals.get("postgres", 0)))
+    return entry
+
+
+def run(spark, args):
+    """Procesa los archivos pendientes en args.input; retorna la entrada del lote o None"""
+    print("SPARK: Buscando datos en: " + args.input)
+    # Foto de los archivos a procesar: solo estos se leen y se mueven después
+    input_files = list_input_files(spark, args.input)
+    listed_at = time.time()
+    print("SPARK: Archivos encontrados: {} ({:.1f} MB)".format(
+        len(input_files), sum(size for _, size, _ in input_files) / 1e6))
+    if not input_files:
+        print("SPARK: No hay datos nuevos para procesar.")
+        return None
+    # Espera de cada archivo en /data/input hasta este ciclo
+    for path, size, modified_at in input_files:
+        pipeline_metrics.record("consumer", "detect", pipeline_metrics.shard_batch_id(path),
+                                listed_at - modified_at, bytes=size)
+    entry = process_files(spark, input_files, args)
+    print("SPARK: ✓ Procesamiento completado en {:.1f} s".format(entry["total_seconds"]))
+    return entry
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("=== INICIANDO PROCESAMIENTO SPARK ({}) ===".format(", ".join(args.sinks)))
+    spark = None
+    try:
+        spark = build_spark_session("RetailDataProcessor", master=args.master, hive="hive" in args.sinks)
+        print("SPARK: Sesión Spark creada")
+        run(spark, args)
+    except Exception as e:
+        print("SPARK: Error: " + str(e))
+        import traceback
+        traceback.print_exc()
+        # consumer.py distingue el éxito del fallo por el código de salida
+        sys.exit(1)
+    finally:
+        if spark is not None:
+            spark.stop()
+            print("SPARK: Sesión Spark finalizada")
+
+
+if __name__ == "__main__":
+    main()
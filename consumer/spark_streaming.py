@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Job Spark Structured Streaming de larga duración.
+
+Mantiene una única SparkSession viva y procesa los lotes que el producer deja
+en /data/input como micro-batches, escribiéndolos en Hive (retail_sales_raw) y
+PostgreSQL (retail_sales). El log de la fuente de archivos en el checkpoint
+registra qué archivos ya se consumieron, de modo que cada archivo se procesa
+exactamente una vez aunque el job se reinicie; una vez confirmado el
+micro-batch, Spark archiva los archivos (cleanSource) conservando su ruta de
+origen bajo sourceArchiveDir, es decir en /data/processed/data/input/. Los
+listados de /data/processed (spark_compaction) son recursivos por eso.
+"""
+import os
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pyspark.sql.functions import input_file_name
+
+from spark_common import (HDFS_URI, HIVE_TABLE, INPUT_DIR, INPUT_FILE_PATTERN, INPUT_FORMAT,
+                          PROCESSED_DIR, QUARANTINE_DIR, SOURCE_FILE_COLUMN, TARGET_PARTITION_ROWS,
+                          build_spark_session, clean_retail_df, count_batch_rows, ensure_hive_table,
+                          persist_batch, quarantine_rows, read_options, read_schema,
+                          reread_legacy_batches, size_partitions, split_malformed, write_to_hive,
+                          write_to_postgres)
+from ingest_ledger import ensure_ledger, record_batch
+import pipeline_metrics
+
+# --- Configuración ---
+TRIGGER_INTERVAL = os.environ.get("STREAMING_TRIGGER_INTERVAL", "30 seconds")
+CHECKPOINT_DIR = os.environ.get("STREAMING_CHECKPOINT_DIR",
+                                HDFS_URI + "/checkpoints/retail_sales")
+MAX_FILES_PER_TRIGGER = int(os.environ.get("STREAMING_MAX_FILES_PER_TRIGGER", "100"))
+
+# Los batch_id se reinician con un checkpoint nuevo; el hash del directorio
+# distingue sus entradas en el ledger
+LEDGER_KEY_PREFIX = "stream_{:08x}_".format(zlib.crc32(CHECKPOINT_DIR.encode("utf-8")))
+
+
+def process_micro_batch(spark, batch_df, batch_id):
+    """Limpia un micro-batch, lo escribe en Hive y PostgreSQL y lo registra en el ledger"""
+    started = time.time()
+    batch_key = LEDGER_KEY_PREFIX + str(batch_id)
+    batch_df = batch_df.withColumn(SOURCE_FILE_COLUMN, input_file_name()).cache()
+    clean_df = None
+    try:
+        record_count, malformed_count = count_batch_rows(batch_df)
+        if malformed_count > 0:
+            # Los CSV anteriores al esquema actual llegan como mal formados
+            recovered_df = reread_legacy_batches(spark, batch_df)
+            if recovered_df is not batch_df:
+                recovered_df = recovered_df.cache()
+                record_count, malformed_count = count_batch_rows(recovered_df)
+                batch_df.unpersist()
+                batch_df = recovered_df
+        if record_count == 0:
+            print("SPARK: Micro-batch {} vacío".format(batch_id))
+            return
+
+        paths = [row[0] for row in batch_df.select(SOURCE_FILE_COLUMN).distinct().collect()]
+        entry = {
+            "batch_key": batch_key,
+            "mode": "streaming",
+            "files": len(paths),
+            "rows_read": record_count,
+            "rows_malformed": malformed_count,
+            "read_seconds": time.time() - started,
+        }
+        pipeline_metrics.record("consumer", "read", batch_key, entry["read_seconds"], record_count,
+                                files=entry["files"])
+
+        valid_df, malformed_df = split_malformed(batch_df)
+        if malformed_count > 0:
+            quarantine_rows(malformed_df)
+            print("SPARK: ⚠ Micro-batch {}: {} filas mal formadas enviadas a {}".format(
+                batch_id, malformed_count, QUARANTINE_DIR))
+
+        # Persistido para las dos escrituras; una vez materializado ya no se
+        # necesita el micro-batch leído
+        clean_df = persist_batch(size_partitions(clean_retail_df(valid_df),
+                                                 record_count - malformed_count, TARGET_PARTITION_ROWS))
+        with pipeline_metrics.timed("consumer", "transform", batch_key) as stage:
+            clean_count = stage["rows"] = clean_df.count()
+        batch_df.unpersist()
+
+        stage_started = time.time()
+        try:
+            with pipeline_metrics.timed("consumer", "hive_write", batch_key) as stage:
+                write_to_hive(clean_df)
+                entry["hive_rows"] = stage["rows"] = clean_count
+            print("SPARK: ✓ Micro-batch {} escrito en Hive tabla '{}'".format(batch_id, HIVE_TABLE))
+        except Exception as hive_error:
+            entry["hive_rows"] = 0
+            print("SPARK: ✗ Error con Hive en micro-batch {}: {}".format(batch_id, str(hive_error)))
+            print("SPARK: Continuando con PostgreSQL...")
+        entry["hive_seconds"] = time.time() - stage_started
+
+        # Si esta escritura falla, la excepción detiene la consulta sin confirmar
+        # el micro-batch y sus archivos se reprocesan al reiniciar.
+        stage_started = time.time()
+        with pipeline_metrics.timed("consumer", "postgres_write", batch_key) as stage:
+            entry["postgres_rows"] = stage["rows"] = write_to_postgres(clean_df)
+        entry["postgres_seconds"] = time.time() - stage_started
+        pipeline_metrics.record_end_to_end("consumer", paths)
+        entry["total_seconds"] = time.time() - started
+
+        totals = record_batch(spark, entry)
+        print("SPARK: ✓ Micro-batch {} escrito en PostgreSQL ({} filas, total ledger: {})".format(
+            batch_id, entry["postgres_rows"], totals.get("postgres", 0)))
+    finally:
+        batch_df.unpersist()
+        if clean_df is not None:
+            clean_df.unpersist()
+
+
+def main():
+    print("=== INICIANDO SPARK STRUCTURED STREAMING CON HIVE Y POSTGRESQL ===")
+    spark = build_spark_session("RetailStreamingProcessor")
+    print("SPARK: Sesión Spark creada con soporte Hive")
+
+    try:
+        ensure_hive_table(spark)
+    except Exception as hive_error:
+        print("SPARK: ✗ Error preparando tabla Hive: {}".format(str(hive_error)))
+    ensure_ledger(spark)
+
+    # cleanSource archiva en /data/processed/data/input/<archivo>, no en la raíz
+    stream_df = spark.readStream \
+        .schema(read_schema()) \
+        .options(**read_options()) \
+        .option("pathGlobFilter", INPUT_FILE_PATTERN) \
+        .option("maxFilesPerTrigger", MAX_FILES_PER_TRIGGER) \
+        .option("cleanSource", "archive") \
+        .option("sourceArchiveDir", HDFS_URI + PROCESSED_DIR) \
+        .format(INPUT_FORMAT) \
+        .load(HDFS_URI + INPUT_DIR)
+
+    query = stream_df.writeStream \
+        .queryName("retail_sales_ingest") \
+        .foreachBatch(lambda batch_df, batch_id: process_micro_batch(spark, batch_df, batch_id)) \
+        .option("checkpointLocation", CHECKPOINT_DIR) \
+        .trigger(processingTime=TRIGGER_INTERVAL) \
+        .start()
+
+    print("SPARK: Streaming iniciado (trigger: {}, checkpoint: {})".format(
+        TRIGGER_INTERVAL, CHECKPOINT_DIR))
+    try:
+        query.awaitTermination()
+    finally:
+        spark.stop()
+        print("SPARK: Sesión Spark finalizada")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,12 @@
 
 POSTGRES_TABLE="retail_sales"
 HIVE_TABLE="retail_sales_raw"
+# Ledger de ingesta del consumer: conteos por destino sin escanear las tablas
+LEDGER_TABLE="retail_ingest_ledger"
+LEDGER_TOTALS_TABLE="retail_ingest_totals"
+ROLLUP_TABLE="retail_sales_daily_rollup"
+STATE_TABLE="retail_inventory_state"
+VERSION_TABLE="retail_data_version"
 
 echo "🧹 INICIANDO LIMPIEZA COMBINADA POSTGRESQL + HIVE"
 
@@ -16,9 +22,15 @@ hive_table_exists() {
     docker exec hive-server /opt/hive/bin/beeline -u jdbc:hive2://localhost:10000 -n root -e "SHOW TABLES LIKE '$1';" 2>/dev/null | grep -q "$1"
 }
 
-# Función para obtener conteo de Hive
-get_hive_count() {
-    docker exec hive-server /opt/hive/bin/beeline -u jdbc:hive2://localhost:10000 -n root -e "SELECT COUNT(*) FROM $1;" 2>/dev/null | grep -v "SLF4J" | grep -v "log4j" | grep -v "WARN" | grep -v "INFO" | grep -v "+" | grep -v "|" | grep -E '^[0-9]+$' | head -1 | tr -d ' \n'
+# Función para obtener el conteo de un destino ('postgres' o 'hive') desde el ledger
+get_ledger_count() {
+    COUNT=$(docker exec postgres psql -U hive -d hive -t -c "SELECT row_count FROM $LEDGER_TOTALS_TABLE WHERE sink = '$1';" 2>/dev/null | tr -d ' \n')
+    echo "${COUNT:-0}"
+}
+
+# Función para poner a cero el ledger de un destino tras limpiarlo
+reset_ledger() {
+    docker exec postgres psql -U hive -d hive -c "UPDATE $LEDGER_TOTALS_TABLE SET row_count = 0, batch_count = 0, updated_at = now() WHERE sink = '$1';" > /dev/null 2>&1
 }
 
 # Iniciar PostgreSQL si no está corriendo
@@ -57,11 +69,11 @@ fi
 # Obtener conteos ANTES de la limpieza
 echo "📊 Conteos antes de la limpieza:"
 
-POSTGRES_COUNT_BEFORE=$(docker exec postgres psql -U hive -d hive -t -c "SELECT COUNT(*) FROM $POSTGRES_TABLE;" 2>/dev/null | tr -d ' \n' || echo "0")
+POSTGRES_COUNT_BEFORE=$(get_ledger_count "postgres")
 echo "   PostgreSQL $POSTGRES_TABLE: $POSTGRES_COUNT_BEFORE registros"
 
 if [ "$HIVE_READY" = true ]; then
-    HIVE_COUNT_BEFORE=$(get_hive_count "$HIVE_TABLE" || echo "0")
+    HIVE_COUNT_BEFORE=$(get_ledger_count "hive")
     echo "   Hive $HIVE_TABLE: $HIVE_COUNT_BEFORE registros"
 fi
 
@@ -71,7 +83,13 @@ echo "🗑️  Limpiando PostgreSQL..."
 docker exec postgres psql -U hive -d hive -c "TRUNCATE TABLE $POSTGRES_TABLE;" > /dev/null 2>&1
 
 if [ $? -eq 0 ]; then
-    POSTGRES_COUNT_AFTER=$(docker exec postgres psql -U hive -d hive -t -c "SELECT COUNT(*) FROM $POSTGRES_TABLE;" | tr -d ' \n')
+    reset_ledger "postgres"
+    docker exec postgres psql -U hive -d hive -c "TRUNCATE TABLE $LEDGER_TABLE;" > /dev/null 2>&1
+    docker exec postgres psql -U hive -d hive -c "TRUNCATE TABLE $ROLLUP_TABLE;" > /dev/null 2>&1
+    docker exec postgres psql -U hive -d hive -c "TRUNCATE TABLE $STATE_TABLE;" > /dev/null 2>&1
+    # Invalida la cache del dashboard
+    docker exec postgres psql -U hive -d hive -c "UPDATE $VERSION_TABLE SET version = version + 1, updated_at = now();" > /dev/null 2>&1
+    POSTGRES_COUNT_AFTER=$(get_ledger_count "postgres")
     echo "✅ PostgreSQL $POSTGRES_TABLE limpiada ($POSTGRES_COUNT_AFTER registros restantes)"
 else
     echo "❌ Error limpiando PostgreSQL"
@@ -89,7 +107,8 @@ if [ "$HIVE_READY" = true ]; then
         docker exec hive-server /opt/hive/bin/beeline -u jdbc:hive2://localhost:10000 -n root -e "TRUNCATE TABLE $HIVE_TABLE;" > /dev/null 2>&1
         
         if [ $? -eq 0 ]; then
-            HIVE_COUNT_AFTER=$(get_hive_count "$HIVE_TABLE" || echo "0")
+            reset_ledger "hive"
+            HIVE_COUNT_AFTER=$(get_ledger_count "hive")
             echo "✅ Hive $HIVE_TABLE limpiada ($HIVE_COUNT_AFTER registros restantes)"
         else
             # Opción 2: DROP y CREATE (más agresivo)
@@ -99,7 +118,6 @@ if [ "$HIVE_READY" = true ]; then
             # Recrear la tabla
             docker exec hive-server /opt/hive/bin/beeline -u jdbc:hive2://localhost:10000 -n root -e "
                 CREATE TABLE $HIVE_TABLE (
-                    date STRING,
                     store_id STRING,
                     product_id STRING,
                     category STRING,
@@ -113,17 +131,20 @@ if [ "$HIVE_READY" = true ]; then
                     weather_condition STRING,
                     holiday_promotion INT,
                     competitor_pricing DOUBLE,
-                    seasonality STRING
-                ) STORED AS ORC;" > /dev/null 2>&1
+                    seasonality STRING,
+                    batch_id STRING,
+                    row_seq BIGINT
+                ) PARTITIONED BY (date STRING)
+                STORED AS ORC;" > /dev/null 2>&1
             
-            HIVE_COUNT_AFTER=$(get_hive_count "$HIVE_TABLE" || echo "0")
+            reset_ledger "hive"
+            HIVE_COUNT_AFTER=$(get_ledger_count "hive")
             echo "✅ Hive $HIVE_TABLE recreada ($HIVE_COUNT_AFTER registros restantes)"
         fi
     else
         echo "ℹ️  Tabla $HIVE_TABLE no existe en Hive, creándola..."
         docker exec hive-server /opt/hive/bin/beeline -u jdbc:hive2://localhost:10000 -n root -e "
             CREATE TABLE $HIVE_TABLE (
-                date STRING,
                 store_id STRING,
                 product_id STRING,
                 category STRING,
@@ -137,8 +158,12 @@ if [ "$HIVE_READY" = true ]; then
                 weather_condition STRING,
                 holiday_promotion INT,
                 competitor_pricing DOUBLE,
-                seasonality STRING
-            ) STORED AS ORC;" > /dev/null 2>&1
+                seasonality STRING,
+                batch_id STRING,
+                row_seq BIGINT
+            ) PARTITIONED BY (date STRING)
+            STORED AS ORC;" > /dev/null 2>&1
+        reset_ledger "hive"
         echo "✅ Tabla $HIVE_TABLE creada en Hive"
     fi
 fi
@@ -149,7 +174,7 @@ echo "📋 RESUMEN FINAL:"
 echo "   PostgreSQL $POSTGRES_TABLE: $POSTGRES_COUNT_AFTER registros"
 
 if [ "$HIVE_READY" = true ]; then
-    HIVE_FINAL_COUNT=$(get_hive_count "$HIVE_TABLE" || echo "0")
+    HIVE_FINAL_COUNT=$(get_ledger_count "hive")
     echo "   Hive $HIVE_TABLE: $HIVE_FINAL_COUNT registros"
     
     # Verificar consistencia
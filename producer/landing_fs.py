@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Cliente de sistema de archivos en proceso para la zona de aterrizaje (/data/input).
+
+Reemplaza las llamadas a la CLI `hdfs dfs` (una JVM por lote o por archivo)
+por un cliente pyarrow que se abre una vez por proceso y se reutiliza.
+Backends según el URI:
+
+    hdfs://host:puerto      pyarrow.fs.HadoopFileSystem (libhdfs)
+    webhdfs://host:puerto   fsspec WebHDFS (REST, sin JVM)
+    file:///ruta/base       directorio local, para pruebas sin clúster
+
+Las operaciones masivas (renombrar, borrar) se reparten en un pool de hilos
+sobre la misma conexión. El producer no escribe en /data/processed: ese
+directorio es del consumer y lo compacta solo consumer/spark_compaction.py.
+"""
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import retail_schema
+
+# Formatos de salida soportados -> extensión del archivo
+OUTPUT_FORMATS = {"csv": "csv", "parquet": "parquet", "orc": "orc"}
+
+# Hilos por defecto para las operaciones masivas
+DEFAULT_MAX_WORKERS = int(os.environ.get("LANDING_FS_MAX_WORKERS", "8"))
+
+_filesystems = {}
+
+
+def get_filesystem(uri):
+    """Retorna (filesystem, ruta_base) para un URI, reutilizando la conexión"""
+    if uri not in _filesystems:
+        if uri.startswith("webhdfs://"):
+            import fsspec
+            from pyarrow.fs import PyFileSystem, FSSpecHandler
+
+            host_port = uri[len("webhdfs://"):].split("/", 1)[0]
+            host, _, port = host_port.partition(":")
+            fs = fsspec.filesystem("webhdfs", host=host, port=int(port or 9870))
+            _filesystems[uri] = (PyFileSystem(FSSpecHandler(fs)), "")
+        elif uri.startswith("file://"):
+            from pyarrow.fs import LocalFileSystem
+
+            base_path = uri[len("file://"):].rstrip("/")
+            _filesystems[uri] = (LocalFileSystem(), base_path)
+        else:
+            from pyarrow.fs import FileSystem
+
+            fs, base_path = FileSystem.from_uri(uri)
+            _filesystems[uri] = (fs, base_path.rstrip("/"))
+    return _filesystems[uri]
+
+
+def resolve_path(base_path, path):
+    return base_path + path if base_path else path
+
+
+def to_arrow_table(batch_df):
+    """Convertir un lote conformado al esquema registrado en una tabla Arrow"""
+    import pyarrow as pa
+
+    columns = {}
+    for raw, _, logical in retail_schema.get_columns():
+        values = batch_df[raw]
+        if logical == "date":
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Solo se convierten las categorías, no cada fila
+                values = values.cat.rename_categories(pd.to_datetime(values.cat.categories).date)
+            else:
+                values = pd.to_datetime(values).dt.date
+        columns[raw] = values
+    # Las columnas categóricas llegan como diccionarios y el cast las densifica
+    table = pa.Table.from_pandas(pd.DataFrame(columns), preserve_index=False)
+    return table.cast(retail_schema.arrow_schema())
+
+
+def serialize_table(table, output_format, compression):
+    """Serializar una tabla Arrow en memoria en el formato pedido"""
+    buffer = io.BytesIO()
+    if output_format == "csv":
+        from pyarrow import csv
+        csv.write_csv(table, buffer)
+    elif output_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, buffer, compression=compression)
+    elif output_format == "orc":
+        from pyarrow import orc
+        orc.write_table(table, buffer, compression=compression)
+    else:
+        raise ValueError("Formato de salida desconocido: {}".format(output_format))
+    return buffer.getvalue()
+
+
+def serialize_batch(batch_df, output_format, compression):
+    """Serializar el lote en memoria en el formato pedido"""
+    if output_format == "csv":
+        return batch_df.to_csv(index=False).encode("utf-8")
+    return serialize_table(to_arrow_table(batch_df), output_format, compression)
+
+
+def write_payload(uri, path, payload):
+    """
+    Escribir bytes en el sistema de archivos destino de forma atómica.
+
+    Se escribe primero con un nombre oculto (prefijo '.') que Spark y el patrón
+    retail_batch_* ignoran, y luego se renombra, para que el consumer nunca
+    lea un archivo a medio escribir. Retorna el número de bytes escritos.
+    """
+    fs, base_path = get_filesystem(uri)
+    directory, filename = os.path.split(path)
+    final_path = resolve_path(base_path, path)
+    hidden_path = resolve_path(base_path, "{}/.{}.tmp".format(directory, filename))
+
+    with fs.open_output_stream(hidden_path) as out:
+        out.write(payload)
+    fs.move(hidden_path, final_path)
+    return len(payload)
+
+
+def write_batch(uri, path, batch_df, output_format="csv", compression="snappy"):
+    """Escribir un lote directamente en el sistema de archivos destino"""
+    return write_payload(uri, path, serialize_batch(batch_df, output_format, compression))
+
+
+def list_files(uri, path, prefix="retail_batch_", suffix=""):
+    """Archivos (FileInfo) de un directorio con el prefijo/sufijo dados, del más antiguo al más nuevo"""
+    from pyarrow.fs import FileSelector, FileType
+
+    fs, base_path = get_filesystem(uri)
+    infos = fs.get_file_info(FileSelector(resolve_path(base_path, path), allow_not_found=True))
+    files = [info for info in infos
+             if info.type == FileType.File and info.base_name.startswith(prefix)
+             and info.base_name.endswith(suffix)]
+    return sorted(files, key=lambda info: (info.mtime_ns or 0, info.base_name))
+
+
+def directory_usage(uri, path, prefix="retail_batch_"):
+    """Número de archivos y bytes con el prefijo dado en un directorio"""
+    files = list_files(uri, path, prefix)
+    return len(files), sum(info.size or 0 for info in files)
+
+
+def relative_path(uri, full_path):
+    """Quitar la ruta base del backend a una ruta retornada por list_files"""
+    _, base_path = get_filesystem(uri)
+    if base_path and full_path.startswith(base_path):
+        return full_path[len(base_path):]
+    return full_path
+
+
+def run_concurrently(function, items, max_workers=None):
+    """Aplicar `function` a cada elemento en un pool de hilos, conservando el orden"""
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers or DEFAULT_MAX_WORKERS, len(items))) as pool:
+        return list(pool.map(function, items))
+
+
+def rename_many(uri, moves, max_workers=None):
+    """Renombrar en bloque una lista de pares (origen, destino)"""
+    fs, base_path = get_filesystem(uri)
+    run_concurrently(
+        lambda move: fs.move(resolve_path(base_path, move[0]), resolve_path(base_path, move[1])),
+        moves, max_workers)
+    return len(moves)
+
+
+def delete_many(uri, paths, max_workers=None):
+    """Borrar en bloque una lista de archivos"""
+    fs, base_path = get_filesystem(uri)
+    run_concurrently(lambda path: fs.delete_file(resolve_path(base_path, path)), paths, max_workers)
+    return len(paths)
@@ -1,12 +1,61 @@
 #!/usr/bin/env python3
+import multiprocessing
+import numpy as np
 import pandas as pd
+import queue
 import subprocess
 import time
 import os
 import sys
-import random
+import uuid
 from datetime import datetime, timedelta
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+import retail_schema
+import landing_fs
+import pipeline_metrics
+
+# --- Configuración de escritura ---
+# Formato de los lotes: csv (por defecto), parquet u orc
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "csv")
+OUTPUT_COMPRESSION = os.environ.get("OUTPUT_COMPRESSION", "snappy")
+# cli: `hdfs dfs -put` desde /dataset; fs: cliente en proceso (obligatorio para parquet/orc)
+LANDING_WRITER = os.environ.get("LANDING_WRITER", "cli")
+LANDING_FS_URI = os.environ.get("LANDING_FS_URI", "hdfs://hadoop-namenode:8020")
+
+# --- Configuración de generación ---
+BATCH_INTERVAL = float(os.environ.get("BATCH_INTERVAL", "30"))
+BATCH_SIZE_MIN = int(os.environ.get("BATCH_SIZE_MIN", "50"))
+BATCH_SIZE_MAX = int(os.environ.get("BATCH_SIZE_MAX", "150"))
+# Si es > 0 fija el tamaño de lote a TARGET_ROWS_PER_SECOND * BATCH_INTERVAL
+TARGET_ROWS_PER_SECOND = float(os.environ.get("TARGET_ROWS_PER_SECOND", "0"))
+PRODUCER_SEED = os.environ.get("PRODUCER_SEED")
+
+# --- Configuración del modo paralelo ---
+# Con más de un worker, cada proceso genera y escribe sus propios shards y
+# TARGET_ROWS_PER_SECOND se reparte entre ellos
+PRODUCER_WORKERS = int(os.environ.get("PRODUCER_WORKERS", "1"))
+PRODUCER_REPORT_INTERVAL = float(os.environ.get("PRODUCER_REPORT_INTERVAL", "10"))
+# Contrapresión: se pausan los workers si /data/input acumula más archivos
+BACKPRESSURE_MAX_FILES = int(os.environ.get("BACKPRESSURE_MAX_FILES", "500"))
+BACKPRESSURE_RESUME_RATIO = 0.8
+
+# El producer solo escribe en /data/input. /data/processed pertenece al
+# consumer: los lotes consumidos llegan ahí y su único compactador es el job
+# consumer/spark_compaction.py
+
+# Valores posibles de las columnas de texto que se varían por fila
+TEXT_VALUES = {
+    'Category': ['Groceries', 'Toys', 'Electronics', 'Furniture', 'Clothing', 'Sports', 'Books', 'Home_Appliances'],
+    'Region': ['North', 'South', 'East', 'West', 'Central', 'Northeast', 'Southwest'],
+    'Weather_Condition': ['Sunny', 'Cloudy', 'Rainy', 'Snowy', 'Windy', 'Foggy', 'Stormy'],
+    'Seasonality': ['Spring', 'Summer', 'Autumn', 'Winter'],
+}
+TEXT_VARIATION_PROBABILITY = 0.3
+INTEGER_COLUMNS = ['Inventory_Level', 'Units_Sold', 'Units_Ordered']
+DECIMAL_COLUMNS = ['Demand_Forecast', 'Price', 'Discount', 'Competitor_Pricing']
+
 def check_hdfs_ready():
     """Verificar si HDFS está listo"""
     max_attempts = 30
@@ -73,115 +122,343 @@ def load_and_analyze_dataset():
         print("❌ Error: No se encuentra el dataset en /dataset/data.csv")
         sys.exit(1)
 
-def generate_batch_data(base_df, batch_size=100, batch_number=0):
-    """Generar un lote de datos nuevo basado en el dataset real"""
-    # Tomar una muestra aleatoria del dataset base
-    sample_size = min(batch_size, len(base_df))
-    sample = base_df.sample(n=sample_size, replace=False).copy()
-    
-    # Modificar la fecha para que sea actual
-    current_date = datetime.now().strftime("%Y-%m-%d")
-    sample['Date'] = current_date
-    
-    # Modificar valores numéricos para simular nuevos datos
-    numeric_columns = ['Inventory_Level', 'Units_Sold', 'Units_Ordered', 'Demand_Forecast', 'Price', 'Discount', 'Competitor_Pricing']
-    
-    for col in numeric_columns:
-        if col in sample.columns:
-            # Añadir variación aleatoria (±15%)
-            variation = random.uniform(0.85, 1.15)
-            if col in ['Inventory_Level', 'Units_Sold', 'Units_Ordered']:
-                # Para valores enteros, redondear y asegurar positivos
-                sample[col] = (sample[col] * variation).round().astype(int).clip(lower=0)
-            else:
-                # Para valores decimales, mantener decimales y asegurar positivos
-                sample[col] = (sample[col] * variation).round(2).clip(lower=0)
-    
-    # Modificar categorías/texto ocasionalmente para variedad
-    text_columns = ['Store_ID', 'Product_ID', 'Category', 'Region', 'Weather_Condition', 'Seasonality']
-    
-    for col in text_columns:
-        if col in sample.columns and random.random() > 0.7:  # 30% de probabilidad
-            if col == 'Store_ID':
-                sample[col] = 'S' + sample[col].str[1:].apply(lambda x: "{:03d}".format(int(x)))
-            elif col == 'Product_ID':
-                sample[col] = 'P' + sample[col].str[1:].apply(lambda x: "{:04d}".format(int(x)))
-            elif col == 'Category':
-                categories = ['Groceries', 'Toys', 'Electronics', 'Furniture', 'Clothing', 'Sports', 'Books', 'Home_Appliances']
-                sample[col] = random.choices(categories, k=len(sample))
-            elif col == 'Region':
-                regions = ['North', 'South', 'East', 'West', 'Central', 'Northeast', 'Southwest']
-                sample[col] = random.choices(regions, k=len(sample))
-            elif col == 'Weather_Condition':
-                weathers = ['Sunny', 'Cloudy', 'Rainy', 'Snowy', 'Windy', 'Foggy', 'Stormy']
-                sample[col] = random.choices(weathers, k=len(sample))
-            elif col == 'Seasonality':
-                seasons = ['Spring', 'Summer', 'Autumn', 'Winter']
-                sample[col] = random.choices(seasons, k=len(sample))
-    
-    # Modificar Holiday_Promotion aleatoriamente
-    if 'Holiday_Promotion' in sample.columns:
-        sample['Holiday_Promotion'] = [random.choice([0, 1]) for _ in range(len(sample))]
-    
-    return sample
-
-def upload_batch_to_hdfs(batch_df, batch_number):
+def prepare_base_data(base_df):
+    """Convertir el dataset base en arrays NumPy listos para muestrear por índice"""
+    base_df = base_df.copy()
+    
+    # Normalizar los IDs una sola vez (S1 -> S001, P12 -> P0012)
+    for col, prefix, width in [('Store_ID', 'S', 3), ('Product_ID', 'P', 4)]:
+        if col in base_df.columns:
+            digits = pd.to_numeric(base_df[col].str[1:], errors='coerce')
+            valid = digits.notna()
+            base_df.loc[valid, col] = prefix + digits[valid].astype(int).astype(str).str.zfill(width)
+    
+    # Texto como categóricos (categorías + códigos) para muestrear enteros en
+    # vez de cadenas; las categorías incluyen los valores de TEXT_VALUES
+    base_data = {}
+    for col in base_df.columns:
+        if col in INTEGER_COLUMNS or col in DECIMAL_COLUMNS:
+            base_data[col] = base_df[col].to_numpy(dtype=np.float64)
+        else:
+            categories = pd.Index(base_df[col].astype(str).unique()).union(TEXT_VALUES.get(col, []))
+            base_data[col] = (categories, categories.get_indexer(base_df[col].astype(str)))
+    return base_data
+
+def generate_batch_data(base_data, batch_size, rng):
+    """Generar un lote de datos nuevo basado en el dataset real (vectorizado)"""
+    first = next(iter(base_data.values()))
+    base_rows = len(first[1] if isinstance(first, tuple) else first)
+    
+    # Muestra aleatoria del dataset base (con reemplazo si el lote es mayor)
+    if batch_size <= base_rows:
+        idx = rng.choice(base_rows, size=batch_size, replace=False)
+    else:
+        idx = rng.integers(0, base_rows, size=batch_size)
+    
+    batch = {}
+    for col, values in base_data.items():
+        if isinstance(values, tuple):
+            categories, codes = values
+            codes = codes[idx]
+            
+            # Reemplazar categorías/texto en ~30% de las filas para dar variedad
+            if col in TEXT_VALUES:
+                choice_codes = categories.get_indexer(TEXT_VALUES[col])
+                replace = rng.random(batch_size) < TEXT_VARIATION_PROBABILITY
+                codes = np.where(replace, choice_codes[rng.integers(0, len(choice_codes), size=batch_size)], codes)
+            batch[col] = pd.Categorical.from_codes(codes, categories)
+        else:
+            batch[col] = values[idx]
+    
+    # Fecha actual
+    batch['Date'] = pd.Categorical.from_codes(np.zeros(batch_size, dtype=np.int8),
+                                              [datetime.now().strftime("%Y-%m-%d")])
+    
+    # Variación aleatoria por fila (±15%), asegurando valores positivos
+    for col in INTEGER_COLUMNS:
+        if col in batch:
+            variation = rng.uniform(0.85, 1.15, size=batch_size)
+            batch[col] = np.clip(np.rint(batch[col] * variation), 0, None).astype(np.int64)
+    for col in DECIMAL_COLUMNS:
+        if col in batch:
+            variation = rng.uniform(0.85, 1.15, size=batch_size)
+            batch[col] = np.clip(np.round(batch[col] * variation, 2), 0, None)
+    
+    # Holiday_Promotion aleatorio
+    if 'Holiday_Promotion' in batch:
+        batch['Holiday_Promotion'] = rng.integers(0, 2, size=batch_size)
+    
+    return pd.DataFrame(batch)
+
+def next_batch_size(rng, rows_per_second=TARGET_ROWS_PER_SECOND):
+    """Tamaño del próximo lote según la configuración de tasa"""
+    if rows_per_second > 0:
+        return max(1, int(round(rows_per_second * BATCH_INTERVAL)))
+    return int(rng.integers(BATCH_SIZE_MIN, BATCH_SIZE_MAX + 1))
+
+def conform_to_schema(batch_df):
+    """Ajustar columnas, orden y tipos del lote al esquema registrado"""
+    batch_df.columns = [col.replace(' ', '_').replace('/', '_').replace('-', '_') for col in batch_df.columns]
+    
+    missing = [col for col in retail_schema.raw_column_names() if col not in batch_df.columns]
+    if missing:
+        raise ValueError("Columnas faltantes según esquema v{}: {}".format(
+            retail_schema.SCHEMA_VERSION, missing))
+    
+    # Las columnas de texto pueden venir como categóricas; se escriben igual
+    dtypes = dict((col, dtype) for col, dtype in retail_schema.pandas_dtypes().items()
+                  if not (dtype == "object" and isinstance(batch_df[col].dtype, pd.CategoricalDtype)))
+    return batch_df[retail_schema.raw_column_names()].astype(dtypes)
+
+def batch_filename(worker_id, batch_number):
+    """Nombre único del shard: worker, lote, timestamp con microsegundos y sufijo aleatorio"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return "retail_batch_w{:02d}_{}_{}_{}.{}".format(
+        worker_id, batch_number, timestamp, uuid.uuid4().hex[:8],
+        landing_fs.OUTPUT_FORMATS[OUTPUT_FORMAT])
+
+def add_row_identity(batch_df, filename):
+    """Batch_ID (nombre del shard, único por archivo) y Row_Seq (posición en el lote)"""
+    batch_id = filename[len("retail_batch_"):].rsplit(".", 1)[0]
+    return batch_df.assign(
+        Batch_ID=pd.Categorical.from_codes(np.zeros(len(batch_df), dtype=np.int8), [batch_id]),
+        Row_Seq=np.arange(len(batch_df), dtype=np.int64))
+
+def upload_batch_to_hdfs(batch_df, batch_number, worker_id=0, filename=None):
     """Subir un lote de datos a HDFS como archivo separado"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = "retail_batch_{}_{}.csv".format(batch_number, timestamp)
-    local_batch_path = "/dataset/{}".format(filename)
+    filename = filename or batch_filename(worker_id, batch_number)
     hdfs_batch_path = "/data/input/{}".format(filename)
     
     try:
-        # Asegurar que las columnas tengan nombres limpios
-        batch_df.columns = [col.replace(' ', '_').replace('/', '_').replace('-', '_') for col in batch_df.columns]
-        
-        # Guardar lote localmente
-        batch_df.to_csv(local_batch_path, index=False)
+        # Asegurar nombres, orden y tipos según el esquema registrado
+        batch_df = conform_to_schema(add_row_identity(batch_df, filename))
         
-        # Subir a HDFS
-        put_cmd = ["hdfs", "dfs", "-put", "-f", local_batch_path, hdfs_batch_path]
-        result = subprocess.run(put_cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print("✅ Lote {} subido a HDFS: {} ({} registros)".format(batch_number, hdfs_batch_path, len(batch_df)))
-            # Eliminar archivo local temporal
-            os.remove(local_batch_path)
-            return True
-        else:
-            print("❌ Error subiendo lote {}: {}".format(batch_number, result.stderr))
-            return False
+        if OUTPUT_FORMAT != "csv" or LANDING_WRITER == "fs":
+            return write_batch_direct(batch_df, batch_number, hdfs_batch_path)
+        return put_batch_with_cli(batch_df, batch_number, filename, hdfs_batch_path)
             
     except Exception as e:
         print("❌ Error procesando lote {}: {}".format(batch_number, e))
         return False
 
-def consolidate_data(batch_number):
-    """Consolidar datos antiguos periódicamente"""
+def write_batch_direct(batch_df, batch_number, hdfs_batch_path):
+    """Escribir el lote sin archivo temporal ni subproceso, vía cliente en proceso"""
+    written = landing_fs.write_batch(LANDING_FS_URI, hdfs_batch_path, batch_df,
+                                     OUTPUT_FORMAT, OUTPUT_COMPRESSION)
+    print("✅ Lote {} escrito en {}: {} ({} registros, {} bytes, {})".format(
+        batch_number, LANDING_FS_URI, hdfs_batch_path, len(batch_df), written, OUTPUT_FORMAT))
+    return True
+
+def put_batch_with_cli(batch_df, batch_number, filename, hdfs_batch_path):
+    """Guardar el lote CSV localmente y subirlo con `hdfs dfs -put`"""
+    local_batch_path = "/dataset/{}".format(filename)
+    
+    # Guardar lote localmente
+    batch_df.to_csv(local_batch_path, index=False)
+    
+    # Subir a HDFS
+    put_cmd = ["hdfs", "dfs", "-put", "-f", local_batch_path, hdfs_batch_path]
+    result = subprocess.run(put_cmd, capture_output=True, text=True)
+    
+    if result.returncode == 0:
+        print("✅ Lote {} subido a HDFS: {} ({} registros)".format(batch_number, hdfs_batch_path, len(batch_df)))
+        # Eliminar archivo local temporal
+        os.remove(local_batch_path)
+        return True
+    else:
+        print("❌ Error subiendo lote {}: {}".format(batch_number, result.stderr))
+        return False
+
+def run_producer_loop(base_data, rng, worker_id=0, rows_per_second=TARGET_ROWS_PER_SECOND,
+                      stats_queue=None, paused=None):
+    """
+    Bucle de generación y escritura con control de tasa.
+    
+    En modo serial (sin stats_queue) imprime el detalle de cada lote; como
+    worker envía sus estadísticas al coordinador y espera mientras el evento
+    `paused` esté activo (contrapresión).
+    """
+    verbose = stats_queue is None
+    batch_number = 0
+    total_records = 0
+    start_time = time.monotonic()
+    next_deadline = start_time
+    
     try:
-        if batch_number % 20 == 0 and batch_number > 0:
-            print("🔄 Realizando consolidación periódica...")
-            
-            list_cmd = ["hdfs", "dfs", "-ls", "/data/input/retail_batch_*.csv"]
-            result = subprocess.run(list_cmd, capture_output=True, text=True)
+        while True:
+            if paused is not None and paused.is_set():
+                time.sleep(min(BATCH_INTERVAL, 1.0))
+                next_deadline = time.monotonic()
+                continue
+        
+            batch_size = next_batch_size(rng, rows_per_second)
+        
+            if verbose:
+                print("\n📦 Generando lote {}...".format(batch_number))
+                print("   • Tamaño: {} registros".format(batch_size))
+                print("   • Timestamp: {}".format(datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        
+            # El nombre lleva la hora de generación, desde la que se mide la
+            # latencia hasta PostgreSQL (ver pipeline_metrics)
+            filename = batch_filename(worker_id, batch_number)
+            shard_id = pipeline_metrics.shard_batch_id(filename)
+            generate_start = time.monotonic()
+            batch_df = generate_batch_data(base_data, batch_size, rng)
+            generate_seconds = time.monotonic() - generate_start
+            pipeline_metrics.record("producer", "generate", shard_id, generate_seconds, batch_size,
+                                    worker=worker_id)
+        
+            if verbose and 'Category' in batch_df.columns:
+                category_counts = batch_df['Category'].value_counts()
+                print("   • Distribución por categoría: {}".format(dict(category_counts)))
+        
+            if verbose and 'Units_Sold' in batch_df.columns:
+                total_sold = batch_df['Units_Sold'].sum()
+                print("   • Total unidades vendidas: {}".format(total_sold))
+        
+            write_start = time.monotonic()
+            success = upload_batch_to_hdfs(batch_df, batch_number, worker_id, filename)
+            write_seconds = time.monotonic() - write_start
+            pipeline_metrics.record("producer", "hdfs_write", shard_id, write_seconds, batch_size,
+                                    worker=worker_id, ok=success)
+        
+            if success:
+                total_records += batch_size
+        
+            if stats_queue is not None:
+                stats_queue.put((worker_id, batch_size if success else 0, success,
+                                 generate_seconds, write_seconds))
+            elif success:
+                elapsed = time.monotonic() - start_time
+                print("   • Total acumulado: {} registros".format(total_records))
+                print("   • Generación: {:.3f}s ({:,.0f} registros/s) | Escritura: {:.3f}s".format(
+                    generate_seconds, batch_size / max(generate_seconds, 1e-9), write_seconds))
+                print("   • Throughput alcanzado: {:,.0f} registros/s".format(
+                    total_records / max(elapsed, 1e-9)))
+        
+            batch_number += 1
+        
+            # Control de tasa: el intervalo se mide desde el inicio de cada lote,
+            # no desde el final, para que el tiempo de escritura no reduzca la tasa
+            next_deadline += BATCH_INTERVAL
+            wait = next_deadline - time.monotonic()
+            if wait > 0:
+                if verbose:
+                    print("   • Próximo lote en: {:.1f} segundos".format(wait))
+                time.sleep(wait)
+            else:
+                if verbose:
+                    print("   ⚠️  Producer atrasado {:.2f}s respecto a la tasa objetivo".format(-wait))
+                next_deadline = time.monotonic()
+    except KeyboardInterrupt:
+        if verbose:
+            print("\n📈 Resumen: {} lotes procesados, {} registros".format(batch_number, total_records))
+        raise
+
+def producer_worker(worker_id, base_data, seed_sequence, rows_per_second, stats_queue, paused):
+    """Punto de entrada de cada proceso worker"""
+    rng = np.random.default_rng(seed_sequence)
+    try:
+        run_producer_loop(base_data, rng, worker_id, rows_per_second, stats_queue, paused)
+    except KeyboardInterrupt:
+        pass
+
+def input_backlog():
+    """Archivos y bytes pendientes en /data/input (None si no se puede medir)"""
+    try:
+        if OUTPUT_FORMAT != "csv" or LANDING_WRITER == "fs":
+            return landing_fs.directory_usage(LANDING_FS_URI, "/data/input")
+        
+        # `hdfs dfs -count` -> DIR_COUNT FILE_COUNT CONTENT_SIZE PATHNAME
+        result = subprocess.run(["hdfs", "dfs", "-count", "/data/input"],
+                                capture_output=True, text=True)
+        if result.returncode == 0 and result.stdout.strip():
+            fields = result.stdout.split()
+            return int(fields[1]), int(fields[2])
+    except Exception as e:
+        print("⚠️  No se pudo medir /data/input: {}".format(e))
+    return None
+
+def run_parallel_producer(base_data, workers):
+    """Coordinador: lanza N workers, agrega su throughput y aplica contrapresión"""
+    seed = int(PRODUCER_SEED) if PRODUCER_SEED else None
+    seed_sequences = np.random.SeedSequence(seed).spawn(workers)
+    rows_per_worker = TARGET_ROWS_PER_SECOND / workers if TARGET_ROWS_PER_SECOND > 0 else 0
+    
+    stats_queue = multiprocessing.Queue()
+    paused = multiprocessing.Event()
+    processes = []
+    for worker_id in range(workers):
+        process = multiprocessing.Process(
+            target=producer_worker,
+            args=(worker_id, base_data, seed_sequences[worker_id], rows_per_worker, stats_queue, paused),
+            name="producer-w{:02d}".format(worker_id))
+        process.start()
+        processes.append(process)
+    print("👷 {} workers iniciados".format(workers))
+    
+    totals = dict((worker_id, [0, 0, 0]) for worker_id in range(workers))  # filas, lotes, errores
+    total_batches = 0
+    start_time = time.monotonic()
+    
+    try:
+        while True:
+            window_start = time.monotonic()
+            window = dict((worker_id, [0, 0.0, 0.0]) for worker_id in range(workers))  # filas, gen, escr
+            deadline = window_start + PRODUCER_REPORT_INTERVAL
+            while time.monotonic() < deadline:
+                try:
+                    worker_id, rows, success, generate_seconds, write_seconds = stats_queue.get(
+                        timeout=max(0.1, deadline - time.monotonic()))
+                except queue.Empty:
+                    continue
+                totals[worker_id][0] += rows
+                totals[worker_id][1] += 1
+                totals[worker_id][2] += 0 if success else 1
+                window[worker_id][0] += rows
+                window[worker_id][1] += generate_seconds
+                window[worker_id][2] += write_seconds
+                total_batches += 1
             
-            if result.returncode == 0 and result.stdout.strip():
-                files = [line.split()[-1] for line in result.stdout.strip().split('\n') if line]
-                if len(files) > 10:
-                    files_to_move = files[:-10]
-                    for file_path in files_to_move:
-                        move_cmd = ["hdfs", "dfs", "-mv", file_path, "/data/processed/"]
-                        subprocess.run(move_cmd, capture_output=True)
-                    print("📦 {} archivos antiguos movidos a /data/processed/".format(len(files_to_move)))
+            window_seconds = time.monotonic() - window_start
+            elapsed = time.monotonic() - start_time
+            print("\n📈 Reporte de workers ({:.0f}s transcurridos)".format(elapsed))
+            for worker_id in range(workers):
+                rows, generate_seconds, write_seconds = window[worker_id]
+                state = "vivo" if processes[worker_id].is_alive() else "DETENIDO"
+                print("   • w{:02d} [{}]: {:,.0f} registros/s | gen {:.2f}s | escr {:.2f}s | "
+                      "total {} registros, {} lotes, {} errores".format(
+                          worker_id, state, rows / window_seconds, generate_seconds, write_seconds,
+                          totals[worker_id][0], totals[worker_id][1], totals[worker_id][2]))
+            window_rows = sum(window[worker_id][0] for worker_id in range(workers))
+            total_rows = sum(totals[worker_id][0] for worker_id in range(workers))
+            print("   • Total: {:,.0f} registros/s (ventana) | {:,.0f} registros/s (acumulado)".format(
+                window_rows / window_seconds, total_rows / max(elapsed, 1e-9)))
             
-    except Exception as e:
-        print("⚠️  Error en consolidación: {}".format(e))
+            backlog = input_backlog()
+            if backlog is not None:
+                files, size = backlog
+                if files > BACKPRESSURE_MAX_FILES and not paused.is_set():
+                    paused.set()
+                elif files < BACKPRESSURE_MAX_FILES * BACKPRESSURE_RESUME_RATIO and paused.is_set():
+                    paused.clear()
+                print("   • /data/input: {} archivos, {:.1f} MB | contrapresión: {}".format(
+                    files, size / 1e6, "PAUSADO" if paused.is_set() else "normal"))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        print("📈 Resumen: {} lotes, {} registros".format(
+            total_batches, sum(totals[worker_id][0] for worker_id in range(workers))))
 
 def main():
     print("🚀 Iniciando Retail Data Producer Continuo...")
     print("📊 Dataset: Ventas minoristas (Retail)")
-    print("⏰ Modo: Producción por lotes cada 30 segundos")
+    print("⏰ Modo: Producción por lotes cada {:g} segundos".format(BATCH_INTERVAL))
     print("🔧 Característica: Datos limpios y normalizados")
+    print("💾 Formato de salida: {} (escritura: {})".format(
+        OUTPUT_FORMAT, "fs" if OUTPUT_FORMAT != "csv" else LANDING_WRITER))
     
     if not check_hdfs_ready():
         print("❌ HDFS no disponible después de 150 segundos")
@@ -190,48 +467,26 @@ def main():
     setup_hdfs_directories()
     
     base_df = load_and_analyze_dataset()
-    
-    batch_number = 0
+    base_data = prepare_base_data(base_df)
     
     print("\n🎯 Iniciando producción de datos de retail...")
-    print("   • Lote cada: 30 segundos")
-    print("   • Tamaño de lote: 50-150 registros")
-    print("   • Consolidación cada: 20 lotes\n")
+    print("   • Lote cada: {:g} segundos".format(BATCH_INTERVAL))
+    if TARGET_ROWS_PER_SECOND > 0:
+        print("   • Tasa objetivo: {:,.0f} registros/s".format(TARGET_ROWS_PER_SECOND))
+    else:
+        print("   • Tamaño de lote: {}-{} registros".format(BATCH_SIZE_MIN, BATCH_SIZE_MAX))
+    print("   • Workers: {}\n".format(PRODUCER_WORKERS))
     
     try:
-        while True:
-            batch_size = random.randint(50, 150)
-            
-            print("\n📦 Generando lote {}...".format(batch_number))
-            print("   • Tamaño: {} registros".format(batch_size))
-            print("   • Timestamp: {}".format(datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-            
-            batch_df = generate_batch_data(base_df, batch_size, batch_number)
-            
-            if 'Category' in batch_df.columns:
-                category_counts = batch_df['Category'].value_counts()
-                print("   • Distribución por categoría: {}".format(dict(category_counts)))
-            
-            if 'Units_Sold' in batch_df.columns:
-                total_sold = batch_df['Units_Sold'].sum()
-                print("   • Total unidades vendidas: {}".format(total_sold))
-            
-            success = upload_batch_to_hdfs(batch_df, batch_number)
-            
-            if success:
-                consolidate_data(batch_number)
-                
-                total_records_approx = (batch_number + 1) * batch_size
-                print("   • Total acumulado aproximado: ~{} registros".format(total_records_approx))
-                print("   • Próximo lote en: 30 segundos")
-            
-            batch_number += 1
-            time.sleep(30)
+        if PRODUCER_WORKERS > 1:
+            run_parallel_producer(base_data, PRODUCER_WORKERS)
+        else:
+            rng = np.random.default_rng(int(PRODUCER_SEED) if PRODUCER_SEED else None)
+            run_producer_loop(base_data, rng)
             
     except KeyboardInterrupt:
         print("\n\n🛑 Producer detenido por el usuario")
-        print("📈 Resumen: {} lotes procesados".format(batch_number))
         sys.exit(0)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -13,6 +13,8 @@ mkdir -p dataset
 mkdir -p producer
 mkdir -p consumer
 mkdir -p streamlit
+mkdir -p common
+mkdir -p metrics
 
 # Crear configuración HDFS
 echo "Creando configuraciones HDFS..."
@@ -165,27 +167,9 @@ sleep 10
 if docker exec postgres pg_isready -U hive -d hive; then
     echo "✓ PostgreSQL está listo"
     
-    # Crear tabla si no existe
-    echo "Creando tabla retail_sales en PostgreSQL..."
-    docker exec postgres psql -U hive -d hive -c "
-    CREATE TABLE IF NOT EXISTS retail_sales (
-        date VARCHAR(10),
-        store_id VARCHAR(50),
-        product_id VARCHAR(50),
-        category VARCHAR(50),
-        region VARCHAR(50),
-        inventory_level DOUBLE PRECISION,
-        units_sold DOUBLE PRECISION,
-        units_ordered DOUBLE PRECISION,
-        demand_forecast DOUBLE PRECISION,
-        price DOUBLE PRECISION,
-        discount DOUBLE PRECISION,
-        weather_condition VARCHAR(50),
-        holiday_promotion INTEGER,
-        competitor_pricing DOUBLE PRECISION,
-        seasonality VARCHAR(50)
-    );"
-    echo "Tabla retail_sales verificada/creada en PostgreSQL"
+    # La tabla retail_sales (particionada por mes, con índices) la crea y
+    # migra el Spark Consumer en su primer lote (consumer/postgres_schema.py)
+    echo "Tabla retail_sales: la gestiona el Spark Consumer"
 else
     echo "✗ PostgreSQL no está respondiendo"
 fi
@@ -222,6 +206,7 @@ docker exec hadoop-namenode hdfs dfs -mkdir -p /user/hive/warehouse
 docker exec hadoop-namenode hdfs dfs -mkdir -p /user/hive/tmp
 docker exec hadoop-namenode hdfs dfs -mkdir -p /data/input
 docker exec hadoop-namenode hdfs dfs -mkdir -p /data/processed
+docker exec hadoop-namenode hdfs dfs -mkdir -p /data/quarantine
 
 # Aplicar permisos
 echo "   • Aplicando permisos..."
@@ -336,7 +321,6 @@ USE default;
 
 -- Tabla para datos brutos
 CREATE TABLE IF NOT EXISTS retail_sales_raw (
-    date STRING,
     store_id STRING,
     product_id STRING,
     category STRING,
@@ -350,8 +334,11 @@ CREATE TABLE IF NOT EXISTS retail_sales_raw (
     weather_condition STRING,
     holiday_promotion INT,
     competitor_pricing DOUBLE,
-    seasonality STRING
-) STORED AS ORC;
+    seasonality STRING,
+    batch_id STRING,
+    row_seq BIGINT
+) PARTITIONED BY (date STRING)
+    STORED AS ORC;
 
 -- Vista para datos agregados
 CREATE OR REPLACE VIEW retail_sales_aggregated AS
@@ -463,6 +450,12 @@ fi
 
 POSTGRES_TABLE="retail_sales"
 HIVE_TABLE="retail_sales_raw"
+# Ledger de ingesta del consumer: conteos por destino sin escanear las tablas
+LEDGER_TABLE="retail_ingest_ledger"
+LEDGER_TOTALS_TABLE="retail_ingest_totals"
+ROLLUP_TABLE="retail_sales_daily_rollup"
+STATE_TABLE="retail_inventory_state"
+VERSION_TABLE="retail_data_version"
 
 echo "🧹 INICIANDO LIMPIEZA COMBINADA POSTGRESQL + HIVE"
 
@@ -476,9 +469,15 @@ hive_table_exists() {
     docker exec hive-server /opt/hive/bin/beeline -u jdbc:hive2://localhost:10000 -n root -e "SHOW TABLES LIKE '$1';" 2>/dev/null | grep -q "$1"
 }
 
-# Función para obtener conteo de Hive
-get_hive_count() {
-    docker exec hive-server /opt/hive/bin/beeline -u jdbc:hive2://localhost:10000 -n root -e "SELECT COUNT(*) FROM $1;" 2>/dev/null | grep -v "SLF4J" | grep -v "log4j" | grep -v "WARN" | grep -v "INFO" | grep -v "+" | grep -v "|" | grep -E '^[0-9]+$' | head -1 | tr -d ' \n'
+# Función para obtener el conteo de un destino ('postgres' o 'hive') desde el ledger
+get_ledger_count() {
+    COUNT=$(docker exec postgres psql -U hive -d hive -t -c "SELECT row_count FROM $LEDGER_TOTALS_TABLE WHERE sink = '$1';" 2>/dev/null | tr -d ' \n')
+    echo "${COUNT:-0}"
+}
+
+# Función para poner a cero el ledger de un destino tras limpiarlo
+reset_ledger() {
+    docker exec postgres psql -U hive -d hive -c "UPDATE $LEDGER_TOTALS_TABLE SET row_count = 0, batch_count = 0, updated_at = now() WHERE sink = '$1';" > /dev/null 2>&1
 }
 
 # Iniciar PostgreSQL si no está corriendo
@@ -517,11 +516,11 @@ fi
 # Obtener conteos ANTES de la limpieza
 echo "📊 Conteos antes de la limpieza:"
 
-POSTGRES_COUNT_BEFORE=$(docker exec postgres psql -U hive -d hive -t -c "SELECT COUNT(*) FROM $POSTGRES_TABLE;" 2>/dev/null | tr -d ' \n' || echo "0")
+POSTGRES_COUNT_BEFORE=$(get_ledger_count "postgres")
 echo "   PostgreSQL $POSTGRES_TABLE: $POSTGRES_COUNT_BEFORE registros"
 
 if [ "$HIVE_READY" = true ]; then
-    HIVE_COUNT_BEFORE=$(get_hive_count "$HIVE_TABLE" || echo "0")
+    HIVE_COUNT_BEFORE=$(get_ledger_count "hive")
     echo "   Hive $HIVE_TABLE: $HIVE_COUNT_BEFORE registros"
 fi
 
@@ -531,7 +530,13 @@ echo "🗑️  Limpiando PostgreSQL..."
 docker exec postgres psql -U hive -d hive -c "TRUNCATE TABLE $POSTGRES_TABLE;" > /dev/null 2>&1
 
 if [ $? -eq 0 ]; then
-    POSTGRES_COUNT_AFTER=$(docker exec postgres psql -U hive -d hive -t -c "SELECT COUNT(*) FROM $POSTGRES_TABLE;" | tr -d ' \n')
+    reset_ledger "postgres"
+    docker exec postgres psql -U hive -d hive -c "TRUNCATE TABLE $LEDGER_TABLE;" > /dev/null 2>&1
+    docker exec postgres psql -U hive -d hive -c "TRUNCATE TABLE $ROLLUP_TABLE;" > /dev/null 2>&1
+    docker exec postgres psql -U hive -d hive -c "TRUNCATE TABLE $STATE_TABLE;" > /dev/null 2>&1
+    # Invalida la cache del dashboard
+    docker exec postgres psql -U hive -d hive -c "UPDATE $VERSION_TABLE SET version = version + 1, updated_at = now();" > /dev/null 2>&1
+    POSTGRES_COUNT_AFTER=$(get_ledger_count "postgres")
     echo "✅ PostgreSQL $POSTGRES_TABLE limpiada ($POSTGRES_COUNT_AFTER registros restantes)"
 else
     echo "❌ Error limpiando PostgreSQL"
@@ -549,7 +554,8 @@ if [ "$HIVE_READY" = true ]; then
         docker exec hive-server /opt/hive/bin/beeline -u jdbc:hive2://localhost:10000 -n root -e "TRUNCATE TABLE $HIVE_TABLE;" > /dev/null 2>&1
         
         if [ $? -eq 0 ]; then
-            HIVE_COUNT_AFTER=$(get_hive_count "$HIVE_TABLE" || echo "0")
+            reset_ledger "hive"
+            HIVE_COUNT_AFTER=$(get_ledger_count "hive")
             echo "✅ Hive $HIVE_TABLE limpiada ($HIVE_COUNT_AFTER registros restantes)"
         else
             # Opción 2: DROP y CREATE (más agresivo)
@@ -559,7 +565,6 @@ if [ "$HIVE_READY" = true ]; then
             # Recrear la tabla
             docker exec hive-server /opt/hive/bin/beeline -u jdbc:hive2://localhost:10000 -n root -e "
                 CREATE TABLE $HIVE_TABLE (
-                    date STRING,
                     store_id STRING,
                     product_id STRING,
                     category STRING,
@@ -573,17 +578,20 @@ if [ "$HIVE_READY" = true ]; then
                     weather_condition STRING,
                     holiday_promotion INT,
                     competitor_pricing DOUBLE,
-                    seasonality STRING
-                ) STORED AS ORC;" > /dev/null 2>&1
+                    seasonality STRING,
+                    batch_id STRING,
+                    row_seq BIGINT
+                ) PARTITIONED BY (date STRING)
+                STORED AS ORC;" > /dev/null 2>&1
             
-            HIVE_COUNT_AFTER=$(get_hive_count "$HIVE_TABLE" || echo "0")
+            reset_ledger "hive"
+            HIVE_COUNT_AFTER=$(get_ledger_count "hive")
             echo "✅ Hive $HIVE_TABLE recreada ($HIVE_COUNT_AFTER registros restantes)"
         fi
     else
         echo "ℹ️  Tabla $HIVE_TABLE no existe en Hive, creándola..."
         docker exec hive-server /opt/hive/bin/beeline -u jdbc:hive2://localhost:10000 -n root -e "
             CREATE TABLE $HIVE_TABLE (
-                date STRING,
                 store_id STRING,
                 product_id STRING,
                 category STRING,
@@ -597,8 +605,12 @@ if [ "$HIVE_READY" = true ]; then
                 weather_condition STRING,
                 holiday_promotion INT,
                 competitor_pricing DOUBLE,
-                seasonality STRING
-            ) STORED AS ORC;" > /dev/null 2>&1
+                seasonality STRING,
+                batch_id STRING,
+                row_seq BIGINT
+            ) PARTITIONED BY (date STRING)
+            STORED AS ORC;" > /dev/null 2>&1
+        reset_ledger "hive"
         echo "✅ Tabla $HIVE_TABLE creada en Hive"
     fi
 fi
@@ -609,7 +621,7 @@ echo "📋 RESUMEN FINAL:"
 echo "   PostgreSQL $POSTGRES_TABLE: $POSTGRES_COUNT_AFTER registros"
 
 if [ "$HIVE_READY" = true ]; then
-    HIVE_FINAL_COUNT=$(get_hive_count "$HIVE_TABLE" || echo "0")
+    HIVE_FINAL_COUNT=$(get_ledger_count "hive")
     echo "   Hive $HIVE_TABLE: $HIVE_FINAL_COUNT registros"
     
     # Verificar consistencia
@@ -644,6 +656,7 @@ echo "Ver logs Hive Server: docker logs hive-server -f"
 echo "Ver logs Hive Metastore: docker logs hive-metastore -f"
 echo "Probar HDFS: docker exec hadoop-namenode hdfs dfs -ls /"
 echo "Reiniciar solo Hive: docker-compose restart hive-metastore hive-server"
+echo "Reporte de latencias por etapa: python3 common/pipeline_metrics.py report 'metrics/*.jsonl' --since 60"
 echo "Limpiar HDFS: docker exec hadoop-namenode hdfs dfs -rm -r -f /data && docker exec hadoop-namenode hdfs dfs -mkdir -p /data/input /data/processed"
 
 echo ""
@@ -656,6 +669,8 @@ echo "├── config/           # Archivos de configuración"
 echo "├── dataset/          # CSV de datos de entrada"
 echo "├── producer/         # Script data-producer.py"
 echo "├── consumer/         # Script PySpark consumer.py" 
+echo "├── common/           # Esquema compartido (retail_schema.py)"
+echo "├── metrics/          # Tiempos por etapa en JSON lines (pipeline_metrics.py)"
 echo "└── streamlit/        # Script app.py de Streamlit"
 
 echo ""
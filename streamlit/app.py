@@ -1,12 +1,39 @@
 import streamlit as st
 import pandas as pd
-import psycopg2
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import os
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+import cache
+import db_pool
+import downsample
+import frames
+import pipeline_metrics
+import queries
+import retail_metrics
+import rollup_mirror
+
+# Cache de resultados: vida máxima de una entrada y tope de memoria (LRU)
+CACHE_TTL_SECONDS = int(os.environ.get("DASHBOARD_CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_MB = int(os.environ.get("DASHBOARD_CACHE_MAX_MB", "256"))
+# incremental: copia del rollup en memoria actualizada por deltas (ver rollup_mirror.py)
+# query: cada agregado se consulta en PostgreSQL
+REFRESH_MODE = os.environ.get("DASHBOARD_REFRESH_MODE", "incremental")
+# KPIs de inventario (promedio, rotación): history promedia todas las lecturas
+# del rollup; current, solo la última de cada producto por tienda
+INVENTORY_KPI_SOURCE = os.environ.get("DASHBOARD_INVENTORY_KPI_SOURCE", "history")
+# Tope de puntos por serie de los gráficos temporales (ver downsample.py)
+MAX_CHART_POINTS = int(os.environ.get("DASHBOARD_MAX_CHART_POINTS", "300"))
+# Porcentaje de páginas de retail_sales muestreadas para los cuartiles, que se
+# calculan solo a pedido
+QUARTILE_SAMPLE_PERCENT = float(os.environ.get("DASHBOARD_QUARTILE_SAMPLE_PERCENT", "5"))
+
 # Configuración de la página
 st.set_page_config(
     page_title="Retail Analytics Dashboard",
@@ -15,112 +42,102 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-def get_postgres_connection():
-    """Establece conexión con PostgreSQL"""
+def get_connection_pool():
+    """Pool de conexiones compartido por todas las sesiones del proceso"""
     try:
-        conn = psycopg2.connect(
-            host="postgres",
-            database="hive",
-            user="hive",
-            password="hive",
-            port="5432"
-        )
-        return conn
+        return db_pool.shared_pool()
     except Exception as e:
         st.error(f"❌ Error conectando a PostgreSQL: {e}")
         return None
 
 def execute_query(query, params=None):
     """Ejecuta consulta y retorna DataFrame"""
-    conn = get_postgres_connection()
-    if conn:
+    pool = get_connection_pool()
+    if pool:
         try:
-            df = pd.read_sql_query(query, conn, params=params)
-            conn.close()
-            return df
+            with pool.connection() as conn:
+                return frames.read_frame(conn, query, params)
         except Exception as e:
             st.error(f"❌ Error en consulta: {e}")
-            conn.close()
-            return pd.DataFrame()
     return pd.DataFrame()
 
-def load_data():
-    """Carga datos principales con cache"""
-    query = """
-    SELECT 
-        date,
-        store_id,
-        product_id,
-        category,
-        region,
-        inventory_level,
-        units_sold,
-        units_ordered,
-        demand_forecast,
-        price,
-        discount,
-        weather_condition,
-        holiday_promotion,
-        competitor_pricing,
-        seasonality,
-        (units_sold * price) as revenue,
-        (units_sold * price * discount) as discount_amount,
-        -- Cálculo de precisión de demanda CORREGIDO para PostgreSQL
-        CASE 
-            WHEN demand_forecast > 0 THEN 
-                CAST((1 - ABS(units_sold - demand_forecast) / demand_forecast) * 100 AS DECIMAL(10,2))
-            ELSE 0 
-        END as forecast_accuracy
-    FROM retail_sales 
-    ORDER BY date DESC
-    """
-    return execute_query(query)
+def fetch_one(query):
+    """Primera fila de un (sql, params) de queries.py, o None si no hay o falla"""
+    pool = get_connection_pool()
+    if not pool:
+        return None
+    try:
+        with pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(*query)
+                return cursor.fetchone()
+    except Exception:
+        return None
+
+def get_data_version():
+    """Versión de los datos que sube el consumer con cada carga"""
+    row = fetch_one(queries.data_version())
+    return row[0] if row else None
 
-def calculate_logistics_costs(df):
+def run_query(query, data_version=None, filters=None, transform=None):
     """
-    Simula costos logísticos basados en:
-    - Distancia por región (costo fijo)
-    - Volumen de inventario (costo variable)
-    - Tipo de producto (costo categoría)
+    Ejecuta un (sql, params) de queries.py a través de la cache. Con
+    `filters`, un cambio de versión solo recalcula si cambió esa porción de
+    datos; `transform` (columnas derivadas) se aplica antes de guardar.
     """
-    # Costos base por región (simulados)
-    region_costs = {
-        'North': 1.2, 'South': 1.0, 'East': 1.3, 
-        'West': 1.4, 'Central': 1.1, 'Northeast': 1.5, 'Southwest': 1.2
-    }
-    
-    # Costos por categoría (simulados)
-    category_costs = {
-        'Electronics': 1.8, 'Groceries': 1.0, 'Clothing': 1.2,
-        'Furniture': 2.0, 'Toys': 1.3, 'Sports': 1.4, 'Books': 1.1
-    }
-    
-    # Calcular costos logísticos simulados
-    df['base_logistics_cost'] = df['region'].map(region_costs).fillna(1.2)
-    df['category_cost_multiplier'] = df['category'].map(category_costs).fillna(1.2)
-    df['logistics_cost'] = (
-        df['base_logistics_cost'] * 
-        df['category_cost_multiplier'] * 
-        df['inventory_level'] * 0.1  # Costo por unidad de inventario
-    )
-    
-    return df
+    sql, params = query
 
-def calculate_efficiency_metrics(df):
-    """Calcula métricas de eficiencia"""
-    # Eficiencia de inventario
-    df['inventory_turnover'] = df['units_sold'] / df['inventory_level'].replace(0, 1)
-    
-    # Eficiencia de precio vs competencia
-    df['pricing_efficiency'] = (
-        (df['price'] - df['competitor_pricing']) / df['competitor_pricing'].replace(0, 1) * 100
-    )
-    
-    # Eficiencia de promociones
-    df['promotion_efficiency'] = df['units_sold'] * df['holiday_promotion']
-    
+    def compute():
+        # Solo las consultas que llegan a PostgreSQL; la versión de datos hace de lote
+        with pipeline_metrics.timed("dashboard", "dashboard_query", data_version,
+                                    table=queries.query_table(sql)) as stage:
+            df = execute_query(sql, params)
+            stage['rows'] = len(df)
+        if transform is not None and not df.empty:
+            df = transform(df)
+        return df
+
+    slice_version = None
+    if filters is not None:
+        slice_version = lambda: fetch_one(queries.slice_version(filters))
+    key = (sql, tuple(params), transform.__name__ if transform else None)
+    # Un DataFrame vacío puede venir de un error de conexión: no se guarda
+    return cache.shared_cache(CACHE_TTL_SECONDS, CACHE_MAX_MB * 1024 * 1024).get_or_compute(
+        key, compute, data_version, slice_version, cache_if=lambda df: not df.empty)
+
+def get_rollup_frame(data_version):
+    """Copia del rollup al día con `data_version`, trayendo solo las filas nuevas"""
+    pool = get_connection_pool()
+    if not pool:
+        return pd.DataFrame()
+    try:
+        return rollup_mirror.shared_mirror().refresh(pool, data_version)
+    except Exception as e:
+        st.error(f"❌ Error actualizando el rollup: {e}")
+        return pd.DataFrame()
+
+def use_current_inventory(df, state, key):
+    """Reemplaza los promedios de inventario de un agregado del rollup por los del estado actual"""
+    inventory_columns = ['avg_inventory_level', 'avg_inventory_turnover']
+    if df.empty or state.empty:
+        return df
+    current = state[[key] + inventory_columns].astype({key: str})
+    df = df.drop(columns=inventory_columns).astype({key: str})
+    return df.merge(current, on=key, how='left').fillna({name: 0 for name in inventory_columns})
+
+def show_chart(fig, payload):
+    """Muestra un gráfico y suma el tamaño de su JSON al payload de la página"""
+    payload['charts'] += len(fig.to_json())
+    st.plotly_chart(fig, use_container_width=True)
+
+def parse_dates(df):
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
     return df
 
+def compact_detail(df):
+    """Página de detalle: las métricas por fila ya vienen calculadas desde la ingesta"""
+    return frames.downcast_measures(parse_dates(df))
+
 def main():
     # Header principal
     st.title("🏪 Retail Analytics Dashboard")
@@ -129,39 +146,33 @@ def main():
     # Sidebar para filtros
     st.sidebar.title("🔧 Filtros")
     
-    # Cargar datos
+    # Valores de los filtros (desde el rollup: una fila por categoría y región)
     with st.spinner("🔄 Cargando datos desde PostgreSQL..."):
-        df = load_data()
-    
-    if df.empty:
+        data_version = get_data_version()
+        if REFRESH_MODE == 'incremental':
+            rollup = get_rollup_frame(data_version)
+            options = rollup_mirror.filter_options(rollup) if not rollup.empty else rollup
+        else:
+            options = run_query(queries.filter_options(), data_version)
+    
+    if options.empty:
         st.warning("📭 No hay datos disponibles. Ejecuta el Spark Consumer primero.")
         return
     
-    # Convertir la columna date a datetime
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    
-    # Aplicar cálculos de costos logísticos y eficiencia
-    df = calculate_logistics_costs(df)
-    df = calculate_efficiency_metrics(df)
-    
     # Filtros en sidebar
     st.sidebar.subheader("Filtrar Datos")
     
     # Filtro por categoría
-    categories = ['Todos'] + sorted(df['category'].dropna().unique().tolist())
+    categories = ['Todos'] + sorted(options['category'].dropna().unique().tolist())
     selected_category = st.sidebar.selectbox("Categoría", categories)
     
     # Filtro por región
-    regions = ['Todas'] + sorted(df['region'].dropna().unique().tolist())
+    regions = ['Todas'] + sorted(options['region'].dropna().unique().tolist())
     selected_region = st.sidebar.selectbox("Región", regions)
     
     # Filtro por fecha
-    if not df.empty:
-        min_date = df['date'].min().date()
-        max_date = df['date'].max().date()
-    else:
-        min_date = pd.Timestamp.now().date()
-        max_date = pd.Timestamp.now().date()
+    min_date = pd.to_datetime(options['min_date']).min().date()
+    max_date = pd.to_datetime(options['max_date']).max().date()
     
     date_range = st.sidebar.date_input(
         "Rango de Fechas",
@@ -170,25 +181,73 @@ def main():
         max_value=max_date
     )
     
-    # Aplicar filtros
-    filtered_df = df.copy()
+    # Los filtros se aplican en PostgreSQL (ver queries.py)
+    filters = {}
     
     if selected_category != 'Todos':
-        filtered_df = filtered_df[filtered_df['category'] == selected_category]
+        filters['category'] = selected_category
     
     if selected_region != 'Todas':
-        filtered_df = filtered_df[filtered_df['region'] == selected_region]
+        filters['region'] = selected_region
     
-    # Aplicar filtro de fecha
     if len(date_range) == 2:
-        start_date, end_date = date_range
-        start_date = pd.to_datetime(start_date)
-        end_date = pd.to_datetime(end_date)
-        
-        filtered_df = filtered_df[
-            (filtered_df['date'] >= start_date) & 
-            (filtered_df['date'] <= end_date)
-        ]
+        filters['start_date'], filters['end_date'] = date_range
+    
+    # Origen de los KPIs de inventario
+    kpi_sources = {'Historial': 'history', 'Estado actual': 'current'}
+    selected_source = st.sidebar.radio(
+        "KPIs de inventario", list(kpi_sources),
+        index=list(kpi_sources.values()).index(INVENTORY_KPI_SOURCE),
+        help="Estado actual: última lectura de cada producto por tienda (no aplica el rango de fechas)")
+    inventory_source = kpi_sources[selected_source]
+    
+    # Granularidad de las series: automática según el rango elegido
+    granularities = {'Automática': None, 'Día': 'day', 'Semana': 'week', 'Mes': 'month'}
+    selected_granularity = st.sidebar.selectbox("Granularidad temporal", list(granularities))
+    bucket = granularities[selected_granularity] or downsample.time_bucket(
+        filters.get('start_date', min_date), filters.get('end_date', max_date), MAX_CHART_POINTS)
+    bucket_label = downsample.BUCKET_LABELS[bucket]
+    
+    if REFRESH_MODE == 'incremental':
+        totals = rollup_mirror.summarize(rollup, filters)
+        by_region = rollup_mirror.summarize(rollup, filters, 'region')
+        by_category = rollup_mirror.summarize(rollup, filters, 'category')
+        by_date = rollup_mirror.summarize(rollup, filters, 'date', bucket)
+    else:
+        with st.spinner("🔄 Agregando datos en PostgreSQL..."):
+            totals = run_query(queries.rollup_summary(filters), data_version, filters)
+            by_region = run_query(queries.rollup_summary(filters, 'region'), data_version, filters)
+            by_category = run_query(queries.rollup_summary(filters, 'category'), data_version, filters)
+            by_date = run_query(queries.rollup_summary(filters, 'date', bucket), data_version, filters,
+                                transform=parse_dates)
+    
+    # Las series de líneas se reducen con LTTB si superan el tope de puntos,
+    # cada una según su propia curva
+    chart_series = downsample.lttb_series(
+        by_date, 'date', ['units_sold', 'demand_forecast', 'avg_inventory_turnover', 'avg_forecast_accuracy'],
+        MAX_CHART_POINTS)
+    # Bytes enviados al navegador en esta ejecución (JSON de Plotly y tablas en Arrow)
+    payload = {'charts': 0, 'tables': 0}
+    
+    # Sin filas que cumplan los filtros las sumas vienen nulas
+    if totals.empty:
+        totals = pd.Series(0.0, index=retail_metrics.rollup_measure_names() +
+                           [f"avg_{name}" for name in queries.ROLLUP_AVERAGES])
+    else:
+        totals = totals.iloc[0].fillna(0)
+    
+    # Con el estado actual, inventario y rotación se calculan sobre un producto
+    # por tienda: el costo depende del catálogo, no de la historia
+    if inventory_source == 'current':
+        state_totals = run_query(queries.state_summary(filters), data_version)
+        if not state_totals.empty:
+            state_totals = state_totals.iloc[0].fillna(0)
+            totals['avg_inventory_level'] = state_totals['avg_inventory_level']
+            totals['avg_inventory_turnover'] = state_totals['avg_inventory_turnover']
+        by_region = use_current_inventory(
+            by_region, run_query(queries.state_summary(filters, 'region'), data_version), 'region')
+        by_category = use_current_inventory(
+            by_category, run_query(queries.state_summary(filters, 'category'), data_version), 'category')
     
     # =============================================
     # 🚨 NUEVA SECCIÓN: ALERTAS DE STOCK BAJO
@@ -204,13 +263,18 @@ def main():
         help="Nivel de inventario mínimo para generar alertas"
     )
     
-    # Identificar productos con stock bajo
-    low_stock_items = filtered_df[filtered_df['inventory_level'] < stock_threshold]
+    # Las alertas miran la última lectura de cada producto por tienda (tabla de
+    # estado del consumer): cada umbral es un recorrido de índice con top-K,
+    # sin importar cuánta historia haya. Se recalculan con cada carga.
+    alert_counts = run_query(queries.stock_alert_counts(filters, stock_threshold), data_version)
+    low_stock_items = run_query(queries.stock_alert_items(filters, stock_threshold), data_version)
+    stockout_items = run_query(queries.stockout_risk_items(filters, stock_threshold), data_version)
+    st.caption("Estado actual por tienda y producto (el rango de fechas no aplica a las alertas)")
     
     col_alert1, col_alert2, col_alert3 = st.columns(3)
     
     with col_alert1:
-        total_low_stock = len(low_stock_items)
+        total_low_stock = int(alert_counts['low_stock'].iloc[0]) if not alert_counts.empty else 0
         st.metric(
             "Productos con Stock Bajo", 
             total_low_stock,
@@ -220,19 +284,16 @@ def main():
     
     with col_alert2:
         # Alertas de demanda vs inventario
-        high_demand_low_stock = filtered_df[
-            (filtered_df['demand_forecast'] > filtered_df['inventory_level']) & 
-            (filtered_df['inventory_level'] < stock_threshold * 2)
-        ]
+        high_demand_low_stock = int(alert_counts['high_demand_low_stock'].iloc[0]) if not alert_counts.empty else 0
         st.metric(
             "Riesgo de Desabastecimiento", 
-            len(high_demand_low_stock),
+            high_demand_low_stock,
             help="Productos con alta demanda pronosticada y bajo inventario"
         )
     
     with col_alert3:
         # Eficiencia de pronósticos
-        avg_accuracy = filtered_df['forecast_accuracy'].mean()
+        avg_accuracy = totals['avg_forecast_accuracy']
         st.metric(
             "Precisión de Pronósticos", 
             f"{avg_accuracy:.1f}%",
@@ -243,11 +304,13 @@ def main():
     # Mostrar tabla de alertas detalladas
     if not low_stock_items.empty:
         with st.expander("📋 Detalle de Alertas de Stock Bajo", expanded=False):
-            alert_cols = ['product_id', 'category', 'region', 'inventory_level', 'demand_forecast', 'units_sold']
-            st.dataframe(
-                low_stock_items[alert_cols].sort_values('inventory_level').head(10),
-                use_container_width=True
-            )
+            payload['tables'] += frames.arrow_payload_bytes(low_stock_items)
+            st.dataframe(low_stock_items, use_container_width=True)
+    
+    if not stockout_items.empty:
+        with st.expander("📋 Mayor Riesgo de Desabastecimiento", expanded=False):
+            payload['tables'] += frames.arrow_payload_bytes(stockout_items)
+            st.dataframe(stockout_items, use_container_width=True)
     
     # =============================================
     # 📈 MÉTRICAS PRINCIPALES (MEJORADAS)
@@ -257,25 +320,26 @@ def main():
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        total_revenue = filtered_df['revenue'].sum()
+        total_revenue = totals['revenue']
         st.metric("Ingreso Total", f"${total_revenue:,.2f}")
     
     with col2:
-        total_units = filtered_df['units_sold'].sum()
+        total_units = totals['units_sold']
         st.metric("Unidades Vendidas", f"{total_units:,.0f}")
     
     with col3:
         # NUEVO: Costos logísticos totales
-        total_logistics = filtered_df['logistics_cost'].sum()
+        total_logistics = totals['logistics_cost']
         st.metric("Costos Logísticos", f"${total_logistics:,.2f}")
     
     with col4:
-        avg_inventory = filtered_df['inventory_level'].mean()
-        st.metric("Inventario Promedio", f"{avg_inventory:.1f}")
+        avg_inventory = totals['avg_inventory_level']
+        st.metric("Inventario Promedio", f"{avg_inventory:.1f}",
+                  help="Última lectura por producto y tienda" if inventory_source == 'current' else None)
     
     with col5:
         # NUEVO: Eficiencia general
-        avg_turnover = filtered_df['inventory_turnover'].mean()
+        avg_turnover = totals['avg_inventory_turnover']
         st.metric("Rotación de Inventario", f"{avg_turnover:.2f}")
     
     # =============================================
@@ -288,31 +352,21 @@ def main():
     with col_map1:
         # Mapa de calor por región (simulado)
         st.markdown("**📊 Actividad por Región**")
-        region_activity = filtered_df.groupby('region').agg({
-            'revenue': 'sum',
-            'units_sold': 'sum',
-            'logistics_cost': 'sum'
-        }).reset_index()
         
-        if not region_activity.empty:
+        if not by_region.empty:
             fig_region = px.bar(
-                region_activity,
+                by_region,
                 x='region',
                 y=['revenue', 'logistics_cost'],
                 title="Ingresos vs Costos Logísticos por Región",
                 barmode='group'
             )
-            st.plotly_chart(fig_region, use_container_width=True)
+            show_chart(fig_region, payload)
     
     with col_map2:
         # Eficiencia logística por región
         st.markdown("**📦 Eficiencia Logística**")
-        region_efficiency = filtered_df.groupby('region').agg({
-            'logistics_cost': 'sum',
-            'units_sold': 'sum',
-            'inventory_turnover': 'mean'
-        }).reset_index()
-        
+        region_efficiency = by_region.copy()
         region_efficiency['cost_per_unit'] = (
             region_efficiency['logistics_cost'] / region_efficiency['units_sold'].replace(0, 1)
         )
@@ -321,13 +375,14 @@ def main():
             fig_efficiency = px.scatter(
                 region_efficiency,
                 x='cost_per_unit',
-                y='inventory_turnover',
+                y='avg_inventory_turnover',
                 size='units_sold',
                 color='region',
                 title="Eficiencia: Costo vs Rotación por Región",
-                hover_name='region'
+                hover_name='region',
+                labels={'avg_inventory_turnover': 'inventory_turnover'}
             )
-            st.plotly_chart(fig_efficiency, use_container_width=True)
+            show_chart(fig_efficiency, payload)
     
     # =============================================
     # ⚡ NUEVA SECCIÓN: COMPARACIÓN DE EFICIENCIA
@@ -338,49 +393,36 @@ def main():
     
     with col_eff1:
         # Eficiencia por categoría
-        category_efficiency = filtered_df.groupby('category').agg({
-            'inventory_turnover': 'mean',
-            'forecast_accuracy': 'mean',
-            'pricing_efficiency': 'mean',
-            'revenue': 'sum'
-        }).reset_index()
-        
-        if not category_efficiency.empty:
+        if not by_category.empty:
             fig_category_eff = px.bar(
-                category_efficiency,
+                by_category,
                 x='category',
-                y='inventory_turnover',
+                y='avg_inventory_turnover',
                 title="Rotación de Inventario por Categoría",
-                color='inventory_turnover',
-                color_continuous_scale='viridis'
+                color='avg_inventory_turnover',
+                color_continuous_scale='viridis',
+                labels={'avg_inventory_turnover': 'inventory_turnover'}
             )
-            st.plotly_chart(fig_category_eff, use_container_width=True)
+            show_chart(fig_category_eff, payload)
     
     with col_eff2:
         # Comparación de eficiencia temporal
-        if not filtered_df.empty and 'date' in filtered_df.columns:
-            daily_efficiency = filtered_df.groupby('date').agg({
-                'inventory_turnover': 'mean',
-                'forecast_accuracy': 'mean',
-                'logistics_cost': 'sum'
-            }).reset_index()
-            
-            if not daily_efficiency.empty:
-                fig_trend_eff = go.Figure()
-                fig_trend_eff.add_trace(go.Scatter(
-                    x=daily_efficiency['date'], 
-                    y=daily_efficiency['inventory_turnover'],
-                    name='Rotación Inventario',
-                    line=dict(color='blue')
-                ))
-                fig_trend_eff.add_trace(go.Scatter(
-                    x=daily_efficiency['date'], 
-                    y=daily_efficiency['forecast_accuracy'] / 100,
-                    name='Precisión Pronósticos (escala 0-1)',
-                    line=dict(color='green', dash='dash')
-                ))
-                fig_trend_eff.update_layout(title="Tendencia de Eficiencia Diaria")
-                st.plotly_chart(fig_trend_eff, use_container_width=True)
+        if not by_date.empty:
+            fig_trend_eff = go.Figure()
+            fig_trend_eff.add_trace(go.Scatter(
+                x=chart_series['avg_inventory_turnover']['date'], 
+                y=chart_series['avg_inventory_turnover']['avg_inventory_turnover'],
+                name='Rotación Inventario',
+                line=dict(color='blue')
+            ))
+            fig_trend_eff.add_trace(go.Scatter(
+                x=chart_series['avg_forecast_accuracy']['date'], 
+                y=chart_series['avg_forecast_accuracy']['avg_forecast_accuracy'] / 100,
+                name='Precisión Pronósticos (escala 0-1)',
+                line=dict(color='green', dash='dash')
+            ))
+            fig_trend_eff.update_layout(title=f"Tendencia de Eficiencia ({bucket_label})")
+            show_chart(fig_trend_eff, payload)
     
     # =============================================
     # 📊 GRÁFICAS EXISTENTES (MANTENIDAS)
@@ -391,33 +433,29 @@ def main():
     col1, col2 = st.columns(2)
     
     with col1:
-        if not filtered_df.empty and 'category' in filtered_df.columns:
-            category_sales = filtered_df.groupby('category')['revenue'].sum().reset_index()
-            if not category_sales.empty:
-                fig1 = px.bar(
-                    category_sales, 
-                    x='category', 
-                    y='revenue',
-                    title="Ingresos por Categoría",
-                    color='revenue',
-                    color_continuous_scale='viridis'
-                )
-                fig1.update_layout(xaxis_title="Categoría", yaxis_title="Ingresos ($)")
-                st.plotly_chart(fig1, use_container_width=True)
+        if not by_category.empty:
+            fig1 = px.bar(
+                by_category, 
+                x='category', 
+                y='revenue',
+                title="Ingresos por Categoría",
+                color='revenue',
+                color_continuous_scale='viridis'
+            )
+            fig1.update_layout(xaxis_title="Categoría", yaxis_title="Ingresos ($)")
+            show_chart(fig1, payload)
     
     with col2:
-        if not filtered_df.empty and 'date' in filtered_df.columns:
-            daily_sales = filtered_df.groupby('date')['units_sold'].sum().reset_index()
-            if not daily_sales.empty:
-                fig2 = px.line(
-                    daily_sales,
-                    x='date',
-                    y='units_sold',
-                    title="Tendencia de Ventas Diarias",
-                    line_shape='spline'
-                )
-                fig2.update_layout(xaxis_title="Fecha", yaxis_title="Unidades Vendidas")
-                st.plotly_chart(fig2, use_container_width=True)
+        if not by_date.empty:
+            fig2 = px.line(
+                chart_series['units_sold'],
+                x='date',
+                y='units_sold',
+                title=f"Tendencia de Ventas ({bucket_label})",
+                line_shape='spline'
+            )
+            fig2.update_layout(xaxis_title="Fecha", yaxis_title="Unidades Vendidas")
+            show_chart(fig2, payload)
     
     # =============================================
     # 🔍 ANÁLISIS DETALLADO (MEJORADO)
@@ -428,73 +466,86 @@ def main():
     
     with col_anal1:
         # Demanda vs Real (mejorado)
-        if not filtered_df.empty and all(col in filtered_df.columns for col in ['date', 'units_sold', 'demand_forecast']):
-            demand_comparison = filtered_df.groupby('date').agg({
-                'units_sold': 'sum',
-                'demand_forecast': 'sum'
-            }).reset_index()
-            
-            if not demand_comparison.empty:
-                fig_demand = go.Figure()
-                fig_demand.add_trace(go.Scatter(
-                    x=demand_comparison['date'], 
-                    y=demand_comparison['units_sold'],
-                    name='Ventas Reales',
-                    line=dict(color='blue')
-                ))
-                fig_demand.add_trace(go.Scatter(
-                    x=demand_comparison['date'], 
-                    y=demand_comparison['demand_forecast'],
-                    name='Pronóstico',
-                    line=dict(color='red', dash='dash')
-                ))
-                fig_demand.update_layout(title="Comparación: Demanda Real vs Pronosticada")
-                st.plotly_chart(fig_demand, use_container_width=True)
+        if not by_date.empty:
+            fig_demand = go.Figure()
+            fig_demand.add_trace(go.Scatter(
+                x=chart_series['units_sold']['date'], 
+                y=chart_series['units_sold']['units_sold'],
+                name='Ventas Reales',
+                line=dict(color='blue')
+            ))
+            fig_demand.add_trace(go.Scatter(
+                x=chart_series['demand_forecast']['date'], 
+                y=chart_series['demand_forecast']['demand_forecast'],
+                name='Pronóstico',
+                line=dict(color='red', dash='dash')
+            ))
+            fig_demand.update_layout(title="Comparación: Demanda Real vs Pronosticada")
+            show_chart(fig_demand, payload)
     
     with col_anal2:
-        # Análisis de eficiencia de promociones
-        if not filtered_df.empty and 'holiday_promotion' in filtered_df.columns:
-            promotion_analysis = filtered_df.groupby('holiday_promotion').agg({
-                'units_sold': 'mean',
-                'revenue': 'mean',
-                'inventory_turnover': 'mean'
-            }).reset_index()
-            promotion_analysis['promotion_type'] = promotion_analysis['holiday_promotion'].map(
-                {0: 'Sin Promoción', 1: 'Con Promoción'}
+        # Análisis de eficiencia de promociones: promedios por fila con y sin
+        # promoción a partir de las sumas condicionales del rollup
+        promo_rows = totals['promo_rows']
+        regular_rows = totals['row_count'] - promo_rows
+        promotion_analysis = pd.DataFrame({
+            'promotion_type': ['Sin Promoción', 'Con Promoción'],
+            'units_sold': [(totals['units_sold'] - totals['promo_units_sold']) / max(regular_rows, 1),
+                           totals['promo_units_sold'] / max(promo_rows, 1)],
+            'revenue': [(totals['revenue'] - totals['promo_revenue']) / max(regular_rows, 1),
+                        totals['promo_revenue'] / max(promo_rows, 1)],
+            'inventory_turnover': [
+                (totals['inventory_turnover'] - totals['promo_inventory_turnover']) / max(regular_rows, 1),
+                totals['promo_inventory_turnover'] / max(promo_rows, 1)],
+        })[[regular_rows > 0, promo_rows > 0]]
+        
+        if not promotion_analysis.empty:
+            fig_promo = px.bar(
+                promotion_analysis,
+                x='promotion_type',
+                y=['units_sold', 'revenue'],
+                title="Impacto de Promociones en Ventas e Ingresos",
+                barmode='group'
             )
-            
-            if not promotion_analysis.empty:
-                fig_promo = px.bar(
-                    promotion_analysis,
-                    x='promotion_type',
-                    y=['units_sold', 'revenue'],
-                    title="Impacto de Promociones en Ventas e Ingresos",
-                    barmode='group'
-                )
-                st.plotly_chart(fig_promo, use_container_width=True)
+            show_chart(fig_promo, payload)
     
     # =============================================
     # 📋 TABLA DE DATOS (MEJORADA)
     # =============================================
     st.subheader("📋 Datos Detallados con Métricas de Eficiencia")
     
+    # El rollup tiene las mismas dimensiones que los filtros: su row_count es exacto
+    total_detail = int(totals['row_count'])
+    
+    col_page1, col_page2 = st.columns(2)
+    with col_page1:
+        page_size = st.selectbox("Filas por página", [50, 100, 500, 1000], index=1)
+    pages = max((total_detail + page_size - 1) // page_size, 1)
+    with col_page2:
+        page = st.number_input("Página", min_value=1, max_value=pages, value=1, step=1)
+    
+    detail_df = run_query(queries.detail_page(filters, page - 1, page_size), data_version, filters,
+                          transform=compact_detail)
+    st.caption(f"Página {page} de {pages:,} ({total_detail:,} registros filtrados, los más recientes primero)")
+    
     # Selector de columnas para mostrar (mejorado)
     default_cols = ['date', 'category', 'region', 'units_sold', 'inventory_level', 
                    'demand_forecast', 'logistics_cost', 'inventory_turnover']
-    available_cols = filtered_df.columns.tolist()
+    available_cols = detail_df.columns.tolist()
     selected_cols = st.multiselect(
         "Selecciona columnas para mostrar:",
         available_cols,
-        default=default_cols
+        default=[col for col in default_cols if col in available_cols]
     )
     
     if selected_cols:
-        display_df = filtered_df[selected_cols].copy()
+        display_df = detail_df[selected_cols].copy()
         if 'date' in display_df.columns:
             display_df['date'] = display_df['date'].dt.strftime('%Y-%m-%d')
             
+        payload['tables'] += frames.arrow_payload_bytes(display_df)
         st.dataframe(
-            display_df.sort_values('date' if 'date' in display_df.columns else selected_cols[0], ascending=False),
+            display_df,
             use_container_width=True,
             height=400
         )
@@ -502,18 +553,48 @@ def main():
     # Estadísticas descriptivas (mejoradas)
     st.subheader("📊 Estadísticas Descriptivas Completas")
     
-    numeric_cols = filtered_df.select_dtypes(include=['float64', 'int64']).columns
-    if len(numeric_cols) > 0:
-        st.dataframe(filtered_df[numeric_cols].describe(), use_container_width=True)
+    # count, mean, std, min y max salen del rollup; los cuartiles, de una
+    # muestra de retail_sales y solo si se piden
+    stats = run_query(queries.describe(filters), data_version, filters)
+    if not stats.empty and stats['count'].sum() > 0:
+        if st.checkbox(f"Incluir cuartiles (muestra del {QUARTILE_SAMPLE_PERCENT:g}% de retail_sales)"):
+            quartiles = run_query(queries.describe_quartiles(filters, QUARTILE_SAMPLE_PERCENT),
+                                  data_version, filters)
+            if not quartiles.empty:
+                stats = stats.merge(quartiles, on='column_name', how='left')[
+                    ['column_name', 'count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']]
+        stats_table = stats.set_index('column_name').T
+        payload['tables'] += frames.arrow_payload_bytes(stats_table)
+        st.dataframe(stats_table, use_container_width=True)
     
     # Información del sistema (mejorada)
     with st.expander("ℹ️ Información del Sistema y Métricas"):
-        st.info(f"**Fuente de datos:** PostgreSQL")
-        st.info(f"**Total de registros:** {len(filtered_df):,}")
-        if not filtered_df.empty and 'date' in filtered_df.columns:
-            st.info(f"**Período de datos:** {filtered_df['date'].min().strftime('%Y-%m-%d')} a {filtered_df['date'].max().strftime('%Y-%m-%d')}")
+        st.info(f"**Fuente de datos:** PostgreSQL (rollup diario {queries.ROLLUP_TABLE})")
+        st.info(f"**Total de registros:** {int(totals['row_count']):,}")
+        if not by_date.empty:
+            st.info(f"**Período de datos:** {filters.get('start_date', min_date):%Y-%m-%d} a {filters.get('end_date', max_date):%Y-%m-%d}")
+        st.info(f"**Payload de la página:** gráficos {payload['charts'] / 1024:,.1f} KB, tablas "
+                f"{payload['tables'] / 1024:,.1f} KB; serie {bucket_label} de {len(by_date):,} puntos, "
+                f"hasta {max(len(series) for series in chart_series.values()):,} graficados por serie "
+                f"(tope {MAX_CHART_POINTS})")
         st.info(f"**Métricas calculadas:** Costos logísticos, Eficiencia, Rotación de inventario, Alertas de stock")
         st.info(f"**Última actualización:** {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        pool_stats = db_pool.shared_pool().summary()
+        st.info(f"**Pool PostgreSQL:** {pool_stats['in_use']}/{pool_stats['max_size']} conexiones en uso "
+                f"({pool_stats['size']} abiertas, pico {pool_stats['peak_in_use']}), espera media "
+                f"{pool_stats['avg_wait_seconds'] * 1000:.1f} ms, p95 {pool_stats['p95_wait_seconds'] * 1000:.1f} ms, "
+                f"{pool_stats['timeouts']} timeouts")
+        cache_stats = cache.shared_cache(CACHE_TTL_SECONDS, CACHE_MAX_MB * 1024 * 1024).summary()
+        st.info(f"**Cache:** versión de datos {data_version}, {cache_stats['entries']} entradas "
+                f"({cache_stats['bytes'] / 1e6:.1f} MB de {CACHE_MAX_MB} MB), {cache_stats['hits']} aciertos, "
+                f"{cache_stats['revalidated']} revalidadas, {cache_stats['misses']} consultas, "
+                f"{cache_stats['evictions']} desalojos")
+        if REFRESH_MODE == 'incremental':
+            mirror_stats = rollup_mirror.shared_mirror().summary()
+            st.info(f"**Rollup en memoria:** {mirror_stats['rows']:,} filas hasta ingest_seq "
+                    f"{mirror_stats['watermark']}, último delta {mirror_stats['last_delta_rows']:,} filas en "
+                    f"{mirror_stats['last_refresh_seconds'] * 1000:.0f} ms, {mirror_stats['refreshes']} refrescos, "
+                    f"{mirror_stats['full_reloads']} recargas completas")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
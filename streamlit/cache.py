@@ -0,0 +1,124 @@
+"""
+Cache en memoria de resultados de consultas del dashboard.
+
+Streamlit vuelve a ejecutar app.py con cada interacción, pero este módulo se
+importa una sola vez por proceso, así que la cache se comparte entre reruns
+y sesiones. Las entradas se guardan por clave (consulta + parámetros), con:
+
+- TTL: una entrada más vieja que ttl_seconds se descarta.
+- Tope de memoria: al superar max_bytes se desalojan las menos usadas (LRU).
+- Versión de datos: cada entrada recuerda la versión global de
+  retail_data_version con la que se calculó. Si el consumer la subió, la
+  entrada se revalida con la versión de su porción de datos (slice) y solo se
+  recalcula si esa porción cambió.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry(object):
+    __slots__ = ("value", "size", "created", "data_version", "slice_version")
+
+    def __init__(self, value, size, created, data_version, slice_version):
+        self.value = value
+        self.size = size
+        self.created = created
+        self.data_version = data_version
+        self.slice_version = slice_version
+
+
+def value_size(value):
+    """Bytes aproximados de un resultado (DataFrame de pandas u otro objeto)"""
+    if hasattr(value, "memory_usage"):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    return sys.getsizeof(value)
+
+
+class QueryCache(object):
+    """Cache LRU con TTL, tope de bytes e invalidación por versión de datos"""
+
+    def __init__(self, ttl_seconds=300, max_bytes=256 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.RLock()
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get_or_compute(self, key, compute, data_version=None, slice_version=None, cache_if=None):
+        """
+        Retorna el valor de `key` o lo calcula con compute().
+
+        slice_version es una función opcional que retorna la versión de la
+        porción de datos de la consulta; solo se llama cuando la versión
+        global cambió desde que se guardó la entrada, o al guardarla.
+        cache_if(valor) decide si un valor recién calculado se guarda.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry.created > self.ttl_seconds:
+                self.remove(key)
+                self.stats["expired"] += 1
+                entry = None
+            if entry is not None and entry.data_version == data_version:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry.value
+
+        # Las consultas de versión y el cálculo corren sin el lock
+        current_slice = slice_version() if slice_version is not None else None
+        if entry is not None and slice_version is not None and current_slice == entry.slice_version:
+            with self.lock:
+                entry.data_version = data_version
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                self.stats["revalidated"] += 1
+            return entry.value
+
+        value = compute()
+        with self.lock:
+            self.stats["misses"] += 1
+            if cache_if is None or cache_if(value):
+                self.put(key, CacheEntry(value, value_size(value), time.time(), data_version, current_slice))
+        return value
+
+    def put(self, key, entry):
+        if key in self.entries:
+            self.remove(key)
+        if entry.size > self.max_bytes:
+            return
+        self.entries[key] = entry
+        self.total_bytes += entry.size
+        while self.total_bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self.remove(oldest)
+            self.stats["evictions"] += 1
+
+    def remove(self, key):
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry.size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def summary(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), bytes=self.total_bytes)
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache(ttl_seconds, max_bytes):
+    """Cache única del proceso, creada con la configuración del primer llamado"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = QueryCache(ttl_seconds, max_bytes)
+        return _shared_cache
@@ -0,0 +1,201 @@
+"""
+Pool de conexiones PostgreSQL del dashboard.
+
+Streamlit atiende cada sesión en su propio hilo y vuelve a ejecutar app.py con
+cada interacción; este módulo se importa una sola vez por proceso, así que el
+pool se comparte entre reruns y sesiones en lugar de abrir una conexión (con
+su handshake TCP y de autenticación) por consulta.
+
+- Tamaño acotado: como mucho max_size conexiones; si están todas en uso,
+  acquire() espera hasta acquire_timeout segundos.
+- Health check: una conexión que estuvo ociosa más de health_check_seconds
+  se prueba con SELECT 1 antes de entregarla, y se reemplaza si falló.
+- statement_timeout: lo aplica el servidor a cada consulta de la conexión.
+- Métricas: espera para obtener conexión (promedio, p95, máxima), uso actual
+  y pico, conexiones creadas y descartadas.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+
+
+class PoolTimeout(Exception):
+    """No se liberó ninguna conexión dentro de acquire_timeout"""
+
+
+def connection_params_from_env():
+    """Parámetros de psycopg2 del entorno (por defecto, el PostgreSQL del compose)"""
+    return {
+        "host": os.environ.get("POSTGRES_HOST", "postgres"),
+        "port": int(os.environ.get("POSTGRES_PORT", "5432")),
+        "dbname": os.environ.get("POSTGRES_DB", "hive"),
+        "user": os.environ.get("POSTGRES_USER", "hive"),
+        "password": os.environ.get("POSTGRES_PASSWORD", "hive"),
+    }
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class ConnectionPool(object):
+
+    def __init__(self, connection_params, min_size=1, max_size=10, acquire_timeout=10.0,
+                 statement_timeout_ms=30000, health_check_seconds=30.0):
+        self.connection_params = dict(connection_params)
+        if statement_timeout_ms:
+            self.connection_params["options"] = "-c statement_timeout={}".format(int(statement_timeout_ms))
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_seconds = health_check_seconds
+
+        self.condition = threading.Condition()
+        self.idle = []  # [(conexión, momento en que se liberó)]
+        self.in_use = 0
+        self.size = 0
+        self.stats = {"acquired": 0, "timeouts": 0, "created": 0, "discarded": 0,
+                      "wait_seconds": 0.0, "max_wait_seconds": 0.0, "peak_in_use": 0}
+        # Esperas recientes, para los percentiles
+        self.waits = deque(maxlen=1000)
+
+        for _ in range(min_size):
+            self.idle.append((self.connect(), time.time()))
+            self.size += 1
+
+    def connect(self):
+        connection = psycopg2.connect(**self.connection_params)
+        # El dashboard solo lee: sin transacciones abiertas entre consultas
+        connection.autocommit = True
+        with self.condition:
+            self.stats["created"] += 1
+        return connection
+
+    def healthy(self, connection, idle_since):
+        if connection.closed:
+            return False
+        if time.time() - idle_since < self.health_check_seconds:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+        with self.condition:
+            self.stats["discarded"] += 1
+
+    def acquire(self):
+        """Conexión del pool; esperar más de acquire_timeout lanza PoolTimeout"""
+        started = time.time()
+        deadline = started + self.acquire_timeout
+        with self.condition:
+            while not self.idle and self.size >= self.max_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeout("Sin conexiones libres tras {:.1f}s ({} en uso)".format(
+                        self.acquire_timeout, self.in_use))
+                self.condition.wait(remaining)
+            # Se reserva el lugar antes de soltar el lock para conectar o probar
+            candidate = self.idle.pop() if self.idle else None
+            if candidate is None:
+                self.size += 1
+            self.in_use += 1
+
+        try:
+            if candidate is not None and not self.healthy(*candidate):
+                self.discard(candidate[0])
+                candidate = None
+            connection = candidate[0] if candidate is not None else self.connect()
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.in_use -= 1
+                self.condition.notify()
+            raise
+
+        waited = time.time() - started
+        with self.condition:
+            self.stats["acquired"] += 1
+            self.stats["wait_seconds"] += waited
+            self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+            self.stats["peak_in_use"] = max(self.stats["peak_in_use"], self.in_use)
+            self.waits.append(waited)
+        return connection
+
+    def release(self, connection, broken=False):
+        """Devuelve una conexión; si quedó rota se descarta y se libera su lugar"""
+        if not broken and not connection.closed and \
+                connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                broken = True
+        with self.condition:
+            self.in_use -= 1
+            if broken or connection.closed:
+                self.size -= 1
+                self.discard(connection)
+            else:
+                self.idle.append((connection, time.time()))
+            self.condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """Conexión prestada durante el bloque; si se cortó, release() la descarta"""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        with self.condition:
+            for connection, _ in self.idle:
+                self.discard(connection)
+            self.size -= len(self.idle)
+            self.idle = []
+
+    def summary(self):
+        """Métricas del pool (tiempos en segundos, utilización entre 0 y 1)"""
+        with self.condition:
+            acquired = self.stats["acquired"]
+            return dict(self.stats,
+                        size=self.size,
+                        max_size=self.max_size,
+                        in_use=self.in_use,
+                        utilization=self.in_use / float(self.max_size),
+                        avg_wait_seconds=self.stats["wait_seconds"] / acquired if acquired else 0.0,
+                        p95_wait_seconds=percentile(list(self.waits), 0.95))
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def shared_pool():
+    """Pool único del proceso, configurado con DASHBOARD_POOL_* del entorno"""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = ConnectionPool(
+                connection_params_from_env(),
+                min_size=int(os.environ.get("DASHBOARD_POOL_MIN_SIZE", "1")),
+                max_size=int(os.environ.get("DASHBOARD_POOL_MAX_SIZE", "10")),
+                acquire_timeout=float(os.environ.get("DASHBOARD_POOL_TIMEOUT_SECONDS", "10")),
+                statement_timeout_ms=int(os.environ.get("DASHBOARD_STATEMENT_TIMEOUT_MS", "30000")),
+                health_check_seconds=float(os.environ.get("DASHBOARD_POOL_HEALTH_CHECK_SECONDS", "30")))
+        return _shared_pool
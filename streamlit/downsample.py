@@ -0,0 +1,71 @@
+"""
+Reducción de los datos de los gráficos temporales antes de enviarlos al navegador.
+
+- time_bucket(): elige la granularidad (day, week o month) según el rango de
+  fechas, para que una serie no tenga más de max_points puntos. La
+  agregación por semana o mes se hace donde se agrega el rollup (PostgreSQL
+  o la copia en memoria), así que los promedios siguen siendo suma/row_count.
+- lttb_frame(): Largest-Triangle-Three-Buckets. Si igual quedan más puntos
+  que el tope (p. ej. granularidad diaria forzada sobre años), conserva los
+  que mejor preservan la forma de la curva: el primero, el último y, en cada
+  tramo, el que forma el triángulo de mayor área con sus vecinos.
+- lttb_series(): lttb_frame por cada columna graficada, porque los puntos
+  que preservan la forma de una curva no son los de otra.
+"""
+import numpy as np
+
+BUCKET_LABELS = {"day": "diaria", "week": "semanal", "month": "mensual"}
+
+
+def time_bucket(start_date, end_date, max_points):
+    """La granularidad más fina con la que el rango entra en max_points puntos"""
+    days = (end_date - start_date).days + 1
+    if days <= max_points:
+        return "day"
+    if days / 7.0 <= max_points:
+        return "week"
+    return "month"
+
+
+def lttb_indices(x, y, threshold):
+    """Índices de los `threshold` puntos elegidos por LTTB (x creciente)"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / float(threshold - 2)
+    selected = [0]
+    previous = 0
+    for i in range(threshold - 2):
+        # Promedio del tramo siguiente: el tercer vértice del triángulo
+        next_start = int(np.floor((i + 1) * every)) + 1
+        next_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) -
+                       (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.nanargmax(areas)) if not np.isnan(areas).all() else start
+        selected.append(previous)
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+def lttb_frame(df, x_column, y_column, max_points):
+    """Filas de `df` (ordenado por x_column) elegidas por LTTB sobre y_column"""
+    if len(df) <= max_points:
+        return df
+    x = df[x_column]
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('int64')
+    return df.iloc[lttb_indices(x.to_numpy(), df[y_column].to_numpy(), max_points)]
+
+
+def lttb_series(df, x_column, y_columns, max_points):
+    """{columna: filas (x_column, columna) de `df` elegidas por LTTB sobre esa columna}"""
+    if df.empty:
+        return dict((column, df) for column in y_columns)
+    return dict((column, lttb_frame(df[[x_column, column]], x_column, column, max_points))
+                for column in y_columns)
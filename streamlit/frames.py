@@ -0,0 +1,113 @@
+"""
+Lectura columnar y representación compacta de los resultados del dashboard.
+
+pd.read_sql_query arma un objeto Python por celda (str, float, date) y deja
+los textos como object y las fechas sin parsear. En su lugar, read_frame
+envía la consulta con COPY ... TO STDOUT (CSV) y la parsea con el lector CSV
+de Arrow en C, con los tipos del registro de esquema:
+
+- Textos como diccionario, que pandas recibe como category: cada valor
+  distinto de category, region, store_id, etc. se guarda una vez.
+- date como datetime64, ya parseada.
+- Enteros del esquema (holiday_promotion, row_seq) con el tipo más chico que
+  los contiene. Los conteos calculados en la consulta quedan en int64.
+
+Las medidas por fila (double del esquema y métricas derivadas) pasan a
+float32 solo con downcast_measures(), que el dashboard aplica a las filas del
+detalle: los rollups usan los mismos nombres para sus sumas, que necesitan
+float64.
+
+compact() aplica la misma representación a un DataFrame ya cargado,
+concat() une resultados sin que las category pasen a object y
+arrow_payload_bytes() estima lo que pesa una tabla al enviarla al navegador.
+"""
+import io
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv
+
+import retail_metrics
+import retail_schema
+
+DICTIONARY_TYPE = pa.dictionary(pa.int32(), pa.string())
+ARROW_TYPES = {"string": DICTIONARY_TYPE, "double": pa.float64(), "int": pa.int64(),
+               "long": pa.int64(), "date": pa.date32()}
+
+
+def arrow_column_types():
+    """Tipos Arrow de las columnas conocidas, por nombre normalizado"""
+    types = dict((name, ARROW_TYPES[logical]) for name, logical in retail_schema.column_types().items())
+    # Dimensiones de los rollups y de las consultas agrupadas
+    types.update({"min_date": pa.date32(), "max_date": pa.date32(), "column_name": DICTIONARY_TYPE})
+    return types
+
+
+def sorted_categories(series):
+    """Categorías en orden alfabético (Arrow las deja en orden de aparición), para ordenar y agrupar"""
+    categories = series.cat.categories
+    if categories.is_monotonic_increasing:
+        return series
+    return series.cat.set_categories(categories.sort_values())
+
+
+def compact(df):
+    """Categorías, fechas parseadas y numéricos reducidos, con la misma semántica que read_frame"""
+    types = retail_schema.column_types()
+    for column in df.columns:
+        logical = types.get(column)
+        if column in ("date", "min_date", "max_date") and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+        elif logical == "string" or column == "column_name":
+            df[column] = sorted_categories(df[column].astype('category'))
+        elif logical in ("int", "long"):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+    return df
+
+
+def downcast_measures(df):
+    """Medidas por fila (del esquema y derivadas) en float32: la mitad de memoria, alcanza para mostrarlas"""
+    for column in retail_schema.columns_of_type("double") + retail_metrics.derived_column_names():
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], downcast='float')
+    return df
+
+
+def read_csv(data):
+    """DataFrame compacto desde un CSV con encabezado (la salida de COPY ... CSV HEADER)"""
+    table = csv.read_csv(
+        pa.py_buffer(data),
+        convert_options=csv.ConvertOptions(column_types=arrow_column_types(), strings_can_be_null=True))
+    df = table.to_pandas(date_as_object=False)
+    return compact(df)
+
+
+def read_frame(connection, sql, params=None):
+    """Ejecuta `sql` con COPY y retorna el resultado como DataFrame compacto"""
+    buffer = io.BytesIO()
+    with connection.cursor() as cursor:
+        query = cursor.mogrify(sql, params).decode()
+        cursor.copy_expert("COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER)".format(query.strip().rstrip(';')),
+                           buffer)
+    return read_csv(buffer.getvalue())
+
+
+def concat(parts):
+    """pd.concat que conserva las category uniendo sus categorías (sin ellas pandas las pasa a object)"""
+    parts = [part for part in parts if not part.empty] or parts[:1]
+    for column in parts[0].columns:
+        if isinstance(parts[0][column].dtype, pd.CategoricalDtype):
+            categories = pd.api.types.union_categoricals(
+                [part[column] for part in parts], ignore_order=True).categories.sort_values()
+            for part in parts:
+                part[column] = part[column].cat.set_categories(categories)
+    return pd.concat(parts, ignore_index=True)
+
+
+def arrow_payload_bytes(df):
+    """Bytes del DataFrame serializado como Arrow IPC, el formato en que st.dataframe lo envía"""
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
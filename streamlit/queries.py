@@ -0,0 +1,271 @@
+"""
+Capa de consultas del dashboard.
+
+Cada función traduce las selecciones del sidebar a una consulta SQL
+parametrizada y retorna (sql, params) para ejecutarla con psycopg2. Los
+gráficos se agregan en PostgreSQL sobre el rollup diario que mantiene el
+Spark Consumer, y las filas crudas de retail_sales solo se leen filtradas y
+paginadas, así que el costo depende del resultado filtrado y no del tamaño de
+la tabla.
+
+Los filtros son un dict con las claves opcionales category, region,
+start_date y end_date.
+"""
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+import retail_metrics
+import retail_schema
+
+SALES_TABLE = "retail_sales"
+# Rollup diario mantenido por el Spark Consumer
+ROLLUP_TABLE = "retail_sales_daily_rollup"
+# Última lectura de cada (store_id, product_id), mantenida por el Spark Consumer
+STATE_TABLE = "retail_inventory_state"
+# Versión de los datos que el consumer sube con cada carga
+VERSION_TABLE = "retail_data_version"
+
+# Promedios por fila que se recuperan del rollup como suma / row_count
+ROLLUP_AVERAGES = ['inventory_level', 'inventory_turnover', 'forecast_accuracy', 'pricing_efficiency']
+
+# Granularidades de las series temporales (ver downsample.time_bucket)
+TIME_BUCKETS = ['day', 'week', 'month']
+
+# Orden estable del detalle: las filas de un mismo día se ordenan por identidad
+DETAIL_ORDER = "date DESC, " + ", ".join(retail_schema.IDENTITY_COLUMNS)
+
+
+def query_table(sql):
+    """Primera tabla del FROM de una consulta, para etiquetar sus métricas"""
+    match = re.search(r"\bFROM\s+(\w+)", sql)
+    return match.group(1) if match else None
+
+
+def filter_clause(filters, extra_conditions=()):
+    """Cláusula WHERE parametrizada con los filtros del sidebar"""
+    conditions, params = [], []
+    if filters.get('category'):
+        conditions.append("category = %s")
+        params.append(filters['category'])
+    if filters.get('region'):
+        conditions.append("region = %s")
+        params.append(filters['region'])
+    if filters.get('start_date') and filters.get('end_date'):
+        conditions.append("date BETWEEN %s AND %s")
+        params.extend([filters['start_date'], filters['end_date']])
+    conditions.extend(extra_conditions)
+    return ("WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+
+def data_version():
+    """Versión global de retail_sales; cambia cada vez que el consumer inserta filas"""
+    return f"SELECT version FROM {VERSION_TABLE} WHERE table_name = %s", [SALES_TABLE]
+
+
+def slice_version(filters):
+    """
+    Versión de la porción de datos que cubren los filtros. Toda fila nueva
+    pasa por el rollup, así que si ninguna fila del rollup de la porción
+    cambió, tampoco cambiaron sus filas en retail_sales.
+    """
+    where, params = filter_clause(filters)
+    return f"SELECT COUNT(*), MAX(updated_at) FROM {ROLLUP_TABLE} {where}", params
+
+
+def filter_options():
+    """Valores disponibles para los filtros: una fila por (category, region) y el rango de fechas"""
+    return f"""
+    SELECT category, region, MIN(date) as min_date, MAX(date) as max_date
+    FROM {ROLLUP_TABLE}
+    GROUP BY category, region
+    """, []
+
+
+def rollup_summary(filters, group_by=None, bucket="day"):
+    """
+    Sumas del rollup filtrado, agrupadas por `group_by` (date, region o
+    category) o en una sola fila de totales, con los promedios por fila. Con
+    group_by='date', `bucket` (day, week o month) agrupa por el inicio de
+    cada semana o mes.
+    """
+    where, params = filter_clause(filters)
+    names = retail_metrics.rollup_measure_names()
+    columns = [f"SUM({name}) as {name}" for name in names]
+    columns += [f"SUM({name}) / GREATEST(SUM(row_count), 1) as avg_{name}" for name in ROLLUP_AVERAGES]
+    if group_by:
+        if group_by not in retail_metrics.ROLLUP_DIMENSIONS:
+            raise ValueError(f"Dimensión de rollup desconocida: {group_by}")
+        if group_by == 'date' and bucket != 'day':
+            if bucket not in TIME_BUCKETS:
+                raise ValueError(f"Granularidad desconocida: {bucket}")
+            columns.insert(0, f"CAST(date_trunc('{bucket}', date) AS DATE) as date")
+            grouping = "GROUP BY 1 ORDER BY 1"
+        else:
+            columns.insert(0, group_by)
+            grouping = f"GROUP BY {group_by} ORDER BY {group_by}"
+    else:
+        grouping = ""
+    column_list = ",\n        ".join(columns)
+    return f"""
+    SELECT
+        {column_list}
+    FROM {ROLLUP_TABLE}
+    {where}
+    {grouping}
+    """, params
+
+
+def rollup_delta(watermark):
+    """Filas del rollup que tocaron las cargas posteriores a `watermark` (un ingest_seq)"""
+    columns = ", ".join(retail_metrics.ROLLUP_DIMENSIONS + retail_metrics.rollup_measure_names())
+    return f"""
+    SELECT {columns}, ingest_seq
+    FROM {ROLLUP_TABLE}
+    WHERE ingest_seq > %s
+    """, [watermark]
+
+
+def rollup_row_count():
+    """Filas del rollup, para comprobar que una copia incremental sigue completa"""
+    return f"SELECT COUNT(*) FROM {ROLLUP_TABLE}", []
+
+
+def state_filter_clause(filters, extra_conditions=()):
+    """
+    Como filter_clause, para la tabla de estado: las alertas miran el estado
+    actual de cada producto, así que el rango de fechas no aplica
+    """
+    return filter_clause({key: filters.get(key) for key in ('category', 'region')}, extra_conditions)
+
+
+def state_summary(filters, group_by=None):
+    """
+    KPIs de inventario sobre la última lectura de cada producto por tienda:
+    una fila de totales o una por región/categoría, con las mismas columnas
+    avg_* que rollup_summary para poder reemplazarlas
+    """
+    where, params = state_filter_clause(filters)
+    columns = ["COUNT(*) as products",
+               "AVG(inventory_level) as avg_inventory_level",
+               "AVG(inventory_turnover) as avg_inventory_turnover",
+               "SUM(inventory_level) as total_inventory_level"]
+    grouping = ""
+    if group_by:
+        if group_by not in ('region', 'category'):
+            raise ValueError(f"Dimensión de estado desconocida: {group_by}")
+        columns.insert(0, group_by)
+        grouping = f"GROUP BY {group_by} ORDER BY {group_by}"
+    column_list = ",\n        ".join(columns)
+    return f"""
+    SELECT
+        {column_list}
+    FROM {STATE_TABLE}
+    {where}
+    {grouping}
+    """, params
+
+
+def stock_alert_counts(filters, stock_threshold):
+    """
+    Productos por tienda bajo el umbral y con riesgo de desabastecimiento
+    (demanda > inventario, bajo el doble del umbral), según su última lectura
+    """
+    where, params = state_filter_clause(filters, ["inventory_level < %s"])
+    return f"""
+    SELECT
+        COUNT(*) FILTER (WHERE inventory_level < %s) as low_stock,
+        COUNT(*) FILTER (WHERE stock_gap > 0) as high_demand_low_stock
+    FROM {STATE_TABLE}
+    {where}
+    """, [stock_threshold] + params + [stock_threshold * 2]
+
+
+def stock_alert_items(filters, stock_threshold, limit=10):
+    """Los productos con menos inventario bajo el umbral (recorre el índice de inventory_level)"""
+    where, params = state_filter_clause(filters, ["inventory_level < %s"])
+    return f"""
+    SELECT store_id, product_id, category, region, date, inventory_level, demand_forecast, units_sold
+    FROM {STATE_TABLE}
+    {where}
+    ORDER BY inventory_level
+    LIMIT %s
+    """, params + [stock_threshold, limit]
+
+
+def stockout_risk_items(filters, stock_threshold, limit=10):
+    """Los productos bajo el doble del umbral con mayor demanda sin cubrir (índice de stock_gap)"""
+    where, params = state_filter_clause(filters, ["stock_gap > 0", "inventory_level < %s"])
+    return f"""
+    SELECT store_id, product_id, category, region, date, inventory_level, demand_forecast, stock_gap
+    FROM {STATE_TABLE}
+    {where}
+    ORDER BY stock_gap DESC
+    LIMIT %s
+    """, params + [stock_threshold * 2, limit]
+
+
+def detail_page(filters, page, page_size):
+    """
+    Una página (desde 0) de filas filtradas, las más recientes primero, con
+    las métricas por fila que el consumer guardó al ingerirlas
+    """
+    where, params = filter_clause(filters)
+    columns = ",\n        ".join(retail_schema.data_column_names() + retail_metrics.derived_column_names())
+    return f"""
+    SELECT
+        {columns}
+    FROM {SALES_TABLE}
+    {where}
+    ORDER BY {DETAIL_ORDER}
+    LIMIT %s OFFSET %s
+    """, params + [page_size, page * page_size]
+
+
+def describe(filters, columns=retail_metrics.DESCRIBE_COLUMNS):
+    """
+    Estadísticas tipo DataFrame.describe() calculadas sobre el rollup, una
+    fila por columna: count y mean salen de las sumas, std de la suma de
+    cuadrados y min/max de los extremos diarios. Los cuartiles no se pueden
+    combinar desde el rollup (ver describe_quartiles).
+    """
+    where, params = filter_clause(filters)
+    sums = ["SUM(row_count) as n"]
+    for column in columns:
+        sums += [f"SUM({column}) as {column}_sum", f"SUM({column}_sq) as {column}_sq",
+                 f"MIN({column}_min) as {column}_min", f"MAX({column}_max) as {column}_max"]
+    selects = []
+    for column in columns:
+        selects.append(f"""
+    SELECT '{column}' as column_name, COALESCE(n, 0) as count, {column}_sum / NULLIF(n, 0) as mean,
+        SQRT(GREATEST({column}_sq - {column}_sum * {column}_sum / NULLIF(n, 0), 0) / NULLIF(n - 1, 0)) as std,
+        {column}_min as min, {column}_max as max
+    FROM totals""")
+    return f"""
+    WITH totals AS (
+        SELECT {", ".join(sums)} FROM {ROLLUP_TABLE} {where}
+    )""" + "\n    UNION ALL".join(selects), params
+
+
+def describe_quartiles(filters, sample_percent, columns=retail_metrics.DESCRIBE_COLUMNS):
+    """
+    Cuartiles aproximados sobre una muestra de retail_sales (TABLESAMPLE
+    SYSTEM con el `sample_percent` % de las páginas, misma muestra en cada
+    ejecución), una fila por columna. Los % de los alias van escapados para
+    psycopg2.
+    """
+    where, params = filter_clause(filters)
+    selects = []
+    for column in columns:
+        selects.append(f"""
+    SELECT '{column}' as column_name,
+        percentile_cont(0.25) WITHIN GROUP (ORDER BY {column}) as "25%%",
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY {column}) as "50%%",
+        percentile_cont(0.75) WITHIN GROUP (ORDER BY {column}) as "75%%"
+    FROM sampled""")
+    return f"""
+    WITH sampled AS MATERIALIZED (
+        SELECT {", ".join(columns)} FROM {SALES_TABLE} TABLESAMPLE SYSTEM (%s) REPEATABLE (0) {where}
+    )""" + "\n    UNION ALL".join(selects), [sample_percent] + params
@@ -0,0 +1,145 @@
+"""
+Copia en memoria del rollup diario, actualizada por deltas.
+
+El consumer marca cada fila del rollup que toca con la versión de la carga
+(ingest_seq). La copia recuerda la mayor ingest_seq que leyó (la marca de
+agua) y, cuando la versión de datos cambia, trae solo las filas con
+ingest_seq mayor y las reemplaza por clave (date, region, category). El
+costo de la consulta crece con lo que tocaron las cargas nuevas y no con la
+historia completa. Las filas se leen con frames.read_frame: dimensiones como
+category y fechas ya parseadas.
+
+Si después de aplicar el delta la copia no tiene las mismas filas que la
+tabla (el cleaner la vació o el consumer la reconstruyó), se recarga entera.
+
+Los filtros y agregados del dashboard (opciones, totales y agrupaciones por
+date, region o category) se calculan con pandas sobre la copia, con las
+mismas columnas que queries.rollup_summary.
+"""
+import threading
+import time
+
+import pandas as pd
+
+import frames
+import pipeline_metrics
+import queries
+import retail_metrics
+
+
+class RollupMirror(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Se reemplaza entero en cada refresco, nunca se modifica en el lugar:
+        # las sesiones pueden leerlo sin tomar el lock
+        self.frame = None
+        self.watermark = -1
+        self.data_version = None
+        self.stats = {"refreshes": 0, "full_reloads": 0, "delta_rows": 0,
+                      "last_delta_rows": 0, "last_refresh_seconds": 0.0}
+
+    def read(self, pool, query):
+        sql, params = query
+        with pool.connection() as connection:
+            return frames.read_frame(connection, sql, params)
+
+    def fetch_since(self, pool, watermark):
+        return self.read(pool, queries.rollup_delta(watermark))
+
+    def refresh(self, pool, data_version):
+        """
+        Aplica las cargas posteriores a la última versión vista y retorna la
+        copia. Un error de lectura se propaga y la copia queda como estaba.
+        """
+        with self.lock:
+            if self.frame is not None and data_version == self.data_version:
+                return self.frame
+            started = time.time()
+            delta = self.fetch_since(pool, self.watermark)
+            frame = delta if self.frame is None else merge_delta(self.frame, delta)
+            expected = self.read(pool, queries.rollup_row_count()).iloc[0, 0]
+            if len(frame) != expected:
+                delta = frame = self.fetch_since(pool, -1)
+                self.stats["full_reloads"] += 1
+            if not frame.empty:
+                self.watermark = max(self.watermark, int(frame['ingest_seq'].max()))
+            self.frame = frame
+            self.data_version = data_version
+            self.stats["refreshes"] += 1
+            self.stats["delta_rows"] += len(delta)
+            self.stats["last_delta_rows"] = len(delta)
+            self.stats["last_refresh_seconds"] = time.time() - started
+            pipeline_metrics.record("dashboard", "dashboard_query", data_version,
+                                    self.stats["last_refresh_seconds"], len(delta),
+                                    table=queries.ROLLUP_TABLE, mirror=True)
+            return frame
+
+    def summary(self):
+        with self.lock:
+            rows = len(self.frame) if self.frame is not None else 0
+            return dict(self.stats, rows=rows, watermark=self.watermark, data_version=self.data_version)
+
+
+def merge_delta(frame, delta):
+    """`frame` con las filas de `delta` reemplazando las de la misma clave"""
+    if delta.empty:
+        return frame
+    keys = retail_metrics.ROLLUP_DIMENSIONS
+    stale = frame.set_index(keys).index.isin(delta.set_index(keys).index)
+    return frames.concat([frame[~stale], delta])
+
+
+def filter_frame(frame, filters):
+    """Filas de la copia que cumplen los filtros del sidebar (ver queries.filter_clause)"""
+    mask = pd.Series(True, index=frame.index)
+    if filters.get('category'):
+        mask &= frame['category'] == filters['category']
+    if filters.get('region'):
+        mask &= frame['region'] == filters['region']
+    if filters.get('start_date') and filters.get('end_date'):
+        mask &= frame['date'].between(pd.Timestamp(filters['start_date']), pd.Timestamp(filters['end_date']))
+    return frame[mask]
+
+
+def filter_options(frame):
+    """Como queries.filter_options, sobre la copia"""
+    return frame.groupby(['category', 'region'], as_index=False, observed=True).agg(
+        min_date=('date', 'min'), max_date=('date', 'max'))
+
+
+# Períodos de pandas equivalentes a date_trunc: las semanas empiezan el lunes
+BUCKET_PERIODS = {'week': 'W', 'month': 'M'}
+
+
+def summarize(frame, filters, group_by=None, bucket='day'):
+    """Como queries.rollup_summary, sobre la copia"""
+    names = retail_metrics.rollup_measure_names()
+    filtered = filter_frame(frame, filters)
+    if group_by:
+        if group_by not in retail_metrics.ROLLUP_DIMENSIONS:
+            raise ValueError(f"Dimensión de rollup desconocida: {group_by}")
+        key = filtered[group_by]
+        if group_by == 'date' and bucket != 'day':
+            if bucket not in BUCKET_PERIODS:
+                raise ValueError(f"Granularidad desconocida: {bucket}")
+            key = key.dt.to_period(BUCKET_PERIODS[bucket]).dt.start_time.rename('date')
+        result = filtered[names].groupby(key, observed=True).sum().reset_index().sort_values(group_by)
+    else:
+        result = filtered[names].sum().to_frame().T
+    for name in queries.ROLLUP_AVERAGES:
+        result[f"avg_{name}"] = result[name] / result['row_count'].clip(lower=1)
+    return result.reset_index(drop=True)
+
+
+_shared_mirror = None
+_shared_lock = threading.Lock()
+
+
+def shared_mirror():
+    """Copia única del proceso, compartida entre reruns y sesiones"""
+    global _shared_mirror
+    with _shared_lock:
+        if _shared_mirror is None:
+            _shared_mirror = RollupMirror()
+        return _shared_mirror
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""ConnectionPool del dashboard con conexiones simuladas (sin PostgreSQL)."""
+import os
+import sys
+import threading
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "streamlit"))
+
+import db_pool
+
+
+class FakeConnection(object):
+    closed = False
+    autocommit = False
+
+    def get_transaction_status(self):
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = True
+
+
+class FakeServer(object):
+    """psycopg2.connect simulado: guarda las conexiones creadas; con `fail` las rechaza"""
+
+    def __init__(self):
+        self.created = []
+        self.fail = False
+
+    def connect(self, **params):
+        if self.fail:
+            raise psycopg2.OperationalError("sin servidor")
+        connection = FakeConnection()
+        self.created.append(connection)
+        return connection
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakeServer()
+    monkeypatch.setattr(db_pool.psycopg2, "connect", fake.connect)
+    return fake
+
+
+def make_pool(**options):
+    options.setdefault("min_size", 0)
+    options.setdefault("max_size", 1)
+    options.setdefault("acquire_timeout", 0.05)
+    return db_pool.ConnectionPool({}, statement_timeout_ms=0, **options)
+
+
+def test_acquire_times_out_when_the_pool_is_exhausted(server):
+    pool = make_pool()
+    pool.acquire()
+    with pytest.raises(db_pool.PoolTimeout):
+        pool.acquire()
+    summary = pool.summary()
+    assert summary["timeouts"] == 1
+    assert summary["in_use"] == 1
+    assert summary["size"] == 1
+
+
+def test_released_connection_wakes_a_waiting_acquire(server):
+    pool = make_pool(acquire_timeout=5)
+    connection = pool.acquire()
+    timer = threading.Timer(0.05, pool.release, [connection])
+    timer.start()
+    try:
+        assert pool.acquire() is connection
+    finally:
+        timer.join()
+    assert len(server.created) == 1
+
+
+def test_failed_connect_releases_its_slot(server):
+    pool = make_pool()
+    server.fail = True
+    with pytest.raises(psycopg2.OperationalError):
+        pool.acquire()
+    assert pool.size == 0
+    assert pool.in_use == 0
+
+    # El lugar reservado quedó libre: la siguiente conexión no espera
+    server.fail = False
+    assert pool.acquire() is server.created[0]
+    assert pool.summary()["timeouts"] == 0
+
+
+def test_broken_connection_is_discarded_on_release(server):
+    pool = make_pool()
+    connection = pool.acquire()
+    connection.close()
+    pool.release(connection)
+    assert pool.size == 0
+    assert pool.acquire() is server.created[1]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Reducción de las series temporales: LTTB y granularidad semanal/mensual."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "streamlit"))
+sys.path.insert(0, os.path.join(ROOT, "common"))
+
+import downsample
+
+
+def test_lttb_keeps_every_point_under_the_threshold():
+    x = np.arange(10)
+    assert list(downsample.lttb_indices(x, x * 2.0, 10)) == list(range(10))
+    assert list(downsample.lttb_indices(x, x * 2.0, 2)) == list(range(10))
+
+
+def test_lttb_returns_threshold_increasing_indices_with_both_ends():
+    x = np.arange(1000)
+    y = np.sin(x / 25.0)
+    indices = downsample.lttb_indices(x, y, 50)
+    assert len(indices) == 50
+    assert indices[0] == 0
+    assert indices[-1] == 999
+    assert (np.diff(indices) > 0).all()
+
+
+def test_lttb_keeps_an_isolated_spike():
+    x = np.arange(500)
+    y = np.zeros(500)
+    y[321] = 100.0
+    assert 321 in downsample.lttb_indices(x, y, 20)
+
+
+def test_lttb_series_picks_points_per_column():
+    dates = pd.date_range("2024-01-01", periods=400)
+    y = np.zeros(400)
+    y[137] = 50.0
+    df = pd.DataFrame({"date": dates, "flat": np.linspace(0, 1, 400), "spiky": y})
+
+    series = downsample.lttb_series(df, "date", ["flat", "spiky"], 30)
+
+    assert list(series["spiky"].columns) == ["date", "spiky"]
+    assert len(series["flat"]) == len(series["spiky"]) == 30
+    assert dates[137] in set(series["spiky"]["date"])
+
+
+def test_time_bucket_by_range():
+    start = pd.Timestamp("2024-01-01").date()
+    assert downsample.time_bucket(start, pd.Timestamp("2024-03-01").date(), 300) == "day"
+    assert downsample.time_bucket(start, pd.Timestamp("2027-01-01").date(), 300) == "week"
+    assert downsample.time_bucket(start, pd.Timestamp("2040-01-01").date(), 300) == "month"
+
+
+def test_week_and_month_buckets_match_date_trunc():
+    pytest.importorskip("pyarrow")
+    import retail_metrics
+    import rollup_mirror
+
+    # 2024-01-07 es domingo y 2024-01-08 lunes: date_trunc('week') empieza el lunes
+    dates = pd.to_datetime(["2024-01-01", "2024-01-07", "2024-01-08", "2024-01-31", "2024-02-01"])
+    frame = pd.DataFrame({"date": dates, "region": "North", "category": "Toys"})
+    for name in retail_metrics.rollup_measure_names():
+        frame[name] = 1.0
+
+    weekly = rollup_mirror.summarize(frame, {}, "date", "week")
+    assert list(weekly["date"]) == list(pd.to_datetime(["2024-01-01", "2024-01-08", "2024-01-29"]))
+    assert list(weekly["row_count"]) == [2.0, 1.0, 2.0]
+
+    monthly = rollup_mirror.summarize(frame, {}, "date", "month")
+    assert list(monthly["date"]) == list(pd.to_datetime(["2024-01-01", "2024-02-01"]))
+    assert list(monthly["row_count"]) == [4.0, 1.0]
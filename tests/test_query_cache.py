@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""QueryCache del dashboard: TTL, desalojo LRU por bytes y revalidación por porción de datos."""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "streamlit"))
+
+import cache
+
+
+class FakeClock(object):
+    """Reemplaza al módulo time dentro de cache: el tiempo solo avanza a pedido"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache, "time", fake)
+    return fake
+
+
+def counting(value):
+    """compute() que cuenta sus llamadas"""
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return value
+    return compute, calls
+
+
+def test_entry_is_served_until_its_ttl_expires(clock):
+    query_cache = cache.QueryCache(ttl_seconds=60)
+    compute, calls = counting("a")
+
+    assert query_cache.get_or_compute("k", compute) == "a"
+    clock.now += 59
+    assert query_cache.get_or_compute("k", compute) == "a"
+    assert len(calls) == 1
+
+    clock.now += 2
+    assert query_cache.get_or_compute("k", compute) == "a"
+    assert len(calls) == 2
+    assert query_cache.summary()["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_by_bytes(clock):
+    value = b"x" * 100
+    size = cache.value_size(value)
+    query_cache = cache.QueryCache(max_bytes=2 * size)
+
+    query_cache.get_or_compute("a", lambda: value)
+    query_cache.get_or_compute("b", lambda: value)
+    query_cache.get_or_compute("a", lambda: value)  # "a" pasa a ser la más reciente
+    query_cache.get_or_compute("c", lambda: value)
+
+    assert list(query_cache.entries) == ["a", "c"]
+    assert query_cache.total_bytes == 2 * size
+    assert query_cache.summary()["evictions"] == 1
+
+
+def test_value_larger_than_the_cap_is_not_stored(clock):
+    query_cache = cache.QueryCache(max_bytes=10)
+    query_cache.get_or_compute("big", lambda: b"x" * 100)
+    assert len(query_cache.entries) == 0
+    assert query_cache.total_bytes == 0
+
+
+def test_unchanged_slice_revalidates_without_recomputing(clock):
+    query_cache = cache.QueryCache()
+    compute, calls = counting("a")
+    slice_calls = []
+
+    def slice_version():
+        slice_calls.append(1)
+        return (10, "t1")
+
+    query_cache.get_or_compute("k", compute, data_version=1, slice_version=slice_version)
+    query_cache.get_or_compute("k", compute, data_version=1, slice_version=slice_version)
+    assert len(slice_calls) == 1  # con la misma versión global no se consulta la porción
+
+    query_cache.get_or_compute("k", compute, data_version=2, slice_version=slice_version)
+    assert len(calls) == 1
+    assert query_cache.summary()["revalidated"] == 1
+    assert query_cache.entries["k"].data_version == 2
+
+
+def test_changed_slice_recomputes(clock):
+    query_cache = cache.QueryCache()
+    compute, calls = counting("a")
+    versions = iter([(10, "t1"), (11, "t2")])
+
+    query_cache.get_or_compute("k", compute, data_version=1, slice_version=lambda: next(versions))
+    query_cache.get_or_compute("k", compute, data_version=2, slice_version=lambda: next(versions))
+
+    assert len(calls) == 2
+    assert query_cache.entries["k"].slice_version == (11, "t2")
+
+
+def test_cache_if_rejects_values(clock):
+    query_cache = cache.QueryCache()
+    compute, calls = counting("")
+    query_cache.get_or_compute("k", compute, cache_if=bool)
+    query_cache.get_or_compute("k", compute, cache_if=bool)
+    assert len(calls) == 2
+    assert "k" not in query_cache.entries
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Copia en memoria del rollup: reemplazo por clave de los deltas y agregados."""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "streamlit"))
+sys.path.insert(0, os.path.join(ROOT, "common"))
+
+import retail_metrics
+import rollup_mirror
+
+
+def rollup_rows(rows, ingest_seq=1):
+    """Filas del rollup (date, region, category, row_count, units_sold); el resto de las medidas en 1"""
+    frame = pd.DataFrame(rows, columns=["date", "region", "category", "row_count", "units_sold"])
+    frame["date"] = pd.to_datetime(frame["date"])
+    for column in ("region", "category"):
+        frame[column] = frame[column].astype("category")
+    for name in retail_metrics.rollup_measure_names():
+        if name not in frame.columns:
+            frame[name] = 1.0
+    frame["ingest_seq"] = ingest_seq
+    return frame
+
+
+def test_delta_replaces_rows_with_the_same_key():
+    frame = rollup_rows([("2024-01-01", "North", "Toys", 10, 100.0),
+                         ("2024-01-01", "South", "Toys", 5, 50.0)])
+    delta = rollup_rows([("2024-01-01", "North", "Toys", 12, 130.0),
+                         ("2024-01-02", "North", "Books", 3, 30.0)], ingest_seq=2)
+
+    merged = rollup_mirror.merge_delta(frame, delta).set_index(["date", "region", "category"])
+
+    assert len(merged) == 3
+    assert merged.loc[(pd.Timestamp("2024-01-01"), "North", "Toys"), "units_sold"] == 130.0
+    assert merged.loc[(pd.Timestamp("2024-01-01"), "South", "Toys"), "units_sold"] == 50.0
+    assert merged.loc[(pd.Timestamp("2024-01-02"), "North", "Books"), "ingest_seq"] == 2
+    assert isinstance(merged.reset_index()["category"].dtype, pd.CategoricalDtype)
+
+
+def test_empty_delta_keeps_the_frame():
+    frame = rollup_rows([("2024-01-01", "North", "Toys", 10, 100.0)])
+    assert rollup_mirror.merge_delta(frame, frame.iloc[0:0]) is frame
+
+
+def test_summarize_after_merge_counts_replaced_rows_once():
+    frame = rollup_rows([("2024-01-01", "North", "Toys", 10, 100.0),
+                         ("2024-01-01", "South", "Toys", 5, 50.0)])
+    delta = rollup_rows([("2024-01-01", "North", "Toys", 12, 130.0)], ingest_seq=2)
+    merged = rollup_mirror.merge_delta(frame, delta)
+
+    totals = rollup_mirror.summarize(merged, {}).iloc[0]
+    assert totals["row_count"] == 17
+    assert totals["units_sold"] == 180.0
+
+    by_region = rollup_mirror.summarize(merged, {}, "region").set_index("region")
+    assert by_region.loc["North", "units_sold"] == 130.0
+    assert by_region.loc["North", "avg_inventory_level"] == pytest.approx(1 / 12.0)
+
+
+def test_summarize_applies_the_sidebar_filters():
+    frame = rollup_rows([("2024-01-01", "North", "Toys", 10, 100.0),
+                         ("2024-01-05", "North", "Books", 5, 50.0),
+                         ("2024-02-01", "South", "Toys", 1, 10.0)])
+    filters = {"category": "Toys", "start_date": pd.Timestamp("2024-01-01").date(),
+               "end_date": pd.Timestamp("2024-01-31").date()}
+    totals = rollup_mirror.summarize(frame, filters).iloc[0]
+    assert totals["units_sold"] == 100.0